@@ -2,6 +2,7 @@
 from django.contrib import admin
 from django.contrib.auth.admin import UserAdmin
 from django import forms
+from bots import runtime
 from .models import User, Workspace, Contact
 
 admin.site.site_header = "Redback Admin"
@@ -56,6 +57,9 @@ class WorkspaceAdmin(admin.ModelAdmin):
     search_fields = ['name', 'owner__username']
     actions = ['approve_workspaces', 'reject_workspaces']
 
+    def get_queryset(self, request):
+        return super().get_queryset(request).with_active_plan()
+
     def operational(self, obj):
         return obj.is_operational
     operational.boolean = True
@@ -65,14 +69,17 @@ class WorkspaceAdmin(admin.ModelAdmin):
         ap = obj.active_plan
         return ap.bundle if ap else '—'
     active_plan_bundle.short_description = 'Active Plan'
+    active_plan_bundle.admin_order_field = 'active_plan_bundle'
 
     def approve_workspaces(self, request, queryset):
         updated = queryset.update(approved=True)
+        runtime.invalidate_workspaces(queryset.values_list('id', flat=True))
         self.message_user(request, f"{updated} workspace(s) approved.")
     approve_workspaces.short_description = "Approve selected workspaces"
 
     def reject_workspaces(self, request, queryset):
         updated = queryset.update(approved=False)
+        runtime.invalidate_workspaces(queryset.values_list('id', flat=True))
         self.message_user(request, f"{updated} workspace(s) rejected.")
     reject_workspaces.short_description = "Reject selected workspaces"
 
@@ -1,12 +1,37 @@
 # accounts/models.py
 from django.db import models
+from django.db.models import OuterRef, Prefetch, Subquery
 from django.contrib.auth.models import AbstractUser
-from django.utils import timezone
 
 class User(AbstractUser):
     is_approved = models.BooleanField(default=False)
 
 
+def active_plan_prefetch(lookup='plans'):
+    """
+    Prefetch of the currently active plans (newest first) that Workspace.active_plan
+    reads instead of querying. `lookup` is the path to the plans relation,
+    e.g. 'workspace__plans' for a Bot queryset.
+    """
+    from billing.models import Plan
+    return Prefetch(lookup, queryset=Plan.objects.current().order_by('-start_at'), to_attr='current_plans')
+
+
+class WorkspaceQuerySet(models.QuerySet):
+    def with_active_plan(self):
+        """
+        Resolve active plans in bulk: annotates active_plan_bundle (sortable /
+        filterable) and prefetches the plan rows, so active_plan and everything
+        built on it (is_operational, get_available_bot_modes, ...) costs no
+        further queries per workspace.
+        """
+        from billing.models import Plan
+        current = Plan.objects.current().filter(workspace=OuterRef('pk')).order_by('-start_at')
+        return self.annotate(
+            active_plan_bundle=Subquery(current.values('bundle')[:1]),
+        ).prefetch_related(active_plan_prefetch())
+
+
 class Workspace(models.Model):
     name = models.CharField(max_length=255)
     owner = models.ForeignKey(User, on_delete=models.CASCADE)
@@ -51,6 +76,8 @@ class Workspace(models.Model):
 
     created_at = models.DateTimeField(auto_now_add=True)
 
+    objects = WorkspaceQuerySet.as_manager()
+
     def __str__(self):
         return f"{self.name} ({'approved' if self.approved else 'pending'})"
 
@@ -58,17 +85,25 @@ class Workspace(models.Model):
     def active_plan(self):
         """
         Returns the most recent Plan that is currently active (by dates + active flag).
-        Uses reverse relation: workspace.plans (from billing.Plan.related_name='plans')
+        Resolved in the database (Plan.objects.current()) or from the
+        with_active_plan() prefetch, then memoised on this instance until
+        reset_active_plan() (called by Plan.save/delete).
         """
-        plans = list(self.plans.all())
-        if not plans:
-            return None
-        # Sort by start_at desc, then pick first that is currently active
-        plans.sort(key=lambda p: (p.start_at or timezone.now()), reverse=True)
-        for p in plans:
-            if p.is_current_active:
-                return p
-        return None
+        try:
+            return self._active_plan
+        except AttributeError:
+            pass
+        current = getattr(self, 'current_plans', None)
+        if current is not None:
+            plan = current[0] if current else None
+        else:
+            plan = self.plans.current().order_by('-start_at').first()
+        self._active_plan = plan
+        return plan
+
+    def reset_active_plan(self):
+        self.__dict__.pop('_active_plan', None)
+        self.__dict__.pop('current_plans', None)
 
     @property
     def is_operational(self) -> bool:
@@ -1,12 +1,16 @@
 from django.contrib import admin
+from bots import runtime
+
 
 # Adminpanel: Custom actions only (no model registration)
 @admin.action(description="Approve selected workspaces")
 def approve_workspaces(modeladmin, request, queryset):
     queryset.update(approved=True)
+    runtime.invalidate_workspaces(queryset.values_list('id', flat=True))
 
 @admin.action(description="Reject selected workspaces") 
 def reject_workspaces(modeladmin, request, queryset):
     queryset.update(approved=False)
+    runtime.invalidate_workspaces(queryset.values_list('id', flat=True))
     
 
@@ -0,0 +1,253 @@
+"""
+Load test for cross-process WebSocket fan-out through the channel layer.
+Run this with: python bench_channel_layer.py [--workers 4] [--sockets 25] [--messages 50]
+
+Starts a local Redis-protocol stand-in (the pub/sub subset of RESP that
+channels_redis' RedisPubSubChannelLayer needs), spawns --workers processes
+that each open --sockets ChatConsumer connections to one conversation, and
+broadcasts --messages group_sends from this process the same way
+chat/signals.py does (async_to_sync(group_send) from sync code). Every
+consumer forwards the event to its socket; the test reports end-to-end
+fan-out latency (group_send -> socket frame) and delivered/expected counts.
+
+Pass --redis-url redis://... (and optionally --backend redis) to run
+against a real Redis instead. The stand-in cannot run the core layer,
+which relies on Lua scripts.
+"""
+
+import os
+import sys
+import time
+import asyncio
+import argparse
+import threading
+import statistics
+import multiprocessing as mp
+
+import logging
+
+logging.basicConfig(level=logging.INFO, format='%(message)s')
+logger = logging.getLogger(__name__)
+
+PUBLIC_KEY = 'benchkey'
+SESSION_ID = 'bench'
+
+
+# ---------------------------------------------------------------------------
+# Redis-protocol stand-in: HELLO / PING / SUBSCRIBE / UNSUBSCRIBE / PUBLISH
+# (RESP2 and RESP3; redis-py 5+ negotiates RESP3 with HELLO)
+# ---------------------------------------------------------------------------
+
+class MiniRedis:
+    def __init__(self):
+        self.subscribers = {}  # channel -> set of (writer, speaks RESP3)
+        self.published = 0
+
+    @staticmethod
+    def _bulk(value):
+        if isinstance(value, str):
+            value = value.encode()
+        return b'$%d\r\n%s\r\n' % (len(value), value)
+
+    def _push(self, kind, channel, payload, resp3=False):
+        return (b'>3\r\n' if resp3 else b'*3\r\n') + self._bulk(kind) + self._bulk(channel) + (
+            payload if isinstance(payload, bytes) and payload.startswith(b':') else self._bulk(payload)
+        )
+
+    async def _read_command(self, reader):
+        line = await reader.readline()
+        if not line:
+            return None
+        if not line.startswith(b'*'):
+            return line.strip().split()  # inline command
+        args = []
+        for _ in range(int(line[1:])):
+            size = int((await reader.readline())[1:])
+            args.append((await reader.readexactly(size + 2))[:-2])
+        return args
+
+    async def handle(self, reader, writer):
+        subscribed = set()
+        resp3 = False
+        try:
+            while True:
+                args = await self._read_command(reader)
+                if args is None:
+                    break
+                if not args:
+                    continue
+                cmd = args[0].upper()
+                if cmd == b'HELLO':
+                    resp3 = len(args) > 1 and args[1] == b'3'
+                    fields = [b'server', b'redis', b'version', b'7.2.0']
+                    body = b''.join(self._bulk(f) for f in fields)
+                    writer.write((b'%3\r\n' if resp3 else b'*6\r\n') + body + self._bulk('proto') + (b':3\r\n' if resp3 else b':2\r\n'))
+                elif cmd == b'PING':
+                    writer.write(b'*2\r\n$4\r\npong\r\n$0\r\n\r\n' if subscribed and not resp3 else b'+PONG\r\n')
+                elif cmd == b'SUBSCRIBE':
+                    for ch in args[1:]:
+                        subscribed.add(ch)
+                        self.subscribers.setdefault(ch, set()).add((writer, resp3))
+                        writer.write(self._push('subscribe', ch, b':%d\r\n' % len(subscribed), resp3))
+                elif cmd == b'UNSUBSCRIBE':
+                    for ch in (args[1:] or list(subscribed)):
+                        subscribed.discard(ch)
+                        self.subscribers.get(ch, set()).discard((writer, resp3))
+                        writer.write(self._push('unsubscribe', ch, b':%d\r\n' % len(subscribed), resp3))
+                elif cmd == b'PUBLISH':
+                    ch, payload = args[1], args[2]
+                    targets = list(self.subscribers.get(ch, ()))
+                    for w, w_resp3 in targets:
+                        w.write(self._push('message', ch, payload, w_resp3))
+                    self.published += 1
+                    writer.write(b':%d\r\n' % len(targets))
+                elif cmd in (b'CLIENT', b'SELECT', b'AUTH'):
+                    writer.write(b'+OK\r\n')
+                else:
+                    writer.write(b'-ERR unknown command ' + cmd + b'\r\n')
+                await writer.drain()
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            for ch in subscribed:
+                self.subscribers.get(ch, set()).discard((writer, resp3))
+            writer.close()
+
+
+def start_mini_redis():
+    """Run MiniRedis on a background thread; returns (server, port)."""
+    server = MiniRedis()
+    started = threading.Event()
+    port_box = []
+
+    def run():
+        loop = asyncio.new_event_loop()
+        srv = loop.run_until_complete(asyncio.start_server(server.handle, '127.0.0.1', 0))
+        port_box.append(srv.sockets[0].getsockname()[1])
+        started.set()
+        loop.run_forever()
+
+    threading.Thread(target=run, daemon=True).start()
+    started.wait()
+    return server, port_box[0]
+
+
+# ---------------------------------------------------------------------------
+# Consumer worker processes
+# ---------------------------------------------------------------------------
+
+def setup_django(backend, redis_url):
+    os.environ['CHANNEL_LAYER_BACKEND'] = backend
+    os.environ['CHANNEL_REDIS_HOSTS'] = redis_url
+    os.environ.setdefault('AGENT_PRESENCE_BACKEND', 'local')
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'redbot.settings')
+    import django
+    django.setup()
+
+
+def consumer_worker(idx, backend, redis_url, sockets, messages, ready, results):
+    setup_django(backend, redis_url)
+    from channels.routing import URLRouter
+    from channels.testing import WebsocketCommunicator
+    import chat.routing
+
+    app = URLRouter(chat.routing.websocket_urlpatterns)
+
+    async def run():
+        comms = []
+        for _ in range(sockets):
+            comm = WebsocketCommunicator(app, f'/ws/chat/{PUBLIC_KEY}/{SESSION_ID}/')
+            connected, _ = await comm.connect()
+            assert connected
+            await comm.receive_json_from()  # initial agent_status
+            comms.append(comm)
+        ready.put(idx)
+
+        latencies, missed = [], 0
+        for comm in comms:
+            for _ in range(messages):
+                try:
+                    event = await comm.receive_json_from(timeout=10)
+                except asyncio.TimeoutError:
+                    missed += 1
+                    continue
+                if event.get('type') == 'chat_message':
+                    latencies.append(time.time() - float(event['timestamp']))
+        for comm in comms:
+            await comm.disconnect()
+        results.put((idx, latencies, missed))
+
+    asyncio.run(run())
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--workers', type=int, default=4)
+    parser.add_argument('--sockets', type=int, default=25, help='connections per worker')
+    parser.add_argument('--messages', type=int, default=50)
+    parser.add_argument('--interval', type=float, default=0.01, help='seconds between broadcasts')
+    parser.add_argument('--backend', default='redis-pubsub', choices=['redis-pubsub', 'redis'])
+    parser.add_argument('--redis-url', default='', help='use a real Redis instead of the stand-in')
+    args = parser.parse_args()
+
+    if args.redis_url:
+        redis_url, stand_in = args.redis_url, None
+    else:
+        if args.backend != 'redis-pubsub':
+            sys.exit('The stand-in only supports --backend redis-pubsub; pass --redis-url for the core layer.')
+        stand_in, port = start_mini_redis()
+        redis_url = f'redis://127.0.0.1:{port}/0'
+
+    setup_django(args.backend, redis_url)
+    from asgiref.sync import async_to_sync
+    from channels.layers import get_channel_layer
+
+    ctx = mp.get_context('spawn')
+    ready, results = ctx.Queue(), ctx.Queue()
+    procs = [
+        ctx.Process(target=consumer_worker,
+                    args=(i, args.backend, redis_url, args.sockets, args.messages, ready, results))
+        for i in range(args.workers)
+    ]
+    for p in procs:
+        p.start()
+    for _ in procs:
+        ready.get(timeout=120)
+    time.sleep(0.5)  # let subscriptions settle
+
+    layer = get_channel_layer()
+    group = f'chat_{PUBLIC_KEY}_{SESSION_ID}'
+    start = time.perf_counter()
+    for i in range(args.messages):
+        async_to_sync(layer.group_send)(group, {
+            'type': 'chat_message',
+            'text': f'bench message {i}',
+            'sender': 'BOT',
+            'timestamp': repr(time.time()),
+        })
+        time.sleep(args.interval)
+    send_elapsed = time.perf_counter() - start
+
+    latencies, missed = [], 0
+    for _ in procs:
+        _, lat, miss = results.get(timeout=120)
+        latencies.extend(lat)
+        missed += miss
+    for p in procs:
+        p.join()
+
+    expected = args.workers * args.sockets * args.messages
+    latencies.sort()
+    logger.info("backend=%s via %s", args.backend, "stand-in" if stand_in else redis_url)
+    logger.info("%d workers x %d sockets, %d broadcasts in %.2fs", args.workers, args.sockets, args.messages, send_elapsed)
+    logger.info("delivered %d / %d (%d missed)", len(latencies), expected, missed)
+    if latencies:
+        logger.info("fan-out latency: p50 %.1f ms  p95 %.1f ms  p99 %.1f ms  max %.1f ms",
+                    statistics.median(latencies) * 1000,
+                    latencies[int(len(latencies) * 0.95) - 1] * 1000,
+                    latencies[int(len(latencies) * 0.99) - 1] * 1000,
+                    latencies[-1] * 1000)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,140 @@
+"""
+Query plans and latency of the chat hot paths on a seeded message table.
+Run this with: python bench_chat_indexes.py [--messages 10000000] [--conversations 100000] [--samples 300]
+
+Seeds a throwaway workspace with --bots bots, --conversations conversations
+and --messages messages (bulk inserts, so the conversation summary columns
+are left at zero), then for each hot path prints the database's EXPLAIN
+output and the p50/p95 latency over --samples random lookups:
+
+  conversation  Conversation by (bot, session_id)  - get_or_create on every turn
+  tail          messages id > last_id ORDER BY id  - long-poll / SSE / reconnect
+  transcript    messages ORDER BY timestamp        - dashboard conversation view
+  analytics     conversations of a bot since a date
+
+Run it on the commit before the chat 0004 migration and after it to compare.
+Seeding 10M rows takes a while; --keep leaves the data in place and
+--reuse WORKSPACE_ID benchmarks an earlier seed without re-inserting.
+"""
+
+import os
+import time
+import uuid
+import random
+import argparse
+import statistics
+from datetime import timedelta
+
+import logging
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'redbot.settings')
+
+import django
+django.setup()
+
+from django.db import connection, transaction
+from django.utils import timezone
+
+from accounts.models import User, Workspace
+from billing.models import Plan
+from bots.models import Bot
+from chat.models import Conversation, Message
+
+logging.basicConfig(level=logging.INFO, format='%(message)s')
+logger = logging.getLogger(__name__)
+
+
+def seed(n_bots, n_conversations, n_messages, batch):
+    user = User.objects.create(username=f'bench-{uuid.uuid4().hex[:8]}')
+    ws = Workspace.objects.create(name='bench', owner=user, approved=True)
+    Plan.objects.create(workspace=ws, bundle='LIVE_ONLY')
+    bots = [Bot.objects.create(workspace=ws, name=f'bench {i}') for i in range(n_bots)]
+
+    start = time.perf_counter()
+    for lo in range(0, n_conversations, batch):
+        Conversation.objects.bulk_create(
+            Conversation(bot=bots[i % n_bots], session_id=f'bench_{i}')
+            for i in range(lo, min(lo + batch, n_conversations))
+        )
+    conv_ids = list(Conversation.objects.filter(bot__workspace=ws).values_list('id', flat=True))
+
+    inserted = 0
+    while inserted < n_messages:
+        size = min(batch, n_messages - inserted)
+        with transaction.atomic():
+            Message.objects.bulk_create(
+                Message(conversation_id=random.choice(conv_ids), sender='USER' if i % 2 else 'BOT', text=f'bench message {i}')
+                for i in range(inserted, inserted + size)
+            )
+        inserted += size
+        if inserted % (batch * 50) == 0 or inserted == n_messages:
+            logger.info("  seeded %d / %d messages (%.0f rows/s)", inserted, n_messages, inserted / (time.perf_counter() - start))
+    return ws
+
+
+def timed(samples, fn):
+    latencies = []
+    for _ in range(samples):
+        t = time.perf_counter()
+        fn()
+        latencies.append(time.perf_counter() - t)
+    latencies.sort()
+    return statistics.median(latencies) * 1000, latencies[int(len(latencies) * 0.95) - 1] * 1000
+
+
+def run(ws, samples):
+    convs = list(Conversation.objects.filter(bot__workspace=ws).values_list('id', 'bot_id', 'session_id'))
+    bot_ids = sorted({bot_id for _, bot_id, _ in convs})
+    since = timezone.now() - timedelta(days=30)
+
+    def tail_query(conv_id):
+        # A client that already has all but the last few messages
+        ids = Message.objects.filter(conversation_id=conv_id).order_by('-id').values_list('id', flat=True)[:5]
+        last_id = min(ids, default=0)
+        return Message.objects.filter(conversation_id=conv_id, id__gt=last_id).order_by('id')
+
+    paths = {
+        'conversation': lambda c: Conversation.objects.filter(bot_id=c[1], session_id=c[2]),
+        'tail': lambda c: tail_query(c[0]),
+        'transcript': lambda c: Message.objects.filter(conversation_id=c[0]).order_by('timestamp'),
+        'analytics': lambda c: Conversation.objects.filter(bot_id=c[1], created_at__gte=since).order_by('-created_at'),
+    }
+
+    total = Message.objects.filter(conversation__bot__workspace=ws).count()
+    logger.info("%s: %d bots, %d conversations, %d messages", connection.vendor, len(bot_ids), len(convs), total)
+    for name, query in paths.items():
+        logger.info("\n== %s ==", name)
+        logger.info(query(random.choice(convs)).explain())
+        p50, p95 = timed(samples, lambda: list(query(random.choice(convs))[:200]))
+        logger.info("latency: p50 %.2f ms  p95 %.2f ms", p50, p95)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--messages', type=int, default=10_000_000)
+    parser.add_argument('--conversations', type=int, default=100_000)
+    parser.add_argument('--bots', type=int, default=10)
+    parser.add_argument('--batch', type=int, default=10_000, help='rows per bulk insert')
+    parser.add_argument('--samples', type=int, default=300)
+    parser.add_argument('--keep', action='store_true', help='leave the seeded data in place')
+    parser.add_argument('--reuse', type=int, help='benchmark an earlier --keep seed (workspace id)')
+    args = parser.parse_args()
+
+    if args.reuse:
+        ws = Workspace.objects.get(id=args.reuse)
+    else:
+        ws = seed(args.bots, args.conversations, args.messages, args.batch)
+
+    try:
+        run(ws, args.samples)
+    finally:
+        if args.keep or args.reuse:
+            logger.info("\nkept seeded data: --reuse %d", ws.id)
+        else:
+            # Message has no delete signals, so this is a single DELETE rather than a cascade walk
+            Message.objects.filter(conversation__bot__workspace=ws).delete()
+            ws.owner.delete()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,112 @@
+"""
+WebSocket throughput of ChatConsumer: messages/sec in one process.
+Run this with: python bench_consumer.py [--sockets 20] [--messages 50] [--public-key KEY]
+
+Opens --sockets ChatConsumer connections (one conversation each, in-memory
+channel layer) and has every socket send --messages chat messages as fast
+as the echoes come back. Each message is saved and broadcast to the room,
+so the rate covers the full receive -> save -> group_send -> send path.
+
+Without --public-key a throwaway user/workspace/plan/bot is created and
+deleted afterwards (with its conversations).
+"""
+
+import os
+import time
+import uuid
+import asyncio
+import argparse
+import statistics
+
+import logging
+
+os.environ['CHANNEL_LAYER_BACKEND'] = 'memory'
+os.environ.setdefault('AGENT_PRESENCE_BACKEND', 'local')
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'redbot.settings')
+
+import django
+django.setup()
+
+from channels.routing import URLRouter
+from channels.testing import WebsocketCommunicator
+
+import chat.routing
+from accounts.models import User, Workspace
+from billing.models import Plan
+from bots.models import Bot
+from chat.models import Conversation
+
+logging.basicConfig(level=logging.INFO, format='%(message)s')
+logger = logging.getLogger(__name__)
+
+
+def create_bot():
+    user = User.objects.create(username=f'bench-{uuid.uuid4().hex[:8]}')
+    ws = Workspace.objects.create(name='bench', owner=user, approved=True)
+    Plan.objects.create(workspace=ws, bundle='LIVE_ONLY')
+    return Bot.objects.create(workspace=ws, name='bench'), user
+
+
+async def run_socket(app, public_key, session_id, messages, latencies):
+    comm = WebsocketCommunicator(app, f'/ws/chat/{public_key}/{session_id}/')
+    connected, _ = await comm.connect()
+    assert connected
+    await comm.receive_json_from()  # initial agent_status
+    for i in range(messages):
+        t = time.perf_counter()
+        await comm.send_json_to({'type': 'chat_message', 'message': f'bench {i}', 'sender': 'USER'})
+        while True:
+            event = await comm.receive_json_from(timeout=10)
+            if event.get('type') == 'chat_message':
+                break
+        latencies.append(time.perf_counter() - t)
+    await comm.disconnect()
+
+
+async def run(public_key, sockets, messages):
+    app = URLRouter(chat.routing.websocket_urlpatterns)
+    latencies = []
+    prefix = uuid.uuid4().hex[:8]
+    start = time.perf_counter()
+    await asyncio.gather(*(
+        run_socket(app, public_key, f'bench_{prefix}_{i}', messages, latencies)
+        for i in range(sockets)
+    ))
+    return latencies, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--sockets', type=int, default=20)
+    parser.add_argument('--messages', type=int, default=50, help='messages per socket')
+    parser.add_argument('--public-key', default='', help='use an existing bot instead of a throwaway one')
+    args = parser.parse_args()
+
+    owner = None
+    if args.public_key:
+        public_key = args.public_key
+    else:
+        bot, owner = create_bot()
+        public_key = bot.public_key
+
+    try:
+        latencies, elapsed = asyncio.run(run(public_key, args.sockets, args.messages))
+    finally:
+        if owner is not None:
+            owner.delete()  # cascades to workspace, bot, conversations, messages
+        elif args.public_key:
+            Conversation.objects.filter(bot__public_key=public_key, session_id__startswith='bench_').delete()
+
+    latencies.sort()
+    total = len(latencies)
+    logger.info("%d sockets x %d messages = %d messages in %.2fs", args.sockets, args.messages, total, elapsed)
+    logger.info("throughput: %.0f messages/sec", total / elapsed if elapsed else 0)
+    if latencies:
+        logger.info("round trip: p50 %.1f ms  p95 %.1f ms  max %.1f ms",
+                    statistics.median(latencies) * 1000,
+                    latencies[int(total * 0.95) - 1] * 1000,
+                    latencies[-1] * 1000)
+
+
+if __name__ == '__main__':
+    main()
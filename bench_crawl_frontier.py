@@ -0,0 +1,186 @@
+"""
+Page budget spent on content by dashboard.website_crawler, with and without sitemaps.
+Run this with: python bench_crawl_frontier.py [--articles 200] [--tags 40] [--max-pages 100]
+
+Serves a blog-shaped site from a local HTTP server:
+
+  /blog/<year>/post-<i>/   --articles content pages, three levels deep
+  /tag/<t>/, /category/<c>/, /about/ ...
+                           --tags boilerplate pages, linked from the nav and
+                           footer of every page
+  /archive/<n>/            paginated archive, 10 posts per page, the only
+                           links to the posts besides "next post"
+
+robots.txt points at a sitemap index, which lists a gzipped post sitemap
+(priority 0.8, lastmod) and a plain one for the static pages (priority 0.3).
+
+The crawl runs with sitemaps off (links only) and on, twice each:
+  capped  max_pages = --max-pages: how many of those pages are posts
+  full    no cap: page fetches until 50% / 90% / all posts are covered
+and reports the requests the server saw (robots.txt and sitemaps included).
+"""
+
+import os
+import gzip
+import asyncio
+import argparse
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import logging
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'redbot.settings')
+
+import django
+django.setup()
+
+from dashboard.website_crawler import Crawler
+
+logging.basicConfig(level=logging.INFO, format='%(message)s')
+logger = logging.getLogger(__name__)
+logging.getLogger('httpx').setLevel(logging.WARNING)
+logging.getLogger('dashboard.website_crawler').setLevel(logging.WARNING)
+
+
+def post_path(i):
+    return f'/blog/{2020 + i % 5}/post-{i}/'
+
+
+class BlogSite:
+    def __init__(self, articles, tags):
+        self.articles = articles
+        self.boilerplate = [f'/tag/topic-{t}/' for t in range(tags)] + ['/category/news/', '/category/guides/',
+                                                                         '/about/', '/contact/', '/privacy/']
+        self.archive_pages = (articles + 9) // 10
+        self.requests = 0
+        self.lock = threading.Lock()
+        self.files = self.build()
+
+    def page(self, title, body):
+        nav = ''.join(f'<li><a href="{path}">{path.strip("/")}</a></li>' for path in self.boilerplate)
+        return (f'<!doctype html><html><head><title>{title}</title></head><body>'
+                f'<header><nav><ul><li><a href="/">Home</a></li><li><a href="/archive/1/">Archive</a></li>{nav}</ul></nav></header>'
+                f'<main><h1>{title}</h1>{body}</main>'
+                f'<footer><a href="/about/">About</a> <a href="/privacy/">Privacy</a></footer></body></html>').encode()
+
+    def build(self):
+        files = {'/': self.page('Home', '<p>Welcome.</p><p><a href="/archive/1/">All posts</a></p>')}
+        for path in self.boilerplate:
+            files[path] = self.page(path.strip('/'), '<p>Nothing much here.</p>')
+        for n in range(1, self.archive_pages + 1):
+            posts = ''.join(f'<li><a href="{post_path(i)}">Post {i}</a></li>'
+                            for i in range((n - 1) * 10, min(n * 10, self.articles)))
+            more = f'<a href="/archive/{n + 1}/">Older posts</a>' if n < self.archive_pages else ''
+            files[f'/archive/{n}/'] = self.page(f'Archive page {n}', f'<ul>{posts}</ul>{more}')
+        for i in range(self.articles):
+            paragraphs = ''.join(f'<p>Paragraph {j} of post {i}. ' + 'Lorem ipsum dolor sit amet. ' * 8 + '</p>'
+                                 for j in range(5))
+            following = f'<p><a href="{post_path(i + 1)}">Next post</a></p>' if i + 1 < self.articles else ''
+            files[post_path(i)] = self.page(f'Post {i}', paragraphs + following)
+
+        posts = ''.join(
+            f'<url><loc>http://{{host}}{post_path(i)}</loc><lastmod>2024-{1 + i % 12:02d}-{1 + i % 28:02d}</lastmod>'
+            f'<priority>0.8</priority></url>'
+            for i in range(self.articles)
+        )
+        pages = ''.join(f'<url><loc>http://{{host}}{path}</loc><priority>0.3</priority></url>'
+                        for path in ['/', '/about/', '/contact/'])
+        urlset = '<?xml version="1.0" encoding="UTF-8"?><urlset xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">{}</urlset>'
+        files['/sitemap-posts.xml.gz'] = urlset.format(posts)
+        files['/sitemap-pages.xml'] = urlset.format(pages)
+        files['/sitemap_index.xml'] = (
+            '<?xml version="1.0" encoding="UTF-8"?><sitemapindex xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">'
+            '<sitemap><loc>http://{host}/sitemap-posts.xml.gz</loc></sitemap>'
+            '<sitemap><loc>http://{host}/sitemap-pages.xml</loc></sitemap></sitemapindex>'
+        )
+        files['/robots.txt'] = 'User-agent: *\nDisallow: /private/\nSitemap: http://{host}/sitemap_index.xml\n'
+        return files
+
+    def serve(self, host):
+        for path, body in self.files.items():
+            if isinstance(body, str):
+                body = body.replace('{host}', host).encode()
+                self.files[path] = gzip.compress(body) if path.endswith('.gz') else body
+
+    def handler(self):
+        site = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                with site.lock:
+                    site.requests += 1
+                body = site.files.get(self.path)
+                if body is None:
+                    self.send_error(404)
+                    return
+                self.send_response(200)
+                self.send_header('Content-Type', 'application/gzip' if self.path.endswith('.gz') else 'text/html')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        return Handler
+
+
+class RecordingCrawler(Crawler):
+    """Keeps the order pages finished in."""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.finished = []
+
+    async def on_page(self, order, page):
+        self.finished.append(page['url'])
+        await super().on_page(order, page)
+
+
+def crawl(site, start_url, max_pages, sitemaps, rate):
+    site.requests = 0
+    crawler = RecordingCrawler(start_url, max_pages, rate=rate, sitemaps=sitemaps)
+    asyncio.run(crawler.run())
+    is_post = ['/blog/' in url for url in crawler.finished]
+    return is_post, site.requests
+
+
+def fetches_to_cover(is_post, fraction, total):
+    want, seen = max(1, round(total * fraction)), 0
+    for fetched, post in enumerate(is_post, 1):
+        seen += post
+        if seen >= want:
+            return fetched
+    return None
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--articles', type=int, default=200)
+    parser.add_argument('--tags', type=int, default=40)
+    parser.add_argument('--max-pages', type=int, default=100)
+    parser.add_argument('--rate', type=float, default=200.0, help='requests/sec per host')
+    args = parser.parse_args()
+
+    site = BlogSite(args.articles, args.tags)
+    server = ThreadingHTTPServer(('127.0.0.1', 0), site.handler())
+    host = f'127.0.0.1:{server.server_address[1]}'
+    site.serve(host)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    start_url = f'http://{host}/'
+    total_pages = len([p for p in site.files if p.endswith('/')])
+    logger.info("site: %d posts, %d other pages", args.articles, total_pages - args.articles)
+
+    for label, sitemaps in (('links only', False), ('sitemaps', True)):
+        is_post, requests = crawl(site, start_url, args.max_pages, sitemaps, args.rate)
+        logger.info("%-10s capped: %3d of %d pages were posts, %d requests",
+                    label, sum(is_post), len(is_post), requests)
+        is_post, requests = crawl(site, start_url, total_pages, sitemaps, args.rate)
+        cover = [fetches_to_cover(is_post, f, args.articles) for f in (0.5, 0.9, 1.0)]
+        logger.info("%-10s full:   pages fetched to cover 50%% / 90%% / all posts: %s / %s / %s (%d requests in all)",
+                    label, *cover, requests)
+    server.shutdown()
+
+
+if __name__ == '__main__':
+    main()
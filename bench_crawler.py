@@ -0,0 +1,188 @@
+"""
+Crawl speed of dashboard.website_crawler against a local static site.
+Run this with: python bench_crawler.py [--pages 100] [--latency 150] [--rate 5]
+
+Serves a generated --pages page site (headings, paragraphs, lists, nav and
+footer links, robots.txt) from a threaded local HTTP server that waits
+--latency ms before answering each request, like a remote origin would.
+The same crawl then runs twice:
+
+  legacy      the old loop: requests.get, parse, time.sleep(1/rate), repeat
+              (time.sleep(0.2) at the default --rate 5)
+  concurrent  Crawler with CRAWLER_CONCURRENCY / CRAWLER_HOST_CONCURRENCY
+              and --rate as the per-host limit
+  recrawl     the concurrent crawl again with a warm CrawlCache, after
+              --changed percent of the pages were edited; the server
+              answers If-None-Match with 304 like a static host would
+
+and reports pages, seconds, pages/sec, bytes served, the server's peak
+concurrent requests and its peak request starts in any one second.
+--crawl-delay adds a robots.txt Crawl-delay (whole seconds; urllib.robotparser
+ignores fractions), which should cap the rate.
+"""
+
+import os
+import time
+import hashlib
+import asyncio
+import argparse
+import threading
+from collections import Counter, deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import logging
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'redbot.settings')
+
+import django
+django.setup()
+
+from dashboard.website_crawler import CrawlCache, acrawl_site, fetch_url, is_same_domain, parse_page
+
+logging.basicConfig(level=logging.INFO, format='%(message)s')
+logger = logging.getLogger(__name__)
+logging.getLogger('httpx').setLevel(logging.WARNING)
+
+
+def make_page(i, pages):
+    children = [c for c in (2 * i + 1, 2 * i + 2) if c < pages]
+    links = ''.join(f'<li><a href="/page/{c}.html">Page {c}</a></li>' for c in children)
+    paragraphs = ''.join(
+        f'<p>Paragraph {j} of page {i}. ' + 'Lorem ipsum dolor sit amet, consectetur adipiscing elit. ' * 6 + '</p>'
+        for j in range(6)
+    )
+    return f"""<!doctype html><html><head><title>Page {i}</title></head><body>
+<header><nav><a href="/">Home</a> <a href="/page/1.html">About</a> <a href="/page/2.html">Blog</a></nav></header>
+<main>
+  <h1>Page {i}</h1>{paragraphs}
+  <h2>Details</h2>
+  <ul><li>Item one</li><li>Item two</li><li>Item three</li></ul>
+  <table><tr><td>cell</td><td>{i}</td></tr></table>
+  <h2>See also</h2>
+  <ul>{links}</ul>
+</main>
+<footer><a href="/page/0.html">Top</a> <a href="mailto:x@example.com">Mail</a></footer>
+</body></html>"""
+
+
+class FixtureSite:
+    def __init__(self, pages, latency, crawl_delay):
+        self.pages = {f'/page/{i}.html': make_page(i, pages).encode() for i in range(pages)}
+        self.pages['/'] = self.pages['/page/0.html']
+        self.robots = b'User-agent: *\nDisallow: /private/\n'
+        if crawl_delay:
+            self.robots += b'Crawl-delay: %d\n' % crawl_delay
+        self.latency = latency
+        self.lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        self.active = self.peak = self.bytes = 0
+        self.starts = Counter()  # whole second -> request starts
+
+    def edit(self, percent):
+        step = max(1, round(100 / percent)) if percent else 0
+        for i, path in enumerate(sorted(p for p in self.pages if p.startswith('/page/'))):
+            if step and i % step == 0:
+                self.pages[path] = self.pages[path].replace(b'</main>', b'<p>Updated paragraph.</p></main>')
+        self.pages['/'] = self.pages['/page/0.html']
+
+    def handler(self):
+        site = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                with site.lock:
+                    site.active += 1
+                    site.peak = max(site.peak, site.active)
+                    site.starts[int(time.monotonic())] += 1
+                try:
+                    time.sleep(site.latency)
+                    body = site.robots if self.path == '/robots.txt' else site.pages.get(self.path)
+                    if body is None:
+                        self.send_error(404)
+                        return
+                    etag = '"%s"' % hashlib.sha1(body).hexdigest()[:16]
+                    if self.headers.get('If-None-Match') == etag:
+                        self.send_response(304)
+                        self.send_header('ETag', etag)
+                        self.end_headers()
+                        return
+                    site.bytes += len(body)
+                    self.send_response(200)
+                    self.send_header('ETag', etag)
+                    self.send_header('Content-Type', 'text/plain' if self.path == '/robots.txt' else 'text/html; charset=utf-8')
+                    self.send_header('Content-Length', str(len(body)))
+                    self.end_headers()
+                    self.wfile.write(body)
+                finally:
+                    with site.lock:
+                        site.active -= 1
+
+            def log_message(self, *args):
+                pass
+
+        return Handler
+
+
+def legacy_crawl(start_url, max_pages, rate):
+    """The pre-Crawler loop: one page at a time with a fixed sleep after each."""
+    base_netloc = start_url.split('/')[2]
+    to_visit, seen, results = deque([start_url]), {start_url}, []
+    while to_visit and len(results) < max_pages:
+        url = to_visit.popleft()
+        html = fetch_url(url)
+        if html:
+            page, links = parse_page(html, url)
+            results.append(page)
+            for link in links:
+                if is_same_domain(base_netloc, link) and link not in seen:
+                    seen.add(link)
+                    to_visit.append(link)
+        time.sleep(1.0 / rate)
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--pages', type=int, default=100)
+    parser.add_argument('--latency', type=float, default=150, help='ms the server waits per request')
+    parser.add_argument('--rate', type=float, default=5.0, help='requests/sec per host')
+    parser.add_argument('--crawl-delay', type=int, default=0, help='robots.txt Crawl-delay (seconds)')
+    parser.add_argument('--changed', type=float, default=10, help='percent of pages edited before the re-crawl')
+    args = parser.parse_args()
+
+    site = FixtureSite(args.pages, args.latency / 1000, args.crawl_delay)
+    server = ThreadingHTTPServer(('127.0.0.1', 0), site.handler())
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    start_url = f'http://127.0.0.1:{server.server_address[1]}/'
+
+    cache = CrawlCache()
+
+    def recrawl():
+        site.edit(args.changed)
+        return asyncio.run(acrawl_site(start_url, max_pages=args.pages, rate=args.rate, cache=cache))
+
+    runs = {
+        'legacy': lambda: legacy_crawl(start_url, args.pages, args.rate),
+        # The concurrent crawl fills the cache for the re-crawl
+        'concurrent': lambda: asyncio.run(acrawl_site(start_url, max_pages=args.pages, rate=args.rate, cache=cache)),
+        'recrawl': recrawl,
+    }
+    for name, crawl in runs.items():
+        site.reset()
+        start = time.perf_counter()
+        results = crawl()
+        elapsed = time.perf_counter() - start
+        logger.info("%-10s %3d pages in %6.2fs  %6.1f pages/s  %7.0f KB  peak in flight %d  peak starts/s %d",
+                    name, len(results), elapsed, len(results) / elapsed, site.bytes / 1024,
+                    site.peak, max(site.starts.values()))
+        if name == 'recrawl':
+            changed = [p for p in results if not p['unchanged']]
+            logger.info("%-10s %3d changed pages, %d changed sections", '', len(changed),
+                        sum(len(p['changed_sections']) for p in changed))
+    server.shutdown()
+
+
+if __name__ == '__main__':
+    main()
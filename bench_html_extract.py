@@ -0,0 +1,108 @@
+"""
+Parse speed of the crawler's page extraction on saved HTML.
+Run this with: python bench_html_extract.py [--seconds 2] [--depth 200]
+
+Parses every page in dashboard/testdata/pages (a blog post, an API docs
+page, a product page and a heading-less landing page) plus a generated
+deep page (--depth nested <div>s with paragraphs and lists at each level,
+where walking every block's parents costs the most), with:
+
+  soup         website_crawler.parse_page_soup - BeautifulSoup tree, junk
+               removal passes, find_all and a parents walk per block
+  html.parser  html_extract.extract_page on the standard library parser
+  lxml         html_extract.extract_page on lxml (skipped if not installed)
+
+Each parser runs over the same pages for about --seconds and reports
+pages/sec and KB/sec, after checking it returns what soup returns.
+"""
+
+import os
+import time
+import argparse
+
+import logging
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'redbot.settings')
+
+import django
+django.setup()
+
+from dashboard.html_extract import LXML_AVAILABLE, extract_page
+from dashboard.website_crawler import parse_page_soup
+
+logging.basicConfig(level=logging.INFO, format='%(message)s')
+logger = logging.getLogger(__name__)
+
+PAGES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'dashboard', 'testdata', 'pages')
+URL = 'https://example.com/page'
+
+
+def deep_page(depth):
+    levels = ''.join(
+        f'<div class="level"><h3>Level {i}</h3><p>Paragraph at level {i} with <a href="/l/{i}">a link</a>.</p>'
+        f'<ul><li>first {i}</li><li>second {i}</li></ul>'
+        for i in range(depth)
+    )
+    return f'<!doctype html><html><head><title>Deep</title></head><body>{levels}{"</div>" * depth}</body></html>'
+
+
+def load_pages(depth):
+    pages = {}
+    for name in sorted(os.listdir(PAGES_DIR)):
+        with open(os.path.join(PAGES_DIR, name), encoding='utf-8') as f:
+            pages[name] = f.read()
+    if depth:
+        pages[f'deep ({depth} levels)'] = deep_page(depth)
+    return pages
+
+
+def rate(parse, html, seconds):
+    count, start = 0, time.perf_counter()
+    while True:
+        parse(html, URL)
+        count += 1
+        elapsed = time.perf_counter() - start
+        if elapsed >= seconds:
+            return count / elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--seconds', type=float, default=2.0, help='time per parser per page')
+    parser.add_argument('--depth', type=int, default=200, help='nesting of the generated deep page (0: skip it)')
+    args = parser.parse_args()
+
+    parsers = {
+        'soup': parse_page_soup,
+        'html.parser': lambda html, url: extract_page(html, url, parser='html.parser'),
+    }
+    if LXML_AVAILABLE:
+        parsers['lxml'] = lambda html, url: extract_page(html, url, parser='lxml')
+    else:
+        logger.info("lxml is not installed; pip install lxml to benchmark it\n")
+
+    pages = load_pages(args.depth)
+    for name, html in pages.items():
+        expected = parse_page_soup(html, URL)
+        for parser_name, parse in parsers.items():
+            if parse(html, URL) != expected:
+                logger.info("%s: %s output differs from soup", name, parser_name)
+
+    totals = dict.fromkeys(parsers, 0.0)
+    for name, html in pages.items():
+        logger.info("%s (%.1f KB)", name, len(html) / 1024)
+        base = None
+        for parser_name, parse in parsers.items():
+            per_sec = rate(parse, html, args.seconds)
+            base = base or per_sec
+            totals[parser_name] += 1 / per_sec
+            logger.info("  %-12s %8.0f pages/s  %8.0f KB/s  %5.1fx", parser_name, per_sec,
+                        per_sec * len(html) / 1024, per_sec / base)
+
+    logger.info("all pages, one of each:")
+    for parser_name, seconds in totals.items():
+        logger.info("  %-12s %8.0f pages/s  %5.1fx", parser_name, len(pages) / seconds, totals['soup'] / seconds)
+
+
+if __name__ == '__main__':
+    main()
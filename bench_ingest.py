@@ -0,0 +1,125 @@
+"""
+Benchmark knowledge ingestion: per-chunk path vs batched create_chunks().
+Run this with: python bench_ingest.py [--bot-id ID] [--size-kb 1024] [--qdrant]
+
+Both runs happen inside a transaction that is rolled back, so nothing is kept
+in the database. Without --qdrant the Qdrant URL/key are blanked so only
+embedding + DB time is measured.
+"""
+
+import os
+import random
+import time
+import argparse
+import django
+import logging
+
+# Setup Django
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'redbot.settings')
+django.setup()
+
+from django.db import models, transaction
+from bots.models import Bot
+from knowledge.models import KnowledgeSource, Chunk
+from knowledge.embeddings import embed_text, warm_up
+
+logging.basicConfig(level=logging.INFO, format='%(message)s')
+logger = logging.getLogger(__name__)
+
+
+class Rollback(Exception):
+    pass
+
+
+def make_text(size_kb: int) -> str:
+    rnd = random.Random(42)
+    vocab = [
+        "service", "pricing", "contact", "support", "delivery", "account", "hours",
+        "product", "warranty", "refund", "order", "shipping", "team", "office",
+        "booking", "appointment", "location", "policy", "update", "feature",
+    ]
+    words, size = [], 0
+    while size < size_kb * 1024:
+        w = rnd.choice(vocab)
+        words.append(w)
+        size += len(w) + 1
+    return " ".join(words)
+
+
+def new_source(bot, text):
+    ks = KnowledgeSource(bot=bot, title="bench-ingest", source_type='TEXT', content=text)
+    # Bypass KnowledgeSource.save() so chunking is only done by the timed code
+    models.Model.save(ks)
+    return ks
+
+
+def strip_qdrant(ks, use_qdrant):
+    if not use_qdrant:
+        ks.bot.workspace.qdrant_url = None
+        ks.bot.workspace.qdrant_api_key = None
+
+
+def run_legacy(bot, text, use_qdrant, chunk_size=500):
+    """Previous behaviour: one encode + one Chunk.save() (+ Qdrant push) per chunk."""
+    ks = new_source(bot, text)
+    strip_qdrant(ks, use_qdrant)
+    ws = ks.bot.workspace
+    words = text.split()
+    chunks = [" ".join(words[i:i + chunk_size]) for i in range(0, len(words), chunk_size)]
+    start = time.perf_counter()
+    for chunk_text in chunks:
+        Chunk.objects.create(
+            knowledge_source=ks,
+            text=chunk_text,
+            embedding=embed_text(chunk_text),
+            qdrant_url=ws.qdrant_url,
+            qdrant_api_key=ws.qdrant_api_key,
+        )
+    return len(chunks), time.perf_counter() - start
+
+
+def run_batched(bot, text, use_qdrant):
+    ks = new_source(bot, text)
+    strip_qdrant(ks, use_qdrant)
+    start = time.perf_counter()
+    ks.create_chunks()
+    elapsed = time.perf_counter() - start
+    return ks.chunks.count(), elapsed
+
+
+def timed(fn, *args):
+    result = None
+    try:
+        with transaction.atomic():
+            result = fn(*args)
+            raise Rollback()
+    except Rollback:
+        pass
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--bot-id', type=int)
+    parser.add_argument('--size-kb', type=int, default=1024)
+    parser.add_argument('--qdrant', action='store_true', help="Also push vectors to the workspace's Qdrant")
+    args = parser.parse_args()
+
+    bot = Bot.objects.get(id=args.bot_id) if args.bot_id else Bot.objects.first()
+    if not bot:
+        logger.error("No bots found in database!")
+        exit(1)
+
+    text = make_text(args.size_kb)
+    logger.info("Source: %s KB, %s words, bot=%s, qdrant=%s",
+                args.size_kb, len(text.split()), bot.id, args.qdrant)
+
+    warm_up()
+
+    for label, fn in (("per-chunk (before)", run_legacy), ("batched (after)", run_batched)):
+        n, elapsed = timed(fn, bot, text, args.qdrant)
+        logger.info("%-20s %5d chunks in %7.2fs -> %8.1f chunks/sec", label, n, elapsed, n / elapsed if elapsed else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,215 @@
+"""
+Benchmark AI provider calls against a local fake OpenAI/Anthropic-compatible server.
+Run this with: python bench_providers.py [--requests 200] [--concurrency 50] [--latency 0.5]
+           or: python bench_providers.py --serve --port 8765   (fake provider only)
+
+Compares three transports for the same chat-completions call:
+  fresh   - a bare requests.post per call (one new connection per chat turn)
+  pooled  - chat.services._call_provider on the shared keep-alive Session
+  async   - chat.services._acall_provider on the shared httpx.AsyncClient
+
+The fake server answers after --latency seconds (to mimic generation time)
+and counts the TCP connections it accepts. It speaks plain HTTP/1.1, so the
+async run measures pooling and concurrency, not HTTP/2 multiplexing (that
+needs TLS/ALPN against a real provider).
+
+With --serve, point the app at it with AI_PROVIDER_BASE_URL=http://127.0.0.1:PORT.
+"""
+
+import os
+import json
+import time
+import asyncio
+import argparse
+import threading
+import statistics
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import django
+import logging
+import requests
+
+# Setup Django
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'redbot.settings')
+django.setup()
+
+from django.conf import settings
+from chat import services
+from chat.provider_clients import aclose_clients, use_async_clients
+
+logging.basicConfig(level=logging.INFO, format='%(message)s')
+logger = logging.getLogger(__name__)
+
+ANSWER = "Our office is open 9am to 6pm, Monday to Saturday."
+
+
+class FakeProviderHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # keep-alive
+    latency = 0.5
+    token_delay = 0.02
+
+    def log_message(self, *args):
+        pass
+
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        try:
+            payload = json.loads(self.rfile.read(length) or b"{}")
+        except ValueError:
+            payload = {}
+        anthropic = self.path.startswith("/v1/messages")
+        time.sleep(self.latency)
+
+        if payload.get("stream"):
+            self._stream(anthropic)
+            return
+
+        if anthropic:
+            body = {"content": [{"type": "text", "text": ANSWER}],
+                    "usage": {"input_tokens": 120, "output_tokens": 14}}
+        else:
+            body = {"choices": [{"message": {"role": "assistant", "content": ANSWER}}],
+                    "usage": {"prompt_tokens": 120, "completion_tokens": 14, "total_tokens": 134}}
+        data = json.dumps(body).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _stream(self, anthropic):
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Connection", "close")
+        self.end_headers()
+        for word in ANSWER.split(" "):
+            token = word + " "
+            if anthropic:
+                event = {"type": "content_block_delta", "delta": {"type": "text_delta", "text": token}}
+            else:
+                event = {"choices": [{"delta": {"content": token}}]}
+            self.wfile.write(f"data: {json.dumps(event)}\n\n".encode())
+            self.wfile.flush()
+            time.sleep(self.token_delay)
+        if not anthropic:
+            self.wfile.write(b"data: [DONE]\n\n")
+        self.close_connection = True
+
+
+class CountingServer(ThreadingHTTPServer):
+    daemon_threads = True
+    request_queue_size = 512
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.connections = 0
+
+    def get_request(self):
+        conn = super().get_request()
+        self.connections += 1
+        return conn
+
+
+def start_fake_provider(port=0, latency=0.5):
+    FakeProviderHandler.latency = latency
+    server = CountingServer(("127.0.0.1", port), FakeProviderHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def summarize(name, latencies, elapsed, connections):
+    latencies = sorted(latencies)
+    p95 = latencies[int(len(latencies) * 0.95) - 1] if latencies else 0
+    logger.info(
+        "%-7s %4d req in %6.2fs  %7.1f req/s  p50 %5.0f ms  p95 %5.0f ms  %4d connections",
+        name, len(latencies), elapsed, len(latencies) / elapsed if elapsed else 0,
+        statistics.median(latencies) * 1000 if latencies else 0, p95 * 1000, connections,
+    )
+
+
+def run_threaded(call, n, concurrency):
+    latencies = []
+
+    def one(_):
+        t = time.perf_counter()
+        call()
+        latencies.append(time.perf_counter() - t)
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        list(pool.map(one, range(n)))
+    return latencies, time.perf_counter() - start
+
+
+async def run_async(acall, n, concurrency):
+    use_async_clients()  # this loop lives for the whole run, like the ASGI server's
+    latencies = []
+    sem = asyncio.Semaphore(concurrency)
+
+    async def one():
+        async with sem:
+            t = time.perf_counter()
+            await acall()
+            latencies.append(time.perf_counter() - t)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(one() for _ in range(n)))
+    elapsed = time.perf_counter() - start
+    await aclose_clients()
+    return latencies, elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--latency", type=float, default=0.5, help="fake generation time (s)")
+    parser.add_argument("--provider", default="openai", choices=["openai", "anthropic"])
+    parser.add_argument("--serve", action="store_true", help="only run the fake provider")
+    parser.add_argument("--port", type=int, default=0)
+    args = parser.parse_args()
+
+    server = start_fake_provider(args.port, args.latency)
+    base = f"http://127.0.0.1:{server.server_address[1]}"
+    if args.serve:
+        logger.info("Fake provider listening on %s (Ctrl+C to stop)", base)
+        try:
+            threading.Event().wait()
+        except KeyboardInterrupt:
+            return
+
+    settings.AI_PROVIDER_BASE_URL = base
+    prompt = services._build_prompt("What are your office hours?", "Office hours: 9am-6pm Mon-Sat.")
+    build, parse = services.PROVIDERS[args.provider]
+
+    def fresh():
+        url, headers, payload = build("test-key", "fake-model", prompt)
+        r = requests.post(url, json=payload, headers=headers, timeout=services.REQUEST_TIMEOUT)
+        r.raise_for_status()
+        return parse(r.json())
+
+    def pooled():
+        return services._call_provider(args.provider, "test-key", "fake-model", prompt)
+
+    async def acall():
+        return await services._acall_provider(args.provider, "test-key", "fake-model", prompt)
+
+    logger.info("%d requests, concurrency %d, provider latency %.2fs, provider=%s",
+                args.requests, args.concurrency, args.latency, args.provider)
+
+    for name, fn in (("fresh", fresh), ("pooled", pooled)):
+        before = server.connections
+        latencies, elapsed = run_threaded(fn, args.requests, args.concurrency)
+        summarize(name, latencies, elapsed, server.connections - before)
+
+    before = server.connections
+    latencies, elapsed = asyncio.run(run_async(acall, args.requests, args.concurrency))
+    summarize("async", latencies, elapsed, server.connections - before)
+    logger.info("(threaded runs hold one OS thread per in-flight call; the async run uses one)")
+
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -3,6 +3,19 @@ from django.db import models
 from django.db.models import Q
 from django.utils import timezone
 
+
+class PlanQuerySet(models.QuerySet):
+    def current(self, now=None):
+        """Plans active right now; the database-side twin of Plan.is_current_active."""
+        now = now or timezone.now()
+        return self.filter(
+            Q(active=True) & (
+                Q(term='LIFETIME')
+                | Q(term='LIMITED', end_at__isnull=False, start_at__lte=now, end_at__gte=now)
+            )
+        )
+
+
 class Plan(models.Model):
     BUNDLES = (
         ('FULL', 'Full (AI + Live + Q&A)'),
@@ -25,6 +38,8 @@ class Plan(models.Model):
     end_at = models.DateTimeField(null=True, blank=True, help_text="Required if term is LIMITED.")
     active = models.BooleanField(default=True, help_text="Set inactive to pause this plan immediately.")
 
+    objects = PlanQuerySet.as_manager()
+
     class Meta:
         constraints = [
             # Enforce at most one 'active' plan per workspace at a time
@@ -80,4 +95,15 @@ class Plan(models.Model):
     def save(self, *args, **kwargs):
         # Ensure model-level validation always runs
         self.full_clean()
-        super().save(*args, **kwargs)
\ No newline at end of file
+        super().save(*args, **kwargs)
+        self._reset_workspace_plan()
+
+    def delete(self, *args, **kwargs):
+        result = super().delete(*args, **kwargs)
+        self._reset_workspace_plan()
+        return result
+
+    def _reset_workspace_plan(self):
+        # Drop the memoised active_plan of the Workspace instance this plan hangs off
+        if Plan.workspace.is_cached(self):
+            self.workspace.reset_active_plan()
\ No newline at end of file
@@ -3,7 +3,9 @@ from django.contrib import admin
 from django import forms
 from django.utils.html import format_html
 
+from accounts.models import active_plan_prefetch
 from .models import Bot, BotFooter, BotEnquiry
+from . import runtime
 from .email import send_bot_activation_email
 
 
@@ -43,6 +45,11 @@ class BotAdmin(admin.ModelAdmin):
     readonly_fields = ['public_key']
     actions = ['enable_bots', 'disable_bots']
 
+    def get_queryset(self, request):
+        # workspace + current plans in two queries for the whole page
+        qs = super().get_queryset(request).select_related('workspace')
+        return qs.prefetch_related(active_plan_prefetch('workspace__plans'))
+
     def ai_display(self, obj):
         if obj.ai_provider and obj.ai_model:
             return f"{obj.ai_provider} / {obj.ai_model}"
@@ -88,6 +95,7 @@ class BotAdmin(admin.ModelAdmin):
     @admin.action(description="Enable selected bots")
     def enable_bots(self, request, queryset):
         updated = queryset.update(is_enabled=True)
+        runtime.invalidate_workspaces(queryset.values_list('workspace_id', flat=True))
         
         # Send notification emails to workspace owners
         for bot in queryset:
@@ -98,6 +106,7 @@ class BotAdmin(admin.ModelAdmin):
     @admin.action(description="Disable selected bots")
     def disable_bots(self, request, queryset):
         updated = queryset.update(is_enabled=False)
+        runtime.invalidate_workspaces(queryset.values_list('workspace_id', flat=True))
         self.message_user(request, f"Disabled {updated} bot(s).")
 
 
@@ -0,0 +1,264 @@
+# bots/runtime.py
+"""
+Cached runtime profile of a bot for the widget and chat endpoints.
+
+Every widget hit and chat turn needs the same handful of facts: is the bot
+enabled, which domains may embed it, what the workspace's plans cover, how
+the widget looks and which provider/model/key to call. Loading them costs
+Bot + Workspace + all Plans (+ BotFooter) per request. BotProfile is a frozen
+snapshot of exactly those fields, kept in-process per bot (LRU of
+BOT_PROFILE_MAX_BOTS) and looked up by public_key or bot_id.
+
+Saving or deleting a Bot, Workspace, Plan or BotFooter bumps the workspace's
+version in Django's cache (bots/signals.py) and profiles built under an
+older version are rebuilt on next use. As with the local vector index, a
+shared cache makes that immediate for every worker; with the default
+local-memory cache BOT_PROFILE_TTL bounds how stale another process can be
+(also the bound for queryset .update() calls, which send no signals).
+
+Profiles borrow the model methods (is_origin_allowed, get_default_bot_mode,
+is_current_active, ...) so their answers match the ORM objects exactly,
+including plan windows that open or close after the profile was built.
+"""
+import logging
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Optional
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import cache
+
+from accounts.models import Workspace
+from billing.models import Plan
+from .models import Bot
+
+logger = logging.getLogger(__name__)
+
+_profiles = OrderedDict()  # bot_id -> (BotProfile, version, built_at)
+_by_public_key = {}  # public_key -> bot_id
+_lock = threading.Lock()
+
+
+@dataclass(frozen=True)
+class PlanProfile:
+    bundle: str
+    term: str
+    start_at: object
+    end_at: object
+    active: bool
+
+    includes_ai = Plan.includes_ai
+    includes_live = Plan.includes_live
+    includes_qa = Plan.includes_qa
+    is_current_active = Plan.is_current_active
+
+    def get_bundle_display(self):
+        return dict(Plan.BUNDLES).get(self.bundle, self.bundle)
+
+
+@dataclass(frozen=True)
+class FooterProfile:
+    c_name: str
+    c_url: str
+
+
+@dataclass(frozen=True)
+class WorkspaceProfile:
+    id: int
+    name: str
+    approved: bool
+    bot_footer: bool
+    enable_enquiry_form: bool
+    enable_bot_widget: bool
+    enable_reset_button: bool
+    default_bot_mode: Optional[str]
+    whatsapp_number: Optional[str]
+    enable_whatsapp_number_in_chat: bool
+    plans: tuple  # PlanProfile, newest start_at first
+    footer: Optional[FooterProfile]
+
+    @property
+    def active_plan(self):
+        for p in self.plans:
+            if p.is_current_active:
+                return p
+        return None
+
+    is_operational = Workspace.is_operational
+    get_available_bot_modes = Workspace.get_available_bot_modes
+    get_default_bot_mode = Workspace.get_default_bot_mode
+
+
+@dataclass(frozen=True)
+class BotProfile:
+    id: int
+    public_key: str
+    name: str
+    preferred_mode: str
+    is_enabled: bool
+    allowed_domains: str
+    ai_provider: Optional[str]
+    ai_model: Optional[str]
+    _ai_api_key: Optional[bytes]  # still encrypted; ai_api_key decrypts on use
+    ui_primary_color: str
+    ui_bg_color: str
+    ui_font_family: str
+    ui_font_size: int
+    ui_welcome_message: str
+    ui_sound_enabled: bool
+    ui_animation_speed: str
+    ui_widget_position: str
+    workspace: WorkspaceProfile
+
+    @property
+    def workspace_id(self):
+        return self.workspace.id
+
+    @property
+    def active_plan(self):
+        return self.workspace.active_plan
+
+    ai_api_key = property(Bot.ai_api_key.fget)
+    plan_includes_ai = Bot.plan_includes_ai
+    plan_includes_live = Bot.plan_includes_live
+    plan_includes_qa = Bot.plan_includes_qa
+    is_operational = Bot.is_operational
+    parsed_allowed_domains = Bot.parsed_allowed_domains
+    is_origin_allowed = Bot.is_origin_allowed
+
+
+def _version_key(workspace_id):
+    return f"bot_profile_version:{workspace_id}"
+
+
+def invalidate_workspace(workspace_id):
+    """Mark every profile of the workspace's bots stale."""
+    if not workspace_id:
+        return
+    key = _version_key(workspace_id)
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.set(key, 1, timeout=None)
+    with _lock:
+        for bot_id in [b for b, (p, _, _) in _profiles.items() if p.workspace.id == workspace_id]:
+            _forget(bot_id)
+
+
+def invalidate_workspaces(workspace_ids):
+    """
+    invalidate_workspace() for many workspaces, e.g. after a queryset
+    .update() in an admin action, which sends no post_save for
+    bots/signals.py to see.
+    """
+    for workspace_id in set(workspace_ids):
+        invalidate_workspace(workspace_id)
+
+
+def _forget(bot_id):
+    entry = _profiles.pop(bot_id, None)
+    if entry:
+        _by_public_key.pop(entry[0].public_key, None)
+
+
+def build_profile(bot):
+    """Snapshot a Bot (and its workspace, plans and footer) as a BotProfile."""
+    ws = bot.workspace
+    plans = sorted(ws.plans.all(), key=lambda p: p.start_at, reverse=True)
+    footer = ws.bot_footers.first() if ws.bot_footer else None
+    return BotProfile(
+        id=bot.id,
+        public_key=bot.public_key,
+        name=bot.name,
+        preferred_mode=bot.preferred_mode,
+        is_enabled=bot.is_enabled,
+        allowed_domains=bot.allowed_domains,
+        ai_provider=bot.ai_provider,
+        ai_model=bot.ai_model,
+        _ai_api_key=bytes(bot._ai_api_key) if bot._ai_api_key else None,
+        ui_primary_color=bot.ui_primary_color,
+        ui_bg_color=bot.ui_bg_color,
+        ui_font_family=bot.ui_font_family,
+        ui_font_size=bot.ui_font_size,
+        ui_welcome_message=bot.ui_welcome_message,
+        ui_sound_enabled=bot.ui_sound_enabled,
+        ui_animation_speed=bot.ui_animation_speed,
+        ui_widget_position=bot.ui_widget_position,
+        workspace=WorkspaceProfile(
+            id=ws.id,
+            name=ws.name,
+            approved=ws.approved,
+            bot_footer=ws.bot_footer,
+            enable_enquiry_form=ws.enable_enquiry_form,
+            enable_bot_widget=ws.enable_bot_widget,
+            enable_reset_button=ws.enable_reset_button,
+            default_bot_mode=ws.default_bot_mode,
+            whatsapp_number=ws.whatsapp_number,
+            enable_whatsapp_number_in_chat=ws.enable_whatsapp_number_in_chat,
+            plans=tuple(
+                PlanProfile(bundle=p.bundle, term=p.term, start_at=p.start_at, end_at=p.end_at, active=p.active)
+                for p in plans
+            ),
+            footer=FooterProfile(c_name=footer.c_name, c_url=footer.c_url) if footer else None,
+        ),
+    )
+
+
+def _cached(bot_id, public_key):
+    if bot_id is None:
+        bot_id = _by_public_key.get(public_key)
+    entry = _profiles.get(bot_id) if bot_id is not None else None
+    if entry is None:
+        return None
+    profile, version, built_at = entry
+    if public_key is not None and profile.public_key != public_key:
+        return None
+    if time.monotonic() - built_at > getattr(settings, 'BOT_PROFILE_TTL', 60):
+        return None
+    return entry
+
+
+def _remember(profile, version):
+    with _lock:
+        _forget(profile.id)
+        _profiles[profile.id] = (profile, version, time.monotonic())
+        _by_public_key[profile.public_key] = profile.id
+        while len(_profiles) > getattr(settings, 'BOT_PROFILE_MAX_BOTS', 5000):
+            _forget(next(iter(_profiles)))
+
+
+def _load(bot_id, public_key):
+    lookup = {'id': bot_id} if bot_id is not None else {'public_key': public_key}
+    bot = Bot.objects.select_related('workspace').get(**lookup)
+    # Read the version first: a save racing with the build leaves us stale-marked
+    version = cache.get(_version_key(bot.workspace_id), 0)
+    profile = build_profile(bot)
+    _remember(profile, version)
+    return profile
+
+
+def get_profile(bot_id=None, public_key=None):
+    """
+    BotProfile for a bot id or public key; raises Bot.DoesNotExist.
+    A hit costs one cache read (the workspace version) and no queries.
+    """
+    if not getattr(settings, 'BOT_PROFILE_CACHE_ENABLED', True):
+        lookup = {'id': bot_id} if bot_id is not None else {'public_key': public_key}
+        return build_profile(Bot.objects.select_related('workspace').get(**lookup))
+
+    entry = _cached(bot_id, public_key)
+    if entry and cache.get(_version_key(entry[0].workspace.id), 0) == entry[1]:
+        return entry[0]
+    return _load(bot_id, public_key)
+
+
+async def aget_profile(bot_id=None, public_key=None):
+    """Async get_profile: hits stay on the event loop, misses load in a thread."""
+    if getattr(settings, 'BOT_PROFILE_CACHE_ENABLED', True):
+        entry = _cached(bot_id, public_key)
+        if entry and await cache.aget(_version_key(entry[0].workspace.id), 0) == entry[1]:
+            return entry[0]
+    return await sync_to_async(get_profile)(bot_id=bot_id, public_key=public_key)
@@ -0,0 +1,22 @@
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+from accounts.models import Workspace
+from billing.models import Plan
+from .models import Bot, BotFooter
+from . import runtime
+
+
+@receiver(post_save, sender=Bot)
+@receiver(post_delete, sender=Bot)
+@receiver(post_save, sender=Plan)
+@receiver(post_delete, sender=Plan)
+@receiver(post_save, sender=BotFooter)
+@receiver(post_delete, sender=BotFooter)
+def bot_profile_changed(sender, instance, **kwargs):
+    runtime.invalidate_workspace(instance.workspace_id)
+
+
+@receiver(post_save, sender=Workspace)
+@receiver(post_delete, sender=Workspace)
+def workspace_changed(sender, instance, **kwargs):
+    runtime.invalidate_workspace(instance.id)
@@ -0,0 +1,146 @@
+# chat/answer_cache.py
+"""
+Per-bot semantic answer cache for ChatAPI.
+
+A new question is answered from the cache when a previous question to the
+same bot has an embedding with cosine similarity >= ANSWER_CACHE_THRESHOLD,
+so near-duplicates ("pricing?" / "what is the pricing") skip retrieval and
+the paid LLM call.
+
+Entries are tied to the bot's knowledge version (bumped whenever its
+chunks change, see knowledge.local_index) and to its provider/model, so
+editing knowledge or switching ai_model makes old answers unreachable.
+That version lives in Django's cache: with a process-local backend (the
+default locmem) other workers only see their own edits, so entries then
+live at most LOCAL_INDEX_TTL, as the local index does.
+"""
+import logging
+import threading
+import time
+from collections import OrderedDict
+
+import numpy as np
+from django.conf import settings
+from django.core.cache import caches
+
+from knowledge.local_index import knowledge_version
+
+logger = logging.getLogger(__name__)
+
+_bots = OrderedDict()  # bot_id -> _BotAnswers
+_lock = threading.Lock()
+_stats = {"hits": 0, "misses": 0, "stores": 0}
+
+
+def _enabled():
+    return getattr(settings, "ANSWER_CACHE_ENABLED", True)
+
+
+def _threshold():
+    return getattr(settings, "ANSWER_CACHE_THRESHOLD", 0.95)
+
+
+def _ttl():
+    ttl = getattr(settings, "ANSWER_CACHE_TTL", 3600)
+    local_ttl = getattr(settings, "LOCAL_INDEX_TTL", 300)
+    if local_ttl and _process_local_cache():
+        ttl = min(ttl, local_ttl)
+    return ttl
+
+
+def _process_local_cache():
+    backend = type(caches["default"])
+    return backend.__module__ in ("django.core.cache.backends.locmem", "django.core.cache.backends.dummy")
+
+
+def _bot_version(bot):
+    return (knowledge_version(bot.id), bot.ai_provider or "", bot.ai_model or "")
+
+
+class _BotAnswers:
+    def __init__(self, version):
+        self.version = version
+        self.vectors = []  # normalised float32 vectors
+        self.answers = []  # (expires_at, answer, sources)
+
+    def lookup(self, q):
+        if not self.vectors:
+            return None
+        scores = np.vstack(self.vectors) @ q
+        best = int(np.argmax(scores))
+        if scores[best] < _threshold():
+            return None
+        expires, answer, sources = self.answers[best]
+        if expires < time.monotonic():
+            return None
+        return answer, sources, float(scores[best])
+
+    def add(self, q, answer, sources):
+        self.vectors.append(q)
+        self.answers.append((time.monotonic() + _ttl(), answer, sources))
+        max_entries = getattr(settings, "ANSWER_CACHE_MAX_PER_BOT", 200)
+        if len(self.vectors) > max_entries:
+            del self.vectors[0]
+            del self.answers[0]
+
+
+def _normalise(vector):
+    q = np.asarray(vector, dtype=np.float32)
+    n = np.linalg.norm(q)
+    return q / n if n else q
+
+
+def lookup(bot, query_vector):
+    """Return (answer_text, source_ids) for a near-duplicate question, or None."""
+    if not _enabled() or query_vector is None or len(query_vector) == 0:
+        return None
+    q = _normalise(query_vector)
+    version = _bot_version(bot)
+    with _lock:
+        entry = _bots.get(bot.id)
+        hit = None
+        if entry is not None:
+            if entry.version != version:
+                del _bots[bot.id]
+            else:
+                _bots.move_to_end(bot.id)
+                hit = entry.lookup(q)
+        _stats["hits" if hit else "misses"] += 1
+
+    if hit:
+        answer, sources, score = hit
+        logger.info("Answer cache hit bot=%s score=%.3f", bot.id, score)
+        return answer, sources
+    return None
+
+
+def store(bot, query_vector, answer_text, source_ids):
+    """Remember an answer; error replies are never cached."""
+    if not _enabled() or query_vector is None or len(query_vector) == 0:
+        return
+    if not answer_text or answer_text.startswith("⚠️"):
+        return
+    q = _normalise(query_vector)
+    version = _bot_version(bot)
+    with _lock:
+        entry = _bots.get(bot.id)
+        if entry is None or entry.version != version:
+            entry = _bots[bot.id] = _BotAnswers(version)
+        _bots.move_to_end(bot.id)
+        entry.add(q, answer_text, list(source_ids or []))
+        _stats["stores"] += 1
+        while len(_bots) > getattr(settings, "ANSWER_CACHE_MAX_BOTS", 100):
+            _bots.popitem(last=False)
+
+
+def invalidate(bot_id):
+    """Drop a bot's answers (wired to knowledge.local_index.knowledge_changed)."""
+    with _lock:
+        _bots.pop(bot_id, None)
+
+
+def stats():
+    """This process's hit/miss counters (served by chat.views.cache_stats)."""
+    with _lock:
+        lookups = _stats["hits"] + _stats["misses"]
+        return dict(_stats, bots=len(_bots), hit_rate=(_stats["hits"] / lookups) if lookups else 0.0)
@@ -113,21 +113,33 @@
 
 
 import json
+import asyncio
 import logging
-from collections import defaultdict
 from channels.generic.websocket import AsyncWebsocketConsumer
-from channels.db import database_sync_to_async
+from django.conf import settings
+from django.db import DatabaseError
 from django.utils import timezone
 from .models import Conversation, Message
+from .live_events import chat_message_event
 from bots.models import Bot
+from bots.runtime import aget_profile
+from . import presence
 
 logger = logging.getLogger(__name__)
 
-# Track active dashboard agents per bot
-ACTIVE_AGENTS = defaultdict(set)
+
+def typing_throttle():
+    return getattr(settings, 'TYPING_THROTTLE', 2.0)
+
+
+def typing_idle():
+    return getattr(settings, 'TYPING_IDLE', 3.0)
 
 
 class ChatConsumer(AsyncWebsocketConsumer):
+    typing_task = None
+    typing_sent_at = float('-inf')
+    typing_until = 0.0
 
     async def connect(self):
         self.public_key = self.scope['url_route']['kwargs']['public_key']
@@ -166,19 +178,28 @@ class ChatConsumer(AsyncWebsocketConsumer):
 
         logger.debug("Connected: %s", self.room_group_name)
 
-        # Register agent as online
+        await self.load_conversation()
+
+        # Register agent as online (shared across workers, see chat/presence.py)
         if self.is_agent:
-            ACTIVE_AGENTS[self.public_key].add(self.channel_name)
+            await presence.agent_heartbeat(self.public_key, self.channel_name)
             await self.broadcast_status(True)
-        
+
         # Send current status to the new connection
-        is_online = bool(ACTIVE_AGENTS[self.public_key])
+        self.agent_online = await presence.is_agent_online(self.public_key)
         await self.send(text_data=json.dumps({
             'type': 'agent_status',
-            'online': is_online
+            'online': self.agent_online
         }))
+        self.presence_task = asyncio.create_task(self.presence_loop())
 
     async def disconnect(self, close_code):
+        task = getattr(self, 'presence_task', None)
+        if task:
+            task.cancel()
+        if self.typing_task and not self.typing_task.done():
+            self.typing_task.cancel()
+            await self.send_typing(False)
 
         # Leave chat group
         await self.channel_layer.group_discard(
@@ -192,11 +213,11 @@ class ChatConsumer(AsyncWebsocketConsumer):
             self.channel_name
         )
 
-        # Handle agent disconnect
+        # Handle agent disconnect; other agents may still be online elsewhere
         if self.is_agent:
-            ACTIVE_AGENTS[self.public_key].discard(self.channel_name)
+            await presence.agent_left(self.public_key, self.channel_name)
 
-            if not ACTIVE_AGENTS[self.public_key]:
+            if not await presence.is_agent_online(self.public_key):
                 await self.broadcast_status(False)
 
         logger.debug("Disconnected: %s (%s)", self.room_group_name, close_code)
@@ -212,17 +233,11 @@ class ChatConsumer(AsyncWebsocketConsumer):
 
             if msg_type == 'chat_message' and text:
                 sender = data.get('sender', 'USER')
+                self.reset_typing()  # the message itself clears the indicator
                 await self.save_message(text, sender)
             
             elif msg_type == 'typing':
-                await self.channel_layer.group_send(
-                    self.room_group_name,
-                    {
-                        'type': 'chat_typing',
-                        'sender': data.get('sender', 'USER'),
-                        'agent_name': data.get('agent_name', 'Bot')
-                    }
-                )
+                await self.throttle_typing(data.get('sender', 'USER'), data.get('agent_name', 'Bot'))
 
         except json.JSONDecodeError as e:
             await self.send(text_data=json.dumps({
@@ -246,21 +261,88 @@ class ChatConsumer(AsyncWebsocketConsumer):
             'timestamp': event.get('timestamp')
         }))
 
+    async def chat_message_delta(self, event):
+        # Partial AI answer while it streams; the full chat_message follows
+        await self.send(text_data=json.dumps({
+            'type': 'chat_message_delta',
+            'stream_id': event['stream_id'],
+            'delta': event['delta'],
+            'sender': event.get('sender', 'BOT')
+        }))
+
     async def chat_typing(self, event):
         await self.send(text_data=json.dumps({
             'type': 'typing',
             'sender': event['sender'],
-            'agent_name': event['agent_name']
+            'agent_name': event['agent_name'],
+            'typing': event.get('typing', True)
         }))
 
+    # ===============================
+    # TYPING (throttled + trailing stop)
+    # ===============================
+    async def throttle_typing(self, sender, agent_name):
+        """
+        Coalesce keystroke events: at most one 'typing' group event per
+        TYPING_THROTTLE seconds from this socket, and one 'stopped'
+        (typing: false) once nothing arrived for TYPING_IDLE seconds.
+        """
+        now = asyncio.get_running_loop().time()
+        self.typing_from = (sender, agent_name)
+        self.typing_until = now + typing_idle()
+        if now - self.typing_sent_at >= typing_throttle():
+            self.typing_sent_at = now
+            await self.send_typing(True)
+        if self.typing_task is None or self.typing_task.done():
+            self.typing_task = asyncio.create_task(self.typing_watch())
+
+    async def typing_watch(self):
+        loop = asyncio.get_running_loop()
+        # throttle_typing() only moves the deadline; one task per burst, not per keystroke
+        while (delay := self.typing_until - loop.time()) > 0:
+            await asyncio.sleep(delay)
+        self.typing_sent_at = float('-inf')
+        await self.send_typing(False)
+
+    def reset_typing(self):
+        if self.typing_task and not self.typing_task.done():
+            self.typing_task.cancel()
+        self.typing_sent_at = float('-inf')
+
+    async def send_typing(self, typing):
+        sender, agent_name = self.typing_from
+        await self.channel_layer.group_send(
+            self.room_group_name,
+            {
+                'type': 'chat_typing',
+                'sender': sender,
+                'agent_name': agent_name,
+                'typing': typing
+            }
+        )
+
     # ===============================
     # STATUS BROADCAST HANDLER
     # ===============================
-    async def bot_status(self, event):
-        await self.send(text_data=json.dumps({
-            'type': 'status',
-            'online': event['online']
-        }))
+    async def presence_loop(self):
+        """
+        Refresh this agent's presence entry and pick up status changes no
+        broadcast announced (an agent's worker died and its entry expired).
+        """
+        while True:
+            await asyncio.sleep(presence.heartbeat_interval())
+            try:
+                if self.is_agent:
+                    await presence.agent_heartbeat(self.public_key, self.channel_name)
+                online = await presence.is_agent_online(self.public_key)
+                if online != self.agent_online:
+                    self.agent_online = online
+                    await self.send(text_data=json.dumps({
+                        'type': 'agent_status',
+                        'online': online
+                    }))
+            except Exception as e:
+                logger.warning("Presence heartbeat failed for %s: %s", self.public_key, e)
 
     async def broadcast_status(self, online):
         await self.channel_layer.group_send(
@@ -272,6 +354,7 @@ class ChatConsumer(AsyncWebsocketConsumer):
         )
 
     async def bot_status(self, event):
+        self.agent_online = event['online']
         await self.send(text_data=json.dumps({
             'type': 'agent_status',
             'online': event['online']
@@ -280,27 +363,51 @@ class ChatConsumer(AsyncWebsocketConsumer):
     # ===============================
     # DATABASE SAVE
     # ===============================
-    @database_sync_to_async
-    def save_message(self, text, sender):
+    async def load_conversation(self):
+        """
+        Resolve the bot (cached runtime profile) and an existing conversation
+        once per connection; the conversation is created on the first message.
+        """
+        self.conversation = None
         try:
-            bot = Bot.objects.get(public_key=self.public_key)
-
-            conversation, created = Conversation.objects.get_or_create(
-                bot=bot,
+            self.bot = await aget_profile(public_key=self.public_key)
+        except Bot.DoesNotExist:
+            self.bot = None
+            return
+        self.conversation = await Conversation.objects.filter(
+            bot_id=self.bot.id,
+            session_id=self.session_id
+        ).order_by('id').afirst()
+
+    async def save_message(self, text, sender):
+        if self.bot is None:
+            raise Exception("Bot not found")
+        try:
+            return await self._save_message(text, sender)
+        except DatabaseError:
+            # Conversation deleted (e.g. from the dashboard) while connected
+            self.conversation = None
+            return await self._save_message(text, sender)
+
+    async def _save_message(self, text, sender):
+        if self.conversation is None:
+            self.conversation, created = await Conversation.objects.aget_or_create(
+                bot_id=self.bot.id,
                 session_id=self.session_id
             )
 
-            if sender == 'USER' and conversation.effective_mode != 'LIVE':
-                conversation.effective_mode = 'LIVE'
-                conversation.save()
-
-            message = Message.objects.create(
-                conversation=conversation,
-                sender=sender,
-                text=text
-            )
+        # Conversations only ever switch to LIVE, so the cached mode can't be stale the other way
+        if sender == 'USER' and self.conversation.effective_mode != 'LIVE':
+            self.conversation.effective_mode = 'LIVE'
+            await self.conversation.asave(update_fields=['effective_mode'])
 
-            return message
+        message = Message(
+            conversation=self.conversation,
+            sender=sender,
+            text=text
+        )
+        message.skip_broadcast = True  # broadcast below, straight from this event loop
+        await message.asave()
 
-        except Bot.DoesNotExist:
-            raise Exception("Bot not found")
+        await self.channel_layer.group_send(self.room_group_name, chat_message_event(message))
+        return message
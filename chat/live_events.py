@@ -0,0 +1,100 @@
+# chat/live_events.py
+"""
+Conversation events over the channel layer, for HTTP clients.
+
+broadcast_message (chat/signals.py) group_sends every new Message to
+`chat_{public_key}_{session_id}`; ChatConsumer relays that to WebSockets and
+ConversationListener lets a long-poll / SSE view wait on the same group, so
+idle live-chat widgets cost no DB queries until something is actually said.
+"""
+import asyncio
+import logging
+
+from channels.layers import get_channel_layer
+
+from .models import Message
+
+logger = logging.getLogger(__name__)
+
+
+def conversation_group(public_key, session_id):
+    return f'chat_{public_key}_{session_id}'
+
+
+def serialize_message(msg):
+    return {
+        'id': msg.id,
+        'sender': msg.sender,
+        'text': msg.text,
+        'timestamp': msg.timestamp.isoformat(),
+        'sources': msg.sources
+    }
+
+
+def chat_message_event(msg):
+    """Group event announcing a new Message (ChatConsumer.chat_message + HTTP listeners)."""
+    return {
+        'type': 'chat_message',
+        'text': msg.text,
+        'sender': msg.sender,
+        'timestamp': str(msg.timestamp),
+        # Full row for HTTP long-poll/SSE listeners
+        'message': serialize_message(msg)
+    }
+
+
+async def messages_after(public_key, session_id, last_id=0):
+    """Messages of the conversation newer than last_id (one query, no Bot/Conversation loads)."""
+    qs = Message.objects.filter(
+        conversation__bot__public_key=public_key,
+        conversation__session_id=session_id,
+        id__gt=last_id,
+    ).order_by('id')
+    return [serialize_message(m) async for m in qs]
+
+
+class ConversationListener:
+    """
+    Async context manager subscribing a private channel to a conversation
+    group. receive() returns the next serialized message, or None on timeout.
+    """
+
+    def __init__(self, public_key, session_id):
+        self.group = conversation_group(public_key, session_id)
+        self.channel_layer = get_channel_layer()
+        self.channel = None
+
+    async def __aenter__(self):
+        self.channel = await self.channel_layer.new_channel()
+        await self.channel_layer.group_add(self.group, self.channel)
+        return self
+
+    async def __aexit__(self, *exc):
+        try:
+            await self.channel_layer.group_discard(self.group, self.channel)
+        except Exception as e:
+            logger.debug("group_discard failed for %s: %s", self.group, e)
+
+    async def receive(self, timeout):
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + timeout
+        while True:
+            remaining = deadline - loop.time()
+            if remaining <= 0:
+                return None
+            try:
+                event = await asyncio.wait_for(self.channel_layer.receive(self.channel), remaining)
+            except asyncio.TimeoutError:
+                return None
+            # Typing / streaming-delta events share the group; only whole messages count here
+            if event.get('type') == 'chat_message' and event.get('message'):
+                return event['message']
+
+    async def drain(self, timeout=0.05):
+        """Collect messages that arrive right behind the first one (e.g. USER then BOT)."""
+        messages = []
+        while True:
+            msg = await self.receive(timeout)
+            if msg is None:
+                return messages
+            messages.append(msg)
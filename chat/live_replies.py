@@ -0,0 +1,203 @@
+# chat/live_replies.py
+"""
+Background AI replies for the live-chat widget (embed live/send).
+
+live_chat_send saves the visitor's message and returns at once; the bot
+reply is generated here and saved as a BOT Message, so broadcast_message
+delivers it to the WebSocket, long-poll and SSE clients like any other
+message.
+
+LIVE_REPLY_BACKEND:
+  'async'  - asyncio task on the ASGI server loop (async provider client);
+             requests served under WSGI fall back to 'thread'
+  'thread' - a small in-process thread pool (LIVE_REPLY_THREADS)
+  'celery' - chat.tasks.live_chat_reply on a Celery worker
+
+At most LIVE_REPLY_MAX_PER_WORKSPACE replies per workspace are generated at
+once. Slots are cache keys taken with cache.add(), so with a shared cache
+the limit holds across processes and Celery workers; a slot left behind by
+a crashed process expires after LIVE_REPLY_SLOT_TTL. Replies wait up to
+LIVE_REPLY_QUEUE_TIMEOUT for a slot before the visitor is told to retry.
+"""
+import asyncio
+import contextvars
+import json
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import cache
+from django.core.exceptions import ObjectDoesNotExist
+from django.db import IntegrityError
+
+from bots.runtime import aget_profile, get_profile
+from .models import Message
+from .services import aget_ai_response, get_ai_response
+
+logger = logging.getLogger(__name__)
+
+BUSY_MESSAGE = "⚠️ We're answering a lot of chats right now. Please try again in a moment."
+
+# The bot (DoesNotExist) or conversation (IntegrityError on save) was deleted
+# between scheduling the reply and running it
+GONE_ERRORS = (ObjectDoesNotExist, IntegrityError)
+
+_tasks = set()  # keep asyncio tasks referenced until they finish
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def _max_per_workspace():
+    return getattr(settings, 'LIVE_REPLY_MAX_PER_WORKSPACE', 2)
+
+
+def acquire_slot(workspace_id):
+    """Take a free reply slot for the workspace; returns its key or None."""
+    ttl = getattr(settings, 'LIVE_REPLY_SLOT_TTL', 120)
+    for i in range(_max_per_workspace()):
+        key = f'live_reply_slot:{workspace_id}:{i}'
+        if cache.add(key, 1, timeout=ttl):
+            return key
+    return None
+
+
+def release_slot(key):
+    cache.delete(key)
+
+
+def save_reply(conversation_id, result, source_ids):
+    usage = result.get("usage") or {}
+    Message.objects.create(
+        conversation_id=conversation_id,
+        sender='BOT',
+        text=result.get("text", ""),
+        sources=json.dumps(source_ids) if source_ids else '',
+        prompt_tokens=usage.get("prompt_tokens"),
+        completion_tokens=usage.get("completion_tokens"),
+        total_tokens=usage.get("total_tokens")
+    )
+
+
+def generate_reply(bot, conversation_id, text):
+    """Retrieve, call the provider and save the BOT message (caller holds a slot)."""
+    from .views import get_relevant_data
+
+    try:
+        retrieved_data, source_ids = get_relevant_data(bot, text, top_k=1)
+        result = get_ai_response(
+            user_question=text,
+            retrieved_data=retrieved_data,
+            api_key=bot.ai_api_key,
+            model=bot.ai_model,
+            bot_id=bot.id,
+        )
+    except Exception as e:
+        logger.error("AI generation failed: %s", e)
+        return
+    save_reply(conversation_id, result, source_ids)
+
+
+async def agenerate_reply(bot, conversation_id, text):
+    """Async generate_reply: the provider call is awaited, not run in a thread."""
+    from .views import get_relevant_data
+
+    try:
+        retrieved_data, source_ids = await sync_to_async(get_relevant_data)(bot, text, top_k=1)
+        result = await aget_ai_response(
+            user_question=text,
+            retrieved_data=retrieved_data,
+            api_key=bot.ai_api_key,
+            model=bot.ai_model,
+            bot_id=bot.id,
+        )
+    except Exception as e:
+        logger.error("AI generation failed: %s", e)
+        return
+    await sync_to_async(save_reply)(conversation_id, result, source_ids)
+
+
+def _reply_in_thread(bot_id, conversation_id, text):
+    slot = None
+    try:
+        bot = get_profile(bot_id=bot_id)
+        deadline = time.monotonic() + getattr(settings, 'LIVE_REPLY_QUEUE_TIMEOUT', 60)
+        slot = acquire_slot(bot.workspace_id)
+        while slot is None:
+            if time.monotonic() > deadline:
+                logger.warning("Live reply for conversation %s dropped: workspace %s busy", conversation_id, bot.workspace_id)
+                save_reply(conversation_id, {"text": BUSY_MESSAGE}, [])
+                return
+            time.sleep(getattr(settings, 'LIVE_REPLY_RETRY_DELAY', 0.5))
+            slot = acquire_slot(bot.workspace_id)
+        generate_reply(bot, conversation_id, text)
+    except GONE_ERRORS as e:
+        logger.warning("Live reply for conversation %s dropped: bot %s or conversation deleted (%s)", conversation_id, bot_id, e)
+    finally:
+        if slot is not None:
+            release_slot(slot)
+
+
+async def _reply_in_loop(bot_id, conversation_id, text):
+    slot = None
+    try:
+        bot = await aget_profile(bot_id=bot_id)
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + getattr(settings, 'LIVE_REPLY_QUEUE_TIMEOUT', 60)
+        slot = await sync_to_async(acquire_slot)(bot.workspace_id)
+        while slot is None:
+            if loop.time() > deadline:
+                logger.warning("Live reply for conversation %s dropped: workspace %s busy", conversation_id, bot.workspace_id)
+                await sync_to_async(save_reply)(conversation_id, {"text": BUSY_MESSAGE}, [])
+                return
+            await asyncio.sleep(getattr(settings, 'LIVE_REPLY_RETRY_DELAY', 0.5))
+            slot = await sync_to_async(acquire_slot)(bot.workspace_id)
+        await agenerate_reply(bot, conversation_id, text)
+    except GONE_ERRORS as e:
+        logger.warning("Live reply for conversation %s dropped: bot %s or conversation deleted (%s)", conversation_id, bot_id, e)
+    finally:
+        if slot is not None:
+            await sync_to_async(release_slot)(slot)
+
+
+def _reply_done(task):
+    _tasks.discard(task)
+    if not task.cancelled() and task.exception() is not None:
+        logger.error("Live reply failed: %r", task.exception())
+
+
+def _thread_pool():
+    global _executor
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                _executor = ThreadPoolExecutor(
+                    max_workers=getattr(settings, 'LIVE_REPLY_THREADS', 8),
+                    thread_name_prefix='live-reply',
+                )
+    return _executor
+
+
+def schedule_reply(bot, conversation_id, text, on_server_loop=False):
+    """
+    Hand the bot reply for a visitor message to the configured backend.
+    on_server_loop: the caller runs on the ASGI server's event loop, which
+    outlives the request (under WSGI the view's loop is torn down with it).
+    """
+    backend = getattr(settings, 'LIVE_REPLY_BACKEND', 'async')
+    if backend == 'celery':
+        from .tasks import live_chat_reply
+        live_chat_reply.delay(bot.id, conversation_id, text)
+    elif backend == 'async' and on_server_loop:
+        # Fresh context: the request's ThreadSensitiveContext (and its sync
+        # thread) is gone once the response is sent, but the reply isn't
+        loop = asyncio.get_running_loop()
+        task = contextvars.Context().run(loop.create_task, _reply_in_loop(bot.id, conversation_id, text))
+        _tasks.add(task)
+        task.add_done_callback(_reply_done)
+    elif backend in ('async', 'thread'):
+        _thread_pool().submit(_reply_in_thread, bot.id, conversation_id, text)
+    else:
+        raise ValueError(f"Unknown LIVE_REPLY_BACKEND: {backend}")
@@ -0,0 +1,30 @@
+# chat/management/commands/backfill_conversation_summaries.py
+"""
+Recompute Conversation.last_message_at / last_message_preview / message_count /
+unread_count from the messages table.
+
+Migration chat.0004 fills them once for existing conversations; run this
+whenever the columns may have drifted, e.g. after deleting messages by hand.
+"""
+from django.core.management.base import BaseCommand
+
+from chat.models import Conversation, Message, backfill_conversation_summaries
+
+
+class Command(BaseCommand):
+    help = "Backfill the denormalised conversation summary columns from messages."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500)
+        parser.add_argument('--bot', type=int, help='only conversations of this bot id')
+
+    def handle(self, *args, **options):
+        conversations = Conversation.objects.all()
+        if options['bot']:
+            conversations = conversations.filter(bot_id=options['bot'])
+
+        updated = backfill_conversation_summaries(
+            Conversation, Message, conversations, batch_size=options['batch_size'],
+            progress=lambda n: self.stdout.write(f"  {n} conversations..."),
+        )
+        self.stdout.write(self.style.SUCCESS(f"Backfilled {updated} conversations."))
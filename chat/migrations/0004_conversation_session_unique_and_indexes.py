@@ -0,0 +1,63 @@
+# Generated by Django 5.0.7 on 2026-10-18 06:32
+
+from django.db import migrations, models
+from django.db.models import Count, Min
+
+from chat.models import backfill_conversation_summaries
+
+
+def merge_duplicate_sessions(apps, schema_editor):
+    """
+    Racing get_or_create calls could create several conversations for one
+    (bot, session_id). Fold them into the oldest before the constraint goes on.
+    """
+    Conversation = apps.get_model('chat', 'Conversation')
+    Message = apps.get_model('chat', 'Message')
+    duplicates = (
+        Conversation.objects.values('bot_id', 'session_id')
+        .annotate(n=Count('id'), keep=Min('id')).filter(n__gt=1)
+    )
+    for dup in duplicates.iterator():
+        others = Conversation.objects.filter(
+            bot_id=dup['bot_id'], session_id=dup['session_id']
+        ).exclude(id=dup['keep'])
+        if others.filter(effective_mode='LIVE').exists():
+            Conversation.objects.filter(id=dup['keep']).update(effective_mode='LIVE')
+        Message.objects.filter(conversation__in=others).update(conversation_id=dup['keep'])
+        others.delete()
+
+
+def fill_summaries(apps, schema_editor):
+    """Summary columns (0003) of conversations from before Message.save() kept them."""
+    Conversation = apps.get_model('chat', 'Conversation')
+    Message = apps.get_model('chat', 'Message')
+    backfill_conversation_summaries(Conversation, Message)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bots', '0012_botenquiry'),
+        ('chat', '0003_conversation_summary'),
+    ]
+
+    operations = [
+        migrations.RunPython(merge_duplicate_sessions, migrations.RunPython.noop),
+        migrations.RunPython(fill_summaries, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='conversation',
+            index=models.Index(fields=['bot', 'created_at'], name='chat_conv_bot_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='message',
+            index=models.Index(fields=['conversation', 'id'], name='chat_msg_conv_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='message',
+            index=models.Index(fields=['conversation', 'timestamp'], name='chat_msg_conv_ts_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='conversation',
+            constraint=models.UniqueConstraint(fields=('bot', 'session_id'), name='unique_conversation_per_session'),
+        ),
+    ]
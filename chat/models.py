@@ -1,21 +1,43 @@
-from django.db import models
+from django.db import models, transaction
+from django.db.models import Case, Count, F, Max, OuterRef, Q, Subquery, Value, When
 from bots.models import Bot
 
+PREVIEW_LENGTH = 255
+
+
 class Conversation(models.Model):
     bot = models.ForeignKey(Bot, on_delete=models.CASCADE)
     session_id = models.CharField(max_length=255)  # Unique per user session
     effective_mode = models.CharField(max_length=10, default='AI')
     created_at = models.DateTimeField(auto_now_add=True)
 
+    # Inbox summary, kept up to date by Message.save() (filled for old rows by migration 0004)
+    last_message_at = models.DateTimeField(null=True, blank=True)
+    last_message_preview = models.CharField(max_length=PREVIEW_LENGTH, blank=True, default='')
+    message_count = models.PositiveIntegerField(default=0)
+    unread_count = models.PositiveIntegerField(default=0, help_text="Visitor messages the agent hasn't opened yet")
+
+    class Meta:
+        constraints = [
+            # One conversation per widget session: get_or_create on every turn relies on it
+            models.UniqueConstraint(fields=['bot', 'session_id'], name='unique_conversation_per_session')
+        ]
+        indexes = [
+            models.Index(fields=['bot', 'created_at'], name='chat_conv_bot_created_idx'),
+        ]
+
     @property
     def last_message(self):
-        msg = self.message_set.order_by('-timestamp').first()
-        return msg.text if msg else None
+        return self.last_message_preview or None
 
     @property
     def updated_at(self):
-        msg = self.message_set.order_by('-timestamp').first()
-        return msg.timestamp if msg else self.created_at
+        return self.last_message_at or self.created_at
+
+    def mark_read(self):
+        if self.unread_count:
+            Conversation.objects.filter(pk=self.pk).update(unread_count=0)
+            self.unread_count = 0
 
 class Message(models.Model):
     conversation = models.ForeignKey(Conversation, on_delete=models.CASCADE)
@@ -31,6 +53,77 @@ class Message(models.Model):
     
     def __str__(self):
         return f"{self.sender}: {self.text[:50]}"
+
+    def save(self, *args, **kwargs):
+        if not self._state.adding:
+            return super().save(*args, **kwargs)
+        # Insert and summary update commit together, so the counters never drift
+        with transaction.atomic(using=kwargs.get('using')):
+            super().save(*args, **kwargs)
+            self._update_conversation_summary()
+
+    def _update_conversation_summary(self):
+        # One UPDATE with F() expressions: concurrent writers can't lose
+        # increments, and an older message saved late can't take over the preview
+        newer = Q(last_message_at__isnull=True) | Q(last_message_at__lte=self.timestamp)
+        changes = {
+            'last_message_at': Case(When(newer, then=Value(self.timestamp)), default=F('last_message_at')),
+            'last_message_preview': Case(
+                When(newer, then=Value(self.text[:PREVIEW_LENGTH])), default=F('last_message_preview')
+            ),
+            'message_count': F('message_count') + 1,
+        }
+        if self.sender == 'USER':
+            changes['unread_count'] = F('unread_count') + 1
+        Conversation.objects.filter(pk=self.conversation_id).update(**changes)
     
     class Meta:
-        ordering = ['timestamp']
\ No newline at end of file
+        ordering = ['timestamp']
+        indexes = [
+            # Tail reads (id__gt=last_id) and transcripts (ORDER BY timestamp) per conversation
+            models.Index(fields=['conversation', 'id'], name='chat_msg_conv_id_idx'),
+            models.Index(fields=['conversation', 'timestamp'], name='chat_msg_conv_ts_idx'),
+        ]
+
+
+def backfill_conversation_summaries(Conversation, Message, conversations=None, batch_size=500, progress=None):
+    """
+    Recompute the summary columns of conversations (default: all) from the
+    messages table. Takes the model classes so migrations can pass their
+    historical models. Without a read marker in old data, unread is taken as
+    the visitor messages after the last bot/agent reply. Returns the count.
+    """
+    latest = Message.objects.filter(conversation=OuterRef('pk')).order_by('-timestamp', '-id')
+    last_reply = Message.objects.filter(conversation=OuterRef('pk'), sender='BOT').order_by('-timestamp', '-id')
+    if conversations is None:
+        conversations = Conversation.objects.all()
+    conversations = conversations.order_by('pk')
+
+    updated, last_pk = 0, 0
+    while True:
+        batch = list(
+            conversations.filter(pk__gt=last_pk)
+            .annotate(
+                n_messages=Count('message'),
+                latest_at=Max('message__timestamp'),
+                latest_text=Subquery(latest.values('text')[:1]),
+                last_reply_at=Subquery(last_reply.values('timestamp')[:1]),
+            )
+            .annotate(n_unread=Count('message', filter=Q(message__sender='USER') & (
+                Q(last_reply_at__isnull=True) | Q(message__timestamp__gt=F('last_reply_at'))
+            )))[:batch_size]
+        )
+        if not batch:
+            return updated
+        for conv in batch:
+            conv.last_message_at = conv.latest_at
+            conv.last_message_preview = (conv.latest_text or '')[:PREVIEW_LENGTH]
+            conv.message_count = conv.n_messages
+            conv.unread_count = conv.n_unread
+        Conversation.objects.bulk_update(
+            batch, ['last_message_at', 'last_message_preview', 'message_count', 'unread_count']
+        )
+        updated += len(batch)
+        last_pk = batch[-1].pk
+        if progress:
+            progress(updated)
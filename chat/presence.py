@@ -0,0 +1,164 @@
+# chat/presence.py
+"""
+Dashboard-agent presence shared by all ASGI workers.
+
+Each agent WebSocket registers its channel name under the bot's public key
+and refreshes it every AGENT_PRESENCE_HEARTBEAT seconds; entries expire
+after AGENT_PRESENCE_TTL, so a crashed worker's agents drop out on their
+own. "Online" means at least one unexpired entry, whichever process holds it.
+
+Backends (AGENT_PRESENCE_BACKEND):
+  'redis' - one sorted set per bot scored by expiry (atomic, recommended)
+  'cache' - a Django cache alias (AGENT_PRESENCE_CACHE); must be shared
+            between processes (Redis/Memcached/DB), not locmem
+  'local' - in-process dict; single worker or tests only
+"""
+import asyncio
+import logging
+import time
+import weakref
+
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+KEY_PREFIX = 'agent_presence'
+
+
+def presence_ttl():
+    return getattr(settings, 'AGENT_PRESENCE_TTL', 30)
+
+
+def heartbeat_interval():
+    return getattr(settings, 'AGENT_PRESENCE_HEARTBEAT', 10)
+
+
+class LocalPresenceBackend:
+    """In-process stand-in with the same TTL semantics as the shared backends."""
+
+    def __init__(self):
+        self._agents = {}  # public_key -> {channel_name: expires_at}
+
+    def _live(self, public_key):
+        now = time.time()
+        agents = self._agents.get(public_key, {})
+        for channel in [c for c, exp in agents.items() if exp <= now]:
+            del agents[channel]
+        return agents
+
+    async def touch(self, public_key, channel_name, ttl):
+        self._agents.setdefault(public_key, {})[channel_name] = time.time() + ttl
+
+    async def remove(self, public_key, channel_name):
+        self._agents.get(public_key, {}).pop(channel_name, None)
+
+    async def count(self, public_key):
+        return len(self._live(public_key))
+
+
+class CachePresenceBackend:
+    """
+    One cache entry per bot holding {channel_name: expires_at}. Updates are
+    read-modify-write, so two agents of one bot connecting at the same instant
+    can overwrite each other; the next heartbeat repairs it.
+    """
+
+    def __init__(self, alias='default'):
+        from django.core.cache import caches
+        self.cache = caches[alias]
+
+    def _key(self, public_key):
+        return f'{KEY_PREFIX}:{public_key}'
+
+    async def _load(self, public_key):
+        now = time.time()
+        agents = await self.cache.aget(self._key(public_key)) or {}
+        return {c: exp for c, exp in agents.items() if exp > now}
+
+    async def touch(self, public_key, channel_name, ttl):
+        agents = await self._load(public_key)
+        agents[channel_name] = time.time() + ttl
+        await self.cache.aset(self._key(public_key), agents, timeout=ttl * 2)
+
+    async def remove(self, public_key, channel_name):
+        agents = await self._load(public_key)
+        if agents.pop(channel_name, None) is not None:
+            await self.cache.aset(self._key(public_key), agents, timeout=presence_ttl() * 2)
+
+    async def count(self, public_key):
+        return len(await self._load(public_key))
+
+
+class RedisPresenceBackend:
+    """Sorted set per bot: member = channel name, score = expiry timestamp."""
+
+    def __init__(self, url):
+        import redis.asyncio as aioredis
+        self.url = url
+        self._aioredis = aioredis
+        self._clients = weakref.WeakKeyDictionary()  # event loop -> client
+
+    def _client(self):
+        # redis.asyncio connections are tied to the event loop that made them
+        loop = asyncio.get_running_loop()
+        client = self._clients.get(loop)
+        if client is None:
+            client = self._clients[loop] = self._aioredis.from_url(self.url)
+        return client
+
+    def _key(self, public_key):
+        return f'{KEY_PREFIX}:{public_key}'
+
+    async def touch(self, public_key, channel_name, ttl):
+        key, now = self._key(public_key), time.time()
+        async with self._client().pipeline(transaction=True) as pipe:
+            pipe.zadd(key, {channel_name: now + ttl})
+            pipe.zremrangebyscore(key, '-inf', now)
+            pipe.expire(key, ttl * 2)
+            await pipe.execute()
+
+    async def remove(self, public_key, channel_name):
+        await self._client().zrem(self._key(public_key), channel_name)
+
+    async def count(self, public_key):
+        return await self._client().zcount(self._key(public_key), time.time(), '+inf')
+
+
+_backend = None
+
+
+def get_backend():
+    global _backend
+    if _backend is None:
+        name = getattr(settings, 'AGENT_PRESENCE_BACKEND', 'local')
+        if name == 'redis':
+            _backend = RedisPresenceBackend(getattr(settings, 'AGENT_PRESENCE_REDIS_URL', None))
+        elif name == 'cache':
+            _backend = CachePresenceBackend(getattr(settings, 'AGENT_PRESENCE_CACHE', 'default'))
+        elif name == 'local':
+            _backend = LocalPresenceBackend()
+        else:
+            raise ValueError(f"Unknown AGENT_PRESENCE_BACKEND: {name}")
+    return _backend
+
+
+def set_backend(backend):
+    """Swap the backend (e.g. a LocalPresenceBackend in tests)."""
+    global _backend
+    _backend = backend
+
+
+async def agent_heartbeat(public_key, channel_name):
+    await get_backend().touch(public_key, channel_name, presence_ttl())
+
+
+async def agent_left(public_key, channel_name):
+    await get_backend().remove(public_key, channel_name)
+
+
+async def is_agent_online(public_key):
+    try:
+        return await get_backend().count(public_key) > 0
+    except Exception as e:
+        logger.warning("Presence lookup failed for %s: %s", public_key, e)
+        return False
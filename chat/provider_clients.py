@@ -0,0 +1,143 @@
+# chat/provider_clients.py
+"""
+Shared HTTP clients for AI provider calls.
+
+- Sync callers use one pooled requests.Session per provider, so a chat turn
+  reuses an open keep-alive connection instead of a fresh TLS handshake.
+- Async callers on a long-lived event loop (the ASGI server's, marked by
+  ProviderClientsMiddleware in redbot/asgi.py) use one httpx.AsyncClient per
+  provider with HTTP/2 enabled, so concurrent turns multiplex over a few
+  connections. The clients are closed on lifespan shutdown.
+- Anywhere else (async views under WSGI run on a fresh loop per request)
+  an AsyncClient would never be reused or closed, so async callers go
+  through the pooled Session in a worker thread instead.
+
+AI_PROVIDER_BASE_URL, when set, points every provider at that host instead
+(used with the fake provider in bench_providers.py).
+"""
+import asyncio
+import logging
+import threading
+import weakref
+
+import httpx
+import requests
+from requests.adapters import HTTPAdapter
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+PROVIDER_HOSTS = {
+    'google': 'https://generativelanguage.googleapis.com',
+    'openai': 'https://api.openai.com',
+    'nvidia': 'https://integrate.api.nvidia.com',
+    'openrouter': 'https://openrouter.ai',
+    'anthropic': 'https://api.anthropic.com',
+    'cohere': 'https://api.cohere.ai',
+    'huggingface': 'https://api-inference.huggingface.co',
+    'replicate': 'https://api.replicate.com',
+}
+
+try:
+    import h2  # noqa: F401  (httpx needs it for http2=True)
+    HTTP2_AVAILABLE = True
+except ImportError:
+    HTTP2_AVAILABLE = False
+
+_sessions = {}
+_sessions_lock = threading.Lock()
+_async_clients = weakref.WeakKeyDictionary()  # event loop -> {provider: AsyncClient}
+_long_lived_loops = weakref.WeakSet()
+
+
+def provider_url(provider: str, path: str) -> str:
+    base = getattr(settings, 'AI_PROVIDER_BASE_URL', '') or PROVIDER_HOSTS[provider]
+    return base.rstrip('/') + path
+
+
+def _pool_size():
+    return getattr(settings, 'AI_PROVIDER_MAX_CONNECTIONS', 20)
+
+
+def get_session(provider: str) -> requests.Session:
+    session = _sessions.get(provider)
+    if session is None:
+        with _sessions_lock:
+            session = _sessions.get(provider)
+            if session is None:
+                session = requests.Session()
+                adapter = HTTPAdapter(pool_connections=1, pool_maxsize=_pool_size())
+                session.mount("http://", adapter)
+                session.mount("https://", adapter)
+                _sessions[provider] = session
+    return session
+
+
+def use_async_clients():
+    """Mark the running event loop as long-lived: provider calls on it use AsyncClients."""
+    _long_lived_loops.add(asyncio.get_running_loop())
+
+
+def async_clients_enabled() -> bool:
+    try:
+        return asyncio.get_running_loop() in _long_lived_loops
+    except RuntimeError:
+        return False
+
+
+def get_async_client(provider: str) -> httpx.AsyncClient:
+    """
+    Return the provider's AsyncClient for the running event loop.
+    httpx clients are bound to the loop that first used them, hence the
+    per-loop registry (daphne runs a single loop, so normally one client
+    per provider). Only call this when async_clients_enabled().
+    """
+    loop = asyncio.get_running_loop()
+    clients = _async_clients.setdefault(loop, {})
+    client = clients.get(provider)
+    if client is None or client.is_closed:
+        from .services import REQUEST_TIMEOUT
+
+        http2 = getattr(settings, 'AI_PROVIDER_HTTP2', True) and HTTP2_AVAILABLE
+        client = httpx.AsyncClient(
+            http2=http2,
+            timeout=httpx.Timeout(REQUEST_TIMEOUT, connect=10),
+            limits=httpx.Limits(
+                max_connections=_pool_size(),
+                max_keepalive_connections=getattr(settings, 'AI_PROVIDER_KEEPALIVE', 20),
+            ),
+        )
+        clients[provider] = client
+        logger.debug("Opened %s client for %s", "HTTP/2" if http2 else "HTTP/1.1", provider)
+    return client
+
+
+async def aclose_clients():
+    """Close the running loop's provider clients (e.g. on ASGI shutdown)."""
+    clients = _async_clients.pop(asyncio.get_running_loop(), {})
+    for client in clients.values():
+        await client.aclose()
+
+
+class ProviderClientsMiddleware:
+    """
+    ASGI middleware marking the server's loop for AsyncClient use and
+    closing the clients on lifespan shutdown (servers without lifespan
+    support, like daphne, just drop them with the process).
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        use_async_clients()
+        if scope['type'] != 'lifespan':
+            return await self.app(scope, receive, send)
+        while True:
+            message = await receive()
+            if message['type'] == 'lifespan.startup':
+                await send({'type': 'lifespan.startup.complete'})
+            elif message['type'] == 'lifespan.shutdown':
+                await aclose_clients()
+                await send({'type': 'lifespan.shutdown.complete'})
+                return
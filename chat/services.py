@@ -1,9 +1,13 @@
 # services.py
 import json
 import logging
+import httpx
 import requests
+from asgiref.sync import sync_to_async
 from django.conf import settings
 from bots.models import Bot
+from bots.runtime import aget_profile, get_profile
+from .provider_clients import async_clients_enabled, get_async_client, get_session, provider_url
 
 logger = logging.getLogger(__name__)
 
@@ -57,10 +61,22 @@ def _extract_labeled_urls(retrieved_data: str) -> dict:
 
     return urls
 
-def _call_google_generative(api_key: str, model: str, prompt: str):
+_ZERO_USAGE = {"prompt_tokens": 0, "completion_tokens": 0, "total_tokens": 0}
+
+
+# ---------------------------------------------------------------------------
+# Provider requests. Each provider has a request builder returning
+# (url, headers, payload) and a parser turning the JSON reply into
+# {"text", "usage"}, so the sync (requests) and async (httpx) callers share
+# everything except the transport.
+# ---------------------------------------------------------------------------
+
+def _google_request(api_key: str, model: str, prompt: str, stream: bool = False):
     # Google Generative Language API (v1beta) — key typically passed as ?key=API_KEY
+    # For Google, model examples: 'gemini-2.5-pro' or 'models/gemini-2.5-pro' accepted
     full_model = model if model.startswith("models/") else f"models/{model}"
-    url = f"https://generativelanguage.googleapis.com/v1beta/{full_model}:generateContent?key={api_key}"
+    method = "streamGenerateContent?alt=sse&" if stream else "generateContent?"
+    url = provider_url('google', f"/v1beta/{full_model}:{method}key={api_key}")
     payload = {
         "contents": [{"role": "user", "parts": [{"text": prompt}]}],
         "generationConfig": {
@@ -70,10 +86,10 @@ def _call_google_generative(api_key: str, model: str, prompt: str):
             "maxOutputTokens": 1024
         }
     }
-    r = requests.post(url, json=payload, timeout=REQUEST_TIMEOUT)
-    r.raise_for_status()
-    j = r.json()
-    
+    return url, {"Content-Type": "application/json"}, payload
+
+
+def _parse_google(j):
     # Extract text
     text = ""
     candidates = j.get("candidates") or []
@@ -84,66 +100,41 @@ def _call_google_generative(api_key: str, model: str, prompt: str):
             text = parts[0].get("text") or str(parts[0])
     if not text:
         text = j.get("output", {}).get("text") or j.get("response", "") or json.dumps(j)
-    
+
     # Extract token usage (Google format)
     usage = j.get("usageMetadata", {})
     prompt_tokens = usage.get("promptTokenCount", 0)
     completion_tokens = usage.get("candidatesTokenCount", 0)
-    
+
     token_data = {
         "prompt_tokens": prompt_tokens,
         "completion_tokens": completion_tokens,
         "total_tokens": prompt_tokens + completion_tokens  # Calculate ourselves for accuracy
     }
-    
-    return {"text": text, "usage": token_data}
 
-def _call_openai(api_key: str, model: str, prompt: str):
-    url = "https://api.openai.com/v1/chat/completions"
-    headers = {"Authorization": f"Bearer {api_key}", "Content-Type": "application/json"}
-    payload = {
-        "model": model,
-        "messages": [{"role": "user", "content": prompt}],
-        "temperature": 0.0,
-        "max_tokens": 1024
-    }
-    r = requests.post(url, json=payload, headers=headers, timeout=REQUEST_TIMEOUT)
-    r.raise_for_status()
-    j = r.json()
-    
-    # Extract text
-    text = ""
-    choices = j.get("choices") or []
-    if choices:
-        msg = choices[0].get("message") or {}
-        text = msg.get("content") or choices[0].get("text") or json.dumps(j)
-    if not text:
-        text = j.get("error", {}).get("message") or json.dumps(j)
-    
-    # Extract token usage (OpenAI format)
-    usage = j.get("usage", {})
-    token_data = {
-        "prompt_tokens": usage.get("prompt_tokens", 0),
-        "completion_tokens": usage.get("completion_tokens", 0),
-        "total_tokens": usage.get("total_tokens", 0)
-    }
-    
     return {"text": text, "usage": token_data}
 
-def _call_nvidia(api_key: str, model: str, prompt: str):
-    # NVIDIA integrates an OpenAI-compatible chat completions API.
-    url = "https://integrate.api.nvidia.com/v1/chat/completions"
-    headers = {"Authorization": f"Bearer {api_key}", "Content-Type": "application/json"}
-    payload = {
-        "model": model,
-        "messages": [{"role": "user", "content": prompt}],
-        "temperature": 0.0,
-        "max_tokens": 1024
-    }
-    r = requests.post(url, json=payload, headers=headers, timeout=REQUEST_TIMEOUT)
-    r.raise_for_status()
-    j = r.json()
 
+def _openai_compatible_request(provider: str, path: str):
+    # OpenAI, NVIDIA and OpenRouter all implement the OpenAI chat completions API
+    def build(api_key: str, model: str, prompt: str, stream: bool = False):
+        headers = {"Authorization": f"Bearer {api_key}", "Content-Type": "application/json"}
+        payload = {
+            "model": model,
+            "messages": [{"role": "user", "content": prompt}],
+            "temperature": 0.0,
+            "max_tokens": 1024
+        }
+        if stream:
+            payload["stream"] = True
+            if provider == 'openai':
+                payload["stream_options"] = {"include_usage": True}
+        return provider_url(provider, path), headers, payload
+    return build
+
+
+def _parse_openai_compatible(j):
+    # Extract text
     text = ""
     choices = j.get("choices") or []
     if choices:
@@ -152,6 +143,7 @@ def _call_nvidia(api_key: str, model: str, prompt: str):
     if not text:
         text = j.get("error", {}).get("message") or json.dumps(j)
 
+    # Extract token usage (OpenAI format)
     usage = j.get("usage", {})
     token_data = {
         "prompt_tokens": usage.get("prompt_tokens", 0),
@@ -161,41 +153,9 @@ def _call_nvidia(api_key: str, model: str, prompt: str):
 
     return {"text": text, "usage": token_data}
 
-def _call_openrouter(api_key: str, model: str, prompt: str):
-    # OpenRouter implements OpenAI-like chat endpoint
-    url = "https://openrouter.ai/api/v1/chat/completions"
-    headers = {"Authorization": f"Bearer {api_key}", "Content-Type": "application/json"}
-    payload = {
-        "model": model,
-        "messages": [{"role": "user", "content": prompt}],
-        "temperature": 0.0,
-        "max_tokens": 1024
-    }
-    r = requests.post(url, json=payload, headers=headers, timeout=REQUEST_TIMEOUT)
-    r.raise_for_status()
-    j = r.json()
-    
-    # Extract text (OpenAI-compatible format)
-    text = ""
-    choices = j.get("choices") or []
-    if choices:
-        text = choices[0].get("message", {}).get("content") or choices[0].get("text") or json.dumps(j)
-    else:
-        text = json.dumps(j)
-    
-    # Extract token usage (OpenAI-compatible format)
-    usage = j.get("usage", {})
-    token_data = {
-        "prompt_tokens": usage.get("prompt_tokens", 0),
-        "completion_tokens": usage.get("completion_tokens", 0),
-        "total_tokens": usage.get("total_tokens", 0)
-    }
-    
-    return {"text": text, "usage": token_data}
 
-def _call_anthropic(api_key: str, model: str, prompt: str):
+def _anthropic_request(api_key: str, model: str, prompt: str, stream: bool = False):
     # Anthropic supports /v1/messages with messages array (see current docs)
-    url = "https://api.anthropic.com/v1/messages"
     headers = {
         "x-api-key": api_key,
         "Content-Type": "application/json",
@@ -207,10 +167,12 @@ def _call_anthropic(api_key: str, model: str, prompt: str):
         "max_tokens": 1024,
         "temperature": 0.0
     }
-    r = requests.post(url, json=payload, headers=headers, timeout=REQUEST_TIMEOUT)
-    r.raise_for_status()
-    j = r.json()
-    
+    if stream:
+        payload["stream"] = True
+    return provider_url('anthropic', "/v1/messages"), headers, payload
+
+
+def _parse_anthropic(j):
     # Extract text (Anthropic format)
     text = ""
     if "content" in j and isinstance(j["content"], list) and len(j["content"]) > 0:
@@ -219,7 +181,7 @@ def _call_anthropic(api_key: str, model: str, prompt: str):
         text = j.get("completion")
     else:
         text = json.dumps(j)
-    
+
     # Extract token usage (Anthropic format)
     usage = j.get("usage", {})
     token_data = {
@@ -227,12 +189,12 @@ def _call_anthropic(api_key: str, model: str, prompt: str):
         "completion_tokens": usage.get("output_tokens", 0),
         "total_tokens": usage.get("input_tokens", 0) + usage.get("output_tokens", 0)
     }
-    
+
     return {"text": text, "usage": token_data}
 
-def _call_cohere(api_key: str, model: str, prompt: str):
+
+def _cohere_request(api_key: str, model: str, prompt: str):
     # Cohere generate endpoint
-    url = "https://api.cohere.ai/v1/generate"
     headers = {"Authorization": f"Bearer {api_key}", "Content-Type": "application/json"}
     payload = {
         "model": model,
@@ -241,220 +203,340 @@ def _call_cohere(api_key: str, model: str, prompt: str):
         "temperature": 0.0,
         "return_likelihoods": "NONE"
     }
-    r = requests.post(url, json=payload, headers=headers, timeout=REQUEST_TIMEOUT)
-    r.raise_for_status()
-    j = r.json()
+    return provider_url('cohere', "/v1/generate"), headers, payload
+
+
+def _parse_cohere(j):
+    # Cohere doesn't return usage in standard format, keep default
     generations = j.get("generations") or []
     if generations:
-        return generations[0].get("text") or json.dumps(j)
-    return json.dumps(j)
+        return {"text": generations[0].get("text") or json.dumps(j), "usage": dict(_ZERO_USAGE)}
+    return {"text": json.dumps(j), "usage": dict(_ZERO_USAGE)}
+
 
-def _call_huggingface(api_key: str, model: str, prompt: str):
+def _huggingface_request(api_key: str, model: str, prompt: str):
     # Hugging Face Inference: model-specific endpoint
-    url = f"https://api-inference.huggingface.co/models/{model}"
+    # model should be huggingface repo id like "bigscience/bloom" or "meta-llama/Llama-2-13b-chat"
     headers = {"Authorization": f"Bearer {api_key}", "Content-Type": "application/json"}
     payload = {"inputs": prompt, "options": {"wait_for_model": True}}
-    r = requests.post(url, json=payload, headers=headers, timeout=REQUEST_TIMEOUT)
-    r.raise_for_status()
-    j = r.json()
+    return provider_url('huggingface', f"/models/{model}"), headers, payload
+
+
+def _parse_huggingface(j):
     # HF sometimes returns a list of generated outputs or a dict with 'generated_text'
+    text = json.dumps(j)
     if isinstance(j, list) and len(j) > 0:
         # e.g., [{"generated_text": "..."}]
         if isinstance(j[0], dict):
-            return j[0].get("generated_text") or json.dumps(j)
-        return str(j[0])
-    if isinstance(j, dict):
-        return j.get("generated_text") or j.get("text") or json.dumps(j)
-    return json.dumps(j)
+            text = j[0].get("generated_text") or json.dumps(j)
+        else:
+            text = str(j[0])
+    elif isinstance(j, dict):
+        text = j.get("generated_text") or j.get("text") or json.dumps(j)
+    return {"text": text, "usage": dict(_ZERO_USAGE)}
+
 
-def _call_replicate(api_key: str, model: str, prompt: str):
+def _replicate_request(api_key: str, model: str, prompt: str):
     # Replicate uses a /v1/predictions endpoint and model-specific inputs
-    url = "https://api.replicate.com/v1/predictions"
+    # model should be replicate version id (not repo); check Replicate docs for correct value
     headers = {"Authorization": f"Token {api_key}", "Content-Type": "application/json"}
     # Simple generic payload — many Replicate models expect 'input' dict; you may need to adapt per model
     payload = {"version": model, "input": {"prompt": prompt}}
-    r = requests.post(url, json=payload, headers=headers, timeout=REQUEST_TIMEOUT)
-    r.raise_for_status()
-    j = r.json()
+    return provider_url('replicate', "/v1/predictions"), headers, payload
+
+
+def _parse_replicate(j):
     # Replicate returns a prediction object that may have output or urls
+    text = json.dumps(j)
     if "output" in j:
         output = j["output"]
-        if isinstance(output, list):
-            return output[0]
-        return output
+        text = output[0] if isinstance(output, list) else output
     # If prediction id provided, user may want to poll — but we keep simple
-    return json.dumps(j)
+    return {"text": text, "usage": dict(_ZERO_USAGE)}
+
+
+PROVIDERS = {
+    'google': (_google_request, _parse_google),
+    'openai': (_openai_compatible_request('openai', "/v1/chat/completions"), _parse_openai_compatible),
+    'nvidia': (_openai_compatible_request('nvidia', "/v1/chat/completions"), _parse_openai_compatible),
+    'openrouter': (_openai_compatible_request('openrouter', "/api/v1/chat/completions"), _parse_openai_compatible),
+    'anthropic': (_anthropic_request, _parse_anthropic),
+    'cohere': (_cohere_request, _parse_cohere),
+    'huggingface': (_huggingface_request, _parse_huggingface),
+    'replicate': (_replicate_request, _parse_replicate),
+}
+
+
+def _call_provider(provider: str, api_key: str, model: str, prompt: str):
+    """Blocking call over the provider's pooled requests.Session."""
+    build, parse = PROVIDERS[provider]
+    url, headers, payload = build(api_key, model, prompt)
+    r = get_session(provider).post(url, json=payload, headers=headers, timeout=REQUEST_TIMEOUT)
+    r.raise_for_status()
+    return parse(r.json())
 
-# services.py (replace only the get_ai_response function)
 
-def get_ai_response(user_question: str, retrieved_data: str, api_key: str = None, model: str = 'gpt-4o', bot_id: int = None):
+async def _acall_provider(provider: str, api_key: str, model: str, prompt: str):
     """
-    Main entry: route to provider-specific callers based on the Bot.ai_provider.
-    Returns a dict with 'text' and 'usage' (token counts).
-    Appends a clickable 'For more details:' section with hyperlinks if labeled URLs are found
-    in retrieved_data (Service Page / Contact Page / Others).
+    Non-blocking call over the provider's shared httpx.AsyncClient (HTTP/2,
+    keep-alive); off the ASGI server's loop, over the pooled Session in a thread.
     """
+    if not async_clients_enabled():
+        return await sync_to_async(_call_provider, thread_sensitive=False)(provider, api_key, model, prompt)
+    build, parse = PROVIDERS[provider]
+    url, headers, payload = build(api_key, model, prompt)
+    r = await get_async_client(provider).post(url, json=payload, headers=headers)
+    r.raise_for_status()
+    return parse(r.json())
+
+
+# ---------------------------------------------------------------------------
+# Streaming. A parser is fed each JSON payload of the provider's
+# text/event-stream and returns the text delta it carries (if any); it also
+# collects token usage along the way.
+# ---------------------------------------------------------------------------
+
+def _sse_payload(line: str):
+    """JSON payload of one `data:` line, or None (comments, event names, [DONE])."""
+    if not line or not line.startswith("data:"):
+        return None
+    data = line[5:].strip()
+    if not data or data == "[DONE]":
+        return None
     try:
-        bot = Bot.objects.get(id=bot_id) if bot_id else None
-    except Bot.DoesNotExist:
-        return {"text": "⚠️ Bot not found.", "usage": {"prompt_tokens": 0, "completion_tokens": 0, "total_tokens": 0}}
+        return json.loads(data)
+    except ValueError:
+        logger.debug("Skipping non-JSON stream line: %s", data[:200])
+        return None
+
+
+class _OpenAIStream:
+    def __init__(self):
+        self.usage = {}
+
+    def feed(self, j):
+        if j.get("error"):
+            raise ValueError(j["error"])
+        if j.get("usage"):
+            self.usage = j["usage"]
+        choices = j.get("choices") or []
+        if choices:
+            return (choices[0].get("delta") or {}).get("content")
+        return None
+
+    def token_usage(self):
+        return {
+            "prompt_tokens": self.usage.get("prompt_tokens", 0),
+            "completion_tokens": self.usage.get("completion_tokens", 0),
+            "total_tokens": self.usage.get("total_tokens", 0)
+        }
 
-    provider = bot.ai_provider if bot else 'google'
-    # prefer bot's key if stored
-    used_api_key = (bot.ai_api_key if bot and bot.ai_api_key else api_key)
-    if not used_api_key:
-        return {"text": "⚠️ No API key provided.", "usage": {"prompt_tokens": 0, "completion_tokens": 0, "total_tokens": 0}}
 
-    prompt = _build_prompt(user_question, retrieved_data)
-    answer_text = ""
-    token_usage = {"prompt_tokens": 0, "completion_tokens": 0, "total_tokens": 0}
+class _AnthropicStream:
+    def __init__(self):
+        self.input_tokens = self.output_tokens = 0
+
+    def feed(self, j):
+        event = j.get("type")
+        if event == "content_block_delta":
+            return (j.get("delta") or {}).get("text")
+        if event == "message_start":
+            self.input_tokens = ((j.get("message") or {}).get("usage") or {}).get("input_tokens", 0)
+        elif event == "message_delta":
+            self.output_tokens = (j.get("usage") or {}).get("output_tokens", self.output_tokens)
+        elif event == "error":
+            raise ValueError(j.get("error"))
+        return None
+
+    def token_usage(self):
+        return {
+            "prompt_tokens": self.input_tokens,
+            "completion_tokens": self.output_tokens,
+            "total_tokens": self.input_tokens + self.output_tokens
+        }
 
-    try:
-        provider = provider.lower()
-        if provider == 'google':
-            # For Google, model examples: 'gemini-2.5-pro' or 'models/gemini-2.5-pro' accepted
-            result = _call_google_generative(used_api_key, model, prompt)
-            answer_text = result.get("text", "")
-            token_usage = result.get("usage", token_usage)
-
-        elif provider == 'openai':
-            result = _call_openai(used_api_key, model, prompt)
-            answer_text = result.get("text", "")
-            token_usage = result.get("usage", token_usage)
-
-        elif provider == 'nvidia':
-            result = _call_nvidia(used_api_key, model, prompt)
-            answer_text = result.get("text", "")
-            token_usage = result.get("usage", token_usage)
-
-        elif provider == 'openrouter':
-            result = _call_openrouter(used_api_key, model, prompt)
-            answer_text = result.get("text", "")
-            token_usage = result.get("usage", token_usage)
-
-        elif provider == 'anthropic':
-            result = _call_anthropic(used_api_key, model, prompt)
-            answer_text = result.get("text", "")
-            token_usage = result.get("usage", token_usage)
-
-        elif provider == 'cohere':
-            answer_text = _call_cohere(used_api_key, model, prompt)
-            # Cohere doesn't return usage in standard format, keep default
-
-        elif provider == 'huggingface':
-            # model should be huggingface repo id like "bigscience/bloom" or "meta-llama/Llama-2-13b-chat"
-            answer_text = _call_huggingface(used_api_key, model, prompt)
-            # HuggingFace doesn't return usage in standard format, keep default
-
-        elif provider == 'replicate':
-            # model should be replicate version id (not repo); check Replicate docs for correct value
-            answer_text = _call_replicate(used_api_key, model, prompt)
-            # Replicate doesn't return usage in standard format, keep default
 
-        else:
-            return {"text": f"⚠️ Unsupported or not-yet-implemented AI provider: {provider}", "usage": token_usage}
+class _GoogleStream:
+    def __init__(self):
+        self.usage = {}
+
+    def feed(self, j):
+        if j.get("usageMetadata"):
+            self.usage = j["usageMetadata"]
+        text = ""
+        for candidate in (j.get("candidates") or [])[:1]:
+            for part in (candidate.get("content") or {}).get("parts") or []:
+                text += part.get("text") or ""
+        return text or None
+
+    def token_usage(self):
+        prompt_tokens = self.usage.get("promptTokenCount", 0)
+        completion_tokens = self.usage.get("candidatesTokenCount", 0)
+        return {
+            "prompt_tokens": prompt_tokens,
+            "completion_tokens": completion_tokens,
+            "total_tokens": prompt_tokens + completion_tokens
+        }
+
 
-    except requests.HTTPError as e:
+STREAMING_PROVIDERS = {
+    'google': _GoogleStream,
+    'openai': _OpenAIStream,
+    'nvidia': _OpenAIStream,
+    'openrouter': _OpenAIStream,
+    'anthropic': _AnthropicStream,
+}
+
+
+def _stream_provider(provider: str, api_key: str, model: str, prompt: str, parser=None):
+    """Yield text deltas over the pooled session; returns the usage dict."""
+    build, _ = PROVIDERS[provider]
+    url, headers, payload = build(api_key, model, prompt, stream=True)
+    parser = parser or STREAMING_PROVIDERS[provider]()
+    with get_session(provider).post(url, json=payload, headers=headers, timeout=REQUEST_TIMEOUT, stream=True) as r:
+        r.raise_for_status()
+        r.encoding = "utf-8"
+        for line in r.iter_lines(decode_unicode=True):
+            j = _sse_payload(line)
+            delta = parser.feed(j) if j is not None else None
+            if delta:
+                yield delta
+    return parser.token_usage()
+
+
+async def _astream_provider(provider: str, api_key: str, model: str, prompt: str, parser):
+    """Async counterpart of _stream_provider; usage is left on `parser`."""
+    if not async_clients_enabled():
+        # Deltas are never empty, so None marks the end of the stream
+        stream = _stream_provider(provider, api_key, model, prompt, parser)
+        next_delta = sync_to_async(next, thread_sensitive=False)
+        try:
+            while (delta := await next_delta(stream, None)) is not None:
+                yield delta
+        finally:
+            await sync_to_async(stream.close, thread_sensitive=False)()
+        return
+    build, _ = PROVIDERS[provider]
+    url, headers, payload = build(api_key, model, prompt, stream=True)
+    async with get_async_client(provider).stream("POST", url, json=payload, headers=headers) as r:
+        r.raise_for_status()
+        async for line in r.aiter_lines():
+            j = _sse_payload(line)
+            delta = parser.feed(j) if j is not None else None
+            if delta:
+                yield delta
+
+
+def _provider_error_message(bot, error_msg: str) -> str:
+    """Append the plan/WhatsApp hints shown to visitors when a provider call fails."""
+    try:
+        if bot and bot.workspace:
+            ws = bot.workspace
+            plan = ws.active_plan
+
+            # Add plan-specific suggestions
+            if plan and plan.bundle == 'FULL':
+                error_msg += " However, you may get better assistance by switching to our Live Chat or Q&A bot using the menu above."
+
+            # Add WhatsApp link if enabled (for ALL plans)
+            if ws.enable_whatsapp_number_in_chat and ws.whatsapp_number:
+                clean_number = ws.whatsapp_number.replace(' ', '').replace('-', '')
+                wa_link = f'<a href="https://wa.me/{clean_number}" style="color:#5A4FCF;text-decoration:underline;font-weight:600" target="_blank"><iconify-icon icon="logos:whatsapp-icon" style="vertical-align: middle; margin-right: 2px; font-size: 1.6em;"></iconify-icon>{ws.whatsapp_number}</a>'
+                error_msg += f" For further details, WhatsApp this number: {wa_link}"
+    except Exception:
+        pass
+    return error_msg
+
+
+def _provider_error(e: Exception, provider: str, bot) -> str:
+    """Log a failed provider call and return the visitor-facing error text."""
+    if isinstance(e, (requests.HTTPError, httpx.HTTPStatusError)):
         status = getattr(e.response, "status_code", None)
         try:
             body = e.response.text
         except Exception:
             body = "<unavailable>"
         logger.error("HTTPError calling provider %s: status=%s body=%s", provider, status, body)
-        
-        # Build user-friendly error message based on plan
         error_msg = f"⚠️ AI service error (HTTP {status})."
-        try:
-            if bot and bot.workspace:
-                ws = bot.workspace
-                plan = ws.active_plan
-                
-                # Add plan-specific suggestions
-                if plan and plan.bundle == 'FULL':
-                    error_msg += " However, you may get better assistance by switching to our Live Chat or Q&A bot using the menu above."
-                
-                # Add WhatsApp link if enabled (for ALL plans)
-                if ws.enable_whatsapp_number_in_chat and ws.whatsapp_number:
-                    clean_number = ws.whatsapp_number.replace(' ', '').replace('-', '')
-                    wa_link = f'<a href="https://wa.me/{clean_number}" style="color:#5A4FCF;text-decoration:underline;font-weight:600" target="_blank"><iconify-icon icon="logos:whatsapp-icon" style="vertical-align: middle; margin-right: 2px; font-size: 1.6em;"></iconify-icon>{ws.whatsapp_number}</a>'
-                    error_msg += f" For further details, WhatsApp this number: {wa_link}"
-        except Exception:
-            pass
-        
-        return {"text": error_msg, "usage": token_usage}
-
-    except requests.RequestException as e:
+    elif isinstance(e, (requests.RequestException, httpx.HTTPError)):
         logger.error("RequestException calling provider %s: %s", provider, e)
-        
-        # Build user-friendly error message based on plan
-        error_msg = f"⚠️ AI service connection error."
-        try:
-            if bot and bot.workspace:
-                ws = bot.workspace
-                plan = ws.active_plan
-                
-                # Add plan-specific suggestions
-                if plan and plan.bundle == 'FULL':
-                    error_msg += " However, you may get better assistance by switching to our Live Chat or Q&A bot using the menu above."
-                
-                # Add WhatsApp link if enabled (for ALL plans)
-                if ws.enable_whatsapp_number_in_chat and ws.whatsapp_number:
-                    clean_number = ws.whatsapp_number.replace(' ', '').replace('-', '')
-                    wa_link = f'<a href="https://wa.me/{clean_number}" style="color:#5A4FCF;text-decoration:underline;font-weight:600" target="_blank"><iconify-icon icon="logos:whatsapp-icon" style="vertical-align: middle; margin-right: 2px; font-size: 1.6em;"></iconify-icon>{ws.whatsapp_number}</a>'
-                    error_msg += f" For further details, WhatsApp this number: {wa_link}"
-        except Exception:
-            pass
-        
-        return {"text": error_msg, "usage": token_usage}
-
-    except ValueError as e:
+        error_msg = "⚠️ AI service connection error."
+    elif isinstance(e, ValueError):
         logger.error("ValueError parsing response from %s: %s", provider, e)
-        
-        # Build user-friendly error message based on plan
         error_msg = "⚠️ Received invalid response from AI service."
-        try:
-            if bot and bot.workspace:
-                ws = bot.workspace
-                plan = ws.active_plan
-                
-                # Add plan-specific suggestions
-                if plan and plan.bundle == 'FULL':
-                    error_msg += " However, you may get better assistance by switching to our Live Chat or Q&A bot using the menu above."
-                
-                # Add WhatsApp link if enabled (for ALL plans)
-                if ws.enable_whatsapp_number_in_chat and ws.whatsapp_number:
-                    clean_number = ws.whatsapp_number.replace(' ', '').replace('-', '')
-                    wa_link = f'<a href="https://wa.me/{clean_number}" style="color:#5A4FCF;text-decoration:underline;font-weight:600" target="_blank"><iconify-icon icon="logos:whatsapp-icon" style="vertical-align: middle; margin-right: 2px; font-size: 1.6em;"></iconify-icon>{ws.whatsapp_number}</a>'
-                    error_msg += f" For further details, WhatsApp this number: {wa_link}"
-        except Exception:
-            pass
-        
-        return {"text": error_msg, "usage": token_usage}
-
-    except Exception as e:
+    else:
         logger.error("Unexpected error in get_ai_response: %s", e)
-        
-        # Build user-friendly error message based on plan
         error_msg = "⚠️ Unexpected error occurred."
-        try:
-            if bot and bot.workspace:
-                ws = bot.workspace
-                plan = ws.active_plan
-                
-                # Add plan-specific suggestions
-                if plan and plan.bundle == 'FULL':
-                    error_msg += " However, you may get better assistance by switching to our Live Chat or Q&A bot using the menu above."
-                
-                # Add WhatsApp link if enabled (for ALL plans)
-                if ws.enable_whatsapp_number_in_chat and ws.whatsapp_number:
-                    clean_number = ws.whatsapp_number.replace(' ', '').replace('-', '')
-                    wa_link = f'<a href="https://wa.me/{clean_number}" style="color:#5A4FCF;text-decoration:underline;font-weight:600" target="_blank"><iconify-icon icon="logos:whatsapp-icon" style="vertical-align: middle; margin-right: 2px; font-size: 1.6em;"></iconify-icon>{ws.whatsapp_number}</a>'
-                    error_msg += f" For further details, WhatsApp this number: {wa_link}"
-        except Exception:
-            pass
-        
-        return {"text": error_msg, "usage": token_usage}
+    return _provider_error_message(bot, error_msg)
+
+
+def _resolve_provider(bot, api_key):
+    provider = (bot.ai_provider if bot else 'google').lower()
+    # prefer bot's key if stored
+    used_api_key = (bot.ai_api_key if bot and bot.ai_api_key else api_key)
+    return provider, used_api_key
+
+
+def get_ai_response(user_question: str, retrieved_data: str, api_key: str = None, model: str = 'gpt-4o', bot_id: int = None):
+    """
+    Main entry: route to provider-specific callers based on the Bot.ai_provider.
+    Returns a dict with 'text' and 'usage' (token counts).
+    Appends a clickable 'For more details:' section with hyperlinks if labeled URLs are found
+    in retrieved_data (Service Page / Contact Page / Others).
+    """
+    try:
+        bot = get_profile(bot_id=bot_id) if bot_id else None
+    except Bot.DoesNotExist:
+        return {"text": "⚠️ Bot not found.", "usage": dict(_ZERO_USAGE)}
+
+    provider, used_api_key = _resolve_provider(bot, api_key)
+    if not used_api_key:
+        return {"text": "⚠️ No API key provided.", "usage": dict(_ZERO_USAGE)}
+    if provider not in PROVIDERS:
+        return {"text": f"⚠️ Unsupported or not-yet-implemented AI provider: {provider}", "usage": dict(_ZERO_USAGE)}
 
+    prompt = _build_prompt(user_question, retrieved_data)
+    try:
+        result = _call_provider(provider, used_api_key, model, prompt)
+    except Exception as e:
+        return {"text": _provider_error(e, provider, bot), "usage": dict(_ZERO_USAGE)}
+
+    return _finalize_answer(result.get("text", ""), result.get("usage") or dict(_ZERO_USAGE), user_question, retrieved_data, bot)
+
+
+async def aget_ai_response(user_question: str, retrieved_data: str, api_key: str = None, model: str = 'gpt-4o', bot_id: int = None):
+    """
+    Async get_ai_response: the provider call is awaited on a shared
+    httpx.AsyncClient, so no worker thread is held for the generation.
+    Only the (short) ORM work runs through sync_to_async.
+    """
+    try:
+        bot = await aget_profile(bot_id=bot_id) if bot_id else None
+    except Bot.DoesNotExist:
+        return {"text": "⚠️ Bot not found.", "usage": dict(_ZERO_USAGE)}
+
+    provider, used_api_key = _resolve_provider(bot, api_key)
+    if not used_api_key:
+        return {"text": "⚠️ No API key provided.", "usage": dict(_ZERO_USAGE)}
+    if provider not in PROVIDERS:
+        return {"text": f"⚠️ Unsupported or not-yet-implemented AI provider: {provider}", "usage": dict(_ZERO_USAGE)}
+
+    prompt = _build_prompt(user_question, retrieved_data)
+    try:
+        result = await _acall_provider(provider, used_api_key, model, prompt)
+    except Exception as e:
+        return {"text": await sync_to_async(_provider_error)(e, provider, bot), "usage": dict(_ZERO_USAGE)}
+
+    return await sync_to_async(_finalize_answer)(
+        result.get("text", ""), result.get("usage") or dict(_ZERO_USAGE), user_question, retrieved_data, bot
+    )
+
+
+def _finalize_answer(answer_text, token_usage, user_question: str, retrieved_data: str, bot):
+    """
+    Post-process a raw model answer: no-info fallbacks, company phrasing,
+    clickable links and a single 'For more details:' section.
+    """
     # Post-process: convert plain URLs to clickable links and avoid duplicates
     try:
         import re
@@ -605,3 +687,83 @@ def get_ai_response(user_question: str, retrieved_data: str, api_key: str = None
         logger.error("Post-process error: %s", e)
         # If post-process fails, still return the model's raw answer
         return {"text": answer_text or "", "usage": token_usage}
+
+
+
+def stream_ai_response(user_question: str, retrieved_data: str, api_key: str = None, model: str = 'gpt-4o', bot_id: int = None):
+    """
+    Streaming variant of get_ai_response.
+
+    Yields {"type": "delta", "text": ...} events as tokens arrive, then one
+    {"type": "done", "text": ..., "usage": ...} event carrying the
+    post-processed answer (which may differ from the concatenated deltas,
+    e.g. links turned into anchors). Providers without a streaming API are
+    answered in one piece through get_ai_response.
+    """
+    try:
+        bot = get_profile(bot_id=bot_id) if bot_id else None
+    except Bot.DoesNotExist:
+        yield {"type": "done", "text": "⚠️ Bot not found.", "usage": dict(_ZERO_USAGE)}
+        return
+
+    provider, used_api_key = _resolve_provider(bot, api_key)
+    if provider not in STREAMING_PROVIDERS or not used_api_key:
+        result = get_ai_response(user_question, retrieved_data, api_key=api_key, model=model, bot_id=bot_id)
+        if result.get("text"):
+            yield {"type": "delta", "text": result["text"]}
+        yield {"type": "done", "text": result.get("text", ""), "usage": result.get("usage", dict(_ZERO_USAGE))}
+        return
+
+    prompt = _build_prompt(user_question, retrieved_data)
+    parts = []
+    token_usage = dict(_ZERO_USAGE)
+    stream = _stream_provider(provider, used_api_key, model, prompt)
+    try:
+        while True:
+            delta = next(stream)
+            parts.append(delta)
+            yield {"type": "delta", "text": delta}
+    except StopIteration as stop:
+        token_usage = stop.value or token_usage
+    except Exception as e:
+        error_text = _provider_error(e, provider, bot)
+        if not parts:
+            yield {"type": "done", "text": error_text, "usage": token_usage}
+            return
+        # Keep what the visitor has already seen rather than replacing it with an error.
+
+    final = _finalize_answer("".join(parts), token_usage, user_question, retrieved_data, bot)
+    yield {"type": "done", "text": final["text"], "usage": final["usage"]}
+
+
+async def astream_ai_response(user_question: str, retrieved_data: str, api_key: str = None, model: str = 'gpt-4o', bot_id: int = None):
+    """Async generator with the same events as stream_ai_response."""
+    try:
+        bot = await aget_profile(bot_id=bot_id) if bot_id else None
+    except Bot.DoesNotExist:
+        yield {"type": "done", "text": "⚠️ Bot not found.", "usage": dict(_ZERO_USAGE)}
+        return
+
+    provider, used_api_key = _resolve_provider(bot, api_key)
+    if provider not in STREAMING_PROVIDERS or not used_api_key:
+        result = await aget_ai_response(user_question, retrieved_data, api_key=api_key, model=model, bot_id=bot_id)
+        if result.get("text"):
+            yield {"type": "delta", "text": result["text"]}
+        yield {"type": "done", "text": result.get("text", ""), "usage": result.get("usage", dict(_ZERO_USAGE))}
+        return
+
+    prompt = _build_prompt(user_question, retrieved_data)
+    parts = []
+    parser = STREAMING_PROVIDERS[provider]()
+    try:
+        async for delta in _astream_provider(provider, used_api_key, model, prompt, parser):
+            parts.append(delta)
+            yield {"type": "delta", "text": delta}
+    except Exception as e:
+        error_text = await sync_to_async(_provider_error)(e, provider, bot)
+        if not parts:
+            yield {"type": "done", "text": error_text, "usage": dict(_ZERO_USAGE)}
+            return
+
+    final = await sync_to_async(_finalize_answer)("".join(parts), parser.token_usage(), user_question, retrieved_data, bot)
+    yield {"type": "done", "text": final["text"], "usage": final["usage"]}
@@ -2,23 +2,25 @@ from django.db.models.signals import post_save
 from django.dispatch import receiver
 from channels.layers import get_channel_layer
 from asgiref.sync import async_to_sync
+from bots.runtime import get_profile
+from knowledge.local_index import knowledge_changed
+from . import answer_cache
 from .models import Message
+from .live_events import chat_message_event, conversation_group
 
 @receiver(post_save, sender=Message)
 def broadcast_message(sender, instance, created, **kwargs):
-    if created:
+    # ChatConsumer saves with skip_broadcast and sends the event itself
+    if created and not getattr(instance, 'skip_broadcast', False):
         channel_layer = get_channel_layer()
         conversation = instance.conversation
-        bot = conversation.bot
+        public_key = get_profile(bot_id=conversation.bot_id).public_key
         
-        room_group_name = f'chat_{bot.public_key}_{conversation.session_id}'
+        room_group_name = conversation_group(public_key, conversation.session_id)
         
-        async_to_sync(channel_layer.group_send)(
-            room_group_name,
-            {
-                'type': 'chat_message',
-                'text': instance.text,
-                'sender': instance.sender,
-                'timestamp': str(instance.timestamp)
-            }
-        )
+        async_to_sync(channel_layer.group_send)(room_group_name, chat_message_event(instance))
+
+
+@receiver(knowledge_changed)
+def drop_cached_answers(sender, bot_id, **kwargs):
+    answer_cache.invalidate(bot_id)
@@ -0,0 +1,30 @@
+from celery import shared_task
+from django.conf import settings
+from bots.runtime import get_profile
+from . import live_replies
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+@shared_task(bind=True, max_retries=None)
+def live_chat_reply(self, bot_id, conversation_id, text):
+    """AI reply for a live-chat message (LIVE_REPLY_BACKEND='celery')."""
+    slot = None
+    try:
+        bot = get_profile(bot_id=bot_id)
+        slot = live_replies.acquire_slot(bot.workspace_id)
+        if slot is None:
+            # Workspace at its limit: wait for a slot without holding this worker
+            delay = getattr(settings, 'LIVE_REPLY_RETRY_DELAY', 0.5)
+            if self.request.retries * delay > getattr(settings, 'LIVE_REPLY_QUEUE_TIMEOUT', 60):
+                logger.warning("Live reply for conversation %s dropped: workspace %s busy", conversation_id, bot.workspace_id)
+                live_replies.save_reply(conversation_id, {"text": live_replies.BUSY_MESSAGE}, [])
+                return
+            raise self.retry(countdown=delay)
+        live_replies.generate_reply(bot, conversation_id, text)
+    except live_replies.GONE_ERRORS as e:
+        logger.warning("Live reply for conversation %s dropped: bot %s or conversation deleted (%s)", conversation_id, bot_id, e)
+    finally:
+        if slot is not None:
+            live_replies.release_slot(slot)
@@ -1,3 +1,86 @@
+from datetime import timedelta
+from io import StringIO
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import IntegrityError
 from django.test import TestCase
+from django.utils import timezone
+
+from accounts.models import Workspace
+from bots.models import Bot
+from . import live_replies
+from .models import Conversation, Message
+
+
+class ChatTestCase(TestCase):
+    def setUp(self):
+        owner = get_user_model().objects.create_user(username="owner", email="owner@example.com", password="x")
+        self.workspace = Workspace.objects.create(name="ws", owner=owner)
+        self.bot = Bot.objects.create(workspace=self.workspace)
+        cache.clear()
+
+
+class LiveReplyTests(ChatTestCase):
+    def slots_taken(self):
+        return [i for i in range(live_replies._max_per_workspace())
+                if cache.get(f'live_reply_slot:{self.workspace.id}:{i}')]
+
+    async def test_deleted_bot(self):
+        with self.assertLogs('chat.live_replies', 'WARNING'):
+            await live_replies._reply_in_loop(self.bot.id + 1000, 1, "hi")
+
+    async def test_deleted_conversation_releases_slot(self):
+        with mock.patch.object(live_replies, 'agenerate_reply', side_effect=IntegrityError("FOREIGN KEY")), \
+                self.assertLogs('chat.live_replies', 'WARNING'):
+            await live_replies._reply_in_loop(self.bot.id, 1, "hi")
+        self.assertEqual(self.slots_taken(), [])
+
+    def test_deleted_conversation_releases_slot_in_thread(self):
+        with mock.patch.object(live_replies, 'generate_reply', side_effect=IntegrityError("FOREIGN KEY")), \
+                self.assertLogs('chat.live_replies', 'WARNING'):
+            live_replies._reply_in_thread(self.bot.id, 1, "hi")
+        self.assertEqual(self.slots_taken(), [])
+
+
+class ConversationSummaryTests(ChatTestCase):
+    def setUp(self):
+        super().setUp()
+        self.conversation = Conversation.objects.create(bot=self.bot, session_id="s1")
+
+    def summary(self):
+        conv = Conversation.objects.get(pk=self.conversation.pk)
+        return conv.message_count, conv.unread_count, conv.last_message_preview
+
+    def test_message_save_updates_summary(self):
+        Message.objects.create(conversation=self.conversation, sender='USER', text="hello")
+        Message.objects.create(conversation=self.conversation, sender='USER', text="anyone?")
+        Message.objects.create(conversation=self.conversation, sender='BOT', text="hi there")
+        self.assertEqual(self.summary(), (3, 2, "hi there"))
+
+    def test_edits_do_not_count(self):
+        msg = Message.objects.create(conversation=self.conversation, sender='USER', text="hello")
+        msg.text = "hello!"
+        msg.save()
+        self.assertEqual(self.summary(), (1, 1, "hello"))
+
+    def test_late_older_message_keeps_preview(self):
+        Message.objects.create(conversation=self.conversation, sender='BOT', text="newest")
+        late = Message(conversation=self.conversation, sender='USER', text="older")
+        with mock.patch('django.utils.timezone.now', return_value=timezone.now() - timedelta(minutes=5)):
+            late.save()
+        self.assertEqual(self.summary(), (2, 1, "newest"))
+
+    def test_long_text_preview_is_cut(self):
+        Message.objects.create(conversation=self.conversation, sender='USER', text="x" * 1000)
+        self.assertEqual(len(self.summary()[2]), 255)
 
-# Create your tests here.
+    def test_backfill(self):
+        for sender, text in (('USER', "q1"), ('BOT', "a1"), ('USER', "q2"), ('USER', "q3")):
+            Message.objects.create(conversation=self.conversation, sender=sender, text=text)
+        Conversation.objects.filter(pk=self.conversation.pk).update(
+            message_count=0, unread_count=0, last_message_preview='', last_message_at=None)
+        call_command('backfill_conversation_summaries', stdout=StringIO())
+        self.assertEqual(self.summary(), (4, 2, "q3"))
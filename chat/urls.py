@@ -4,4 +4,5 @@ from . import views
 urlpatterns = [
    
   path('chat/', views.ChatAPI, name='chat_api'),
+  path('chat/cache-stats/', views.cache_stats, name='chat_cache_stats'),
 ]
\ No newline at end of file
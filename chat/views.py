@@ -3,11 +3,14 @@ import json
 import re
 import logging
 from urllib.parse import urlparse
-from time import time as epoch_time
+from time import time as epoch_time, monotonic
+from uuid import uuid4
 
 from django.conf import settings
+from django.contrib.admin.views.decorators import staff_member_required
 from django.db.models import Q
-from django.http import JsonResponse
+from django.core.handlers.asgi import ASGIRequest
+from django.http import HttpResponse, JsonResponse, StreamingHttpResponse
 from django.shortcuts import render
 from django.views.decorators.csrf import csrf_exempt
 import requests
@@ -16,19 +19,19 @@ logger = logging.getLogger(__name__)
 import numpy as np
 from django.utils.text import slugify
 from knowledge.models import Chunk
-from sentence_transformers import SentenceTransformer
-import requests
-import numpy as np
-from django.utils.text import slugify
-from knowledge.models import Chunk
-from sentence_transformers import SentenceTransformer
+from knowledge.embeddings import embed_query, query_cache_stats
+from knowledge import qdrant, local_index
 import jwt
+from asgiref.sync import async_to_sync, sync_to_async
+from channels.layers import get_channel_layer
 from jwt.exceptions import ExpiredSignatureError, InvalidTokenError
 
 from bots.models import Bot
+from bots.runtime import get_profile
 from accounts.models import Workspace
 from knowledge.models import KnowledgeSource
-from .services import get_ai_response
+from .services import aget_ai_response, astream_ai_response, stream_ai_response
+from . import answer_cache
 from .greeting import _handle_greeting
 from .models import Conversation, Message
 
@@ -36,59 +39,70 @@ from .models import Conversation, Message
 def _tokenize(text: str):
     return re.findall(r"\w+", (text or "").lower())
 
-# Load embedding model once (you can change it to match your chunk embedding model)
-embedding_model = SentenceTransformer("all-MiniLM-L6-v2")
-
 
-def embed_text(text: str):
-    """Convert text into vector embedding."""
-    if not text:
-        return []
-    emb = embedding_model.encode(text)
-    return emb.tolist()
+def _local_search(bot, query_vector, top_k):
+    """Search the in-process index; returns (retrieved_data, source_ids)."""
+    matches = local_index.search(bot.id, query_vector, top_k=top_k)
+    retrieved_texts = [txt for _, txt, _ in matches if txt]
+    source_ids = list(dict.fromkeys(sid for _, _, sid in matches if sid))
+    return "\n".join(retrieved_texts), source_ids
 
 
 def get_relevant_data(bot, user_question: str, top_k: int = 3):
-    """Retrieve semantically relevant chunks from Qdrant Cloud."""
+    """
+    Retrieve semantically relevant chunks.
+
+    Small/medium bots (<= LOCAL_INDEX_MAX_CHUNKS chunks) are searched in the
+    in-process index built from Chunk.embedding; larger bots go to Qdrant and
+    fall back to the local index if Qdrant fails. LOCAL_VECTOR_INDEX
+    ('auto' / 'always' / 'off') controls this.
+    """
     if not user_question:
         return "", []
 
     # ✅ FIXED: use knowledge_source__bot instead of source__bot
-    chunks = Chunk.objects.filter(knowledge_source__bot=bot)
-    if not chunks.exists():
+    chunks = Chunk.objects.filter(knowledge_source__bot_id=bot.id)
+    chunk_count = chunks.count()
+    if not chunk_count:
         logger.warning("No chunks found for this bot.")
         return "", []
 
+    mode = getattr(settings, 'LOCAL_VECTOR_INDEX', 'auto')
+    local_ok = mode == 'always' or (
+        mode == 'auto' and chunk_count <= getattr(settings, 'LOCAL_INDEX_MAX_CHUNKS', 5000)
+    )
+
+    # Step 1: Embed the user's question (cached per normalised question)
+    query_vector = embed_query(user_question)
+
+    if local_ok:
+        try:
+            return _local_search(bot, query_vector, top_k)
+        except Exception as e:
+            logger.error("Local vector search failed, trying Qdrant: %s", e)
+            local_ok = False
+
     # Pick first chunk just to get Qdrant connection info
     first_chunk = chunks.first()
     if not first_chunk.qdrant_url or not first_chunk.qdrant_api_key:
         logger.warning("Qdrant credentials missing for this bot.")
         return "", []
 
-    # Step 1: Embed the user's question
-    query_vector = embed_text(user_question)
-
-    # Step 2: Build request
-    headers = {
-        "Content-Type": "application/json",
-        "api-key": first_chunk.qdrant_api_key,
-    }
-
+    # Step 2: Search through the shared (pooled) Qdrant client
     collection_name = first_chunk.collection_name or slugify(bot.name)
-    search_url = f"{first_chunk.qdrant_url}/collections/{collection_name}/points/search"
-
-    payload = {
-        "vector": query_vector,
-        "limit": top_k,
-        "with_payload": True,
-    }
 
     try:
-        response = requests.post(search_url, headers=headers, json=payload, timeout=15)
-        response.raise_for_status()
-        results = response.json().get("result", [])
+        results = qdrant.search(
+            first_chunk.qdrant_url,
+            first_chunk.qdrant_api_key,
+            collection_name,
+            query_vector,
+            limit=top_k,
+        )
     except Exception as e:
         logger.error("Qdrant query failed: %s", e)
+        if mode == 'auto' and chunk_count <= getattr(settings, 'LOCAL_INDEX_MAX_CHUNKS', 5000):
+            return _local_search(bot, query_vector, top_k)
         return "", []
 
     # Step 3: Collect top text chunks
@@ -129,162 +143,323 @@ def _extract_origin(request):
 
 
 
-@csrf_exempt
-def ChatAPI(request):
-    if request.method != 'POST':
-        return JsonResponse({'error': 'Method not allowed'}, status=405)
+def _sse(event: dict) -> str:
+    return f"data: {json.dumps(event)}\n\n"
+
 
+class _DeltaRelay:
+    """
+    Coalesces streamed deltas into `chat_message_delta` group events for the
+    conversation's ChatConsumer group, at most one per STREAM_BROADCAST_INTERVAL.
+    """
+
+    def __init__(self, bot, conversation):
+        self.group = f'chat_{bot.public_key}_{conversation.session_id}' if conversation else None
+        self.channel_layer = get_channel_layer() if self.group else None
+        self.stream_id = uuid4().hex
+        self.interval = getattr(settings, 'STREAM_BROADCAST_INTERVAL', 0.05)
+        self.pending = []
+        self.last_sent = 0.0
+
+    def add(self, text):
+        """Queue a delta; returns a group event when one is due."""
+        self.pending.append(text)
+        if monotonic() - self.last_sent >= self.interval:
+            return self.take()
+        return None
+
+    def take(self):
+        if not self.channel_layer or not self.pending:
+            self.pending = []
+            return None
+        event = {
+            'type': 'chat_message_delta',
+            'stream_id': self.stream_id,
+            'sender': 'BOT',
+            'delta': ''.join(self.pending),
+        }
+        self.pending, self.last_sent = [], monotonic()
+        return event
+
+
+def _save_bot_answer(bot, conversation, query_vector, answer_text, source_ids, token_usage):
+    answer_cache.store(bot, query_vector, answer_text, source_ids)
+
+    # Save Bot Message with Token Usage
+    if conversation:
+        Message.objects.create(
+            conversation=conversation,
+            sender='BOT',
+            text=answer_text,
+            sources=json.dumps(source_ids),
+            prompt_tokens=token_usage.get("prompt_tokens"),
+            completion_tokens=token_usage.get("completion_tokens"),
+            total_tokens=token_usage.get("total_tokens")
+        )
+
+
+def _stream_chat_answer(bot, conversation, message, query_vector, retrieved_data, source_ids):
+    """
+    SSE generator for ChatAPI under WSGI: relays provider deltas to the HTTP
+    client and to the ChatConsumer group. The final message is saved at the
+    end, so the usual post_save broadcast still delivers the full text.
+    """
+    relay = _DeltaRelay(bot, conversation)
+    answer_text, token_usage = "", {}
+    for event in stream_ai_response(
+        user_question=message,
+        retrieved_data=retrieved_data,
+        api_key=bot.ai_api_key,
+        model=bot.ai_model,
+        bot_id=bot.id,
+    ):
+        if event["type"] == "delta":
+            yield _sse({"type": "delta", "text": event["text"]})
+            group_event = relay.add(event["text"])
+            if group_event:
+                async_to_sync(relay.channel_layer.group_send)(relay.group, group_event)
+        else:
+            answer_text, token_usage = event["text"], event.get("usage") or {}
+    group_event = relay.take()
+    if group_event:
+        async_to_sync(relay.channel_layer.group_send)(relay.group, group_event)
+
+    _save_bot_answer(bot, conversation, query_vector, answer_text, source_ids, token_usage)
+    yield _sse({"type": "done", "answer": answer_text, "sources": source_ids})
+
+
+async def _astream_chat_answer(bot, conversation, message, query_vector, retrieved_data, source_ids):
+    """ASGI counterpart of _stream_chat_answer, on the async provider client."""
+    relay = _DeltaRelay(bot, conversation)
+    answer_text, token_usage = "", {}
+    async for event in astream_ai_response(
+        user_question=message,
+        retrieved_data=retrieved_data,
+        api_key=bot.ai_api_key,
+        model=bot.ai_model,
+        bot_id=bot.id,
+    ):
+        if event["type"] == "delta":
+            yield _sse({"type": "delta", "text": event["text"]})
+            group_event = relay.add(event["text"])
+            if group_event:
+                await relay.channel_layer.group_send(relay.group, group_event)
+        else:
+            answer_text, token_usage = event["text"], event.get("usage") or {}
+    group_event = relay.take()
+    if group_event:
+        await relay.channel_layer.group_send(relay.group, group_event)
+
+    await sync_to_async(_save_bot_answer)(bot, conversation, query_vector, answer_text, source_ids, token_usage)
+    yield _sse({"type": "done", "answer": answer_text, "sources": source_ids})
+
+
+def _event_stream_response(events):
+    response = StreamingHttpResponse(events, content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'  # don't let nginx buffer the stream
+    return response
+
+
+def _prepare_chat_turn(request):
+    """
+    Synchronous part of ChatAPI: auth, plan checks, conversation bookkeeping,
+    greetings, the answer cache and retrieval. Returns either a finished
+    JsonResponse or a dict describing the turn still to be answered.
+    """
+    # Parse JSON
     try:
-        # Parse JSON
-        try:
-            payload_data = request.body.decode('utf-8') if request.body else "{}"
-            data = json.loads(payload_data)
-        except json.JSONDecodeError:
-            return JsonResponse({'error': 'Invalid JSON body'}, status=400)
-
-        data_in = json.loads(request.body)
-        message = data_in.get('message', '').strip()
-        jwt_token = data_in.get('jwt', '')
-        session_id = data_in.get('session_id')  # Extract session_id
-
-        if not jwt_token:
-            return JsonResponse({'error': 'Missing JWT'}, status=401)
-        if not message:
-            return JsonResponse({'error': 'Empty message'}, status=400)
-
-        # Verify JWT
+        payload_data = request.body.decode('utf-8') if request.body else "{}"
+        data = json.loads(payload_data)
+    except json.JSONDecodeError:
+        return JsonResponse({'error': 'Invalid JSON body'}, status=400)
+
+    data_in = json.loads(request.body)
+    message = data_in.get('message', '').strip()
+    jwt_token = data_in.get('jwt', '')
+    session_id = data_in.get('session_id')  # Extract session_id
+    wants_stream = bool(data_in.get('stream')) or 'text/event-stream' in request.headers.get('Accept', '')
+
+    if not jwt_token:
+        return JsonResponse({'error': 'Missing JWT'}, status=401)
+    if not message:
+        return JsonResponse({'error': 'Empty message'}, status=400)
+
+    # Verify JWT
+    try:
+        jwt_leeway = getattr(settings, 'REDBOT_JWT_LEEWAY', 300)  # seconds
+        leeway = jwt_leeway if settings.DEBUG else min(jwt_leeway, 120)
+        payload = jwt.decode(jwt_token, settings.SECRET_KEY, algorithms=['HS256'], leeway=leeway)
+
+        # Optional explicit exp check for extra logging
+        exp = payload.get('exp')
+        if exp:
+            now = int(epoch_time())
+            if now > int(exp) + leeway:
+                logger.debug("Manual exp check failed: now=%s exp=%s leeway=%s", now, exp, leeway)
+                return JsonResponse({'error': 'Token expired'}, status=401)
+
+    except ExpiredSignatureError:
+        # Log details for debugging
         try:
-            jwt_leeway = getattr(settings, 'REDBOT_JWT_LEEWAY', 300)  # seconds
-            leeway = jwt_leeway if settings.DEBUG else min(jwt_leeway, 120)
-            payload = jwt.decode(jwt_token, settings.SECRET_KEY, algorithms=['HS256'], leeway=leeway)
-
-            # Optional explicit exp check for extra logging
-            exp = payload.get('exp')
-            if exp:
-                now = int(epoch_time())
-                if now > int(exp) + leeway:
-                    logger.debug("Manual exp check failed: now=%s exp=%s leeway=%s", now, exp, leeway)
-                    return JsonResponse({'error': 'Token expired'}, status=401)
-
-        except ExpiredSignatureError:
-            # Log details for debugging
+            unverified = jwt.decode(jwt_token, options={'verify_signature': False})
+            exp = unverified.get('exp')
+            now = int(epoch_time())
+            delta = (now - int(exp)) if exp else None
+            logger.warning("Token expired: now=%s exp=%s delta=%ss", now, exp, delta)
+        except Exception:
+            pass
+        return JsonResponse({'error': 'Token expired'}, status=401)
+    except InvalidTokenError as e:
+        logger.error("Invalid token: %s", e)
+        return JsonResponse({'error': f'Invalid token: {e}'}, status=401)
+
+    # Locate bot from token (cached runtime profile, see bots.runtime)
+    bot_obj = None
+    for lookup in ('bot_id', 'public_key'):
+        if not bot_obj and payload.get(lookup):
             try:
-                unverified = jwt.decode(jwt_token, options={'verify_signature': False})
-                exp = unverified.get('exp')
-                now = int(epoch_time())
-                delta = (now - int(exp)) if exp else None
-                logger.warning("Token expired: now=%s exp=%s delta=%ss", now, exp, delta)
-            except Exception:
+                bot_obj = get_profile(**{lookup: payload[lookup]})
+            except Bot.DoesNotExist:
                 pass
-            return JsonResponse({'error': 'Token expired'}, status=401)
-        except InvalidTokenError as e:
-            logger.error("Invalid token: %s", e)
-            return JsonResponse({'error': f'Invalid token: {e}'}, status=401)
-
-        # Locate bot from token
-        bot_obj = None
-        if payload.get('bot_id'):
-            bot_obj = Bot.objects.filter(id=payload['bot_id']).first()
-        if not bot_obj and payload.get('public_key'):
-            bot_obj = Bot.objects.filter(public_key=payload['public_key']).first()
-        if not bot_obj:
-            return JsonResponse({'error': 'Bot not found'}, status=404)
-
-        # Enforce origin (dev-friendly + same-origin allowed)
-        origin = _extract_origin(request)
-        allow = True  # default allow if no origin is present
-        if origin:
-            try:
-                origin_host = (urlparse(origin).hostname or '').lower()
-            except Exception:
-                origin_host = ''
-            request_host = (request.get_host().split(':')[0] or '').lower()
-
-            allow = False
-            if origin_host and origin_host == request_host:
-                allow = True  # same-origin
-            elif bot_obj.is_origin_allowed(origin):
-                allow = True  # allowed by admin list
-            elif settings.DEBUG and origin_host in ('localhost', '127.0.0.1'):
-                allow = True  # dev convenience
-
-            if not allow:
-                return JsonResponse({'error': 'Origin not allowed for this bot.'}, status=403)
-
-        # Enforce workspace/bot/plan
-        if not bot_obj.is_enabled:
-            return JsonResponse({"answer": "Bot is disabled by the owner.", "sources": []}, status=200)
-
-        ws = bot_obj.workspace
-        if not ws.approved:
-            return JsonResponse({"answer": "This workspace is not approved yet.", "sources": []}, status=200)
-        if not ws.is_operational:
-            return JsonResponse({"answer": "You’re out of plan. Please renew to continue.", "sources": []}, status=200)
-
-        ap = bot_obj.active_plan
-        if not ap or not ap.includes_ai:
-            return JsonResponse({"answer": "AI chat is not included in this plan.", "sources": []}, status=200)
-
-        # Get or Create Conversation and Save User Message
-        conversation = None
-        if session_id:
-            conversation, _ = Conversation.objects.get_or_create(
-                bot=bot_obj,
-                session_id=session_id
+    if not bot_obj:
+        return JsonResponse({'error': 'Bot not found'}, status=404)
+
+    # Enforce origin (dev-friendly + same-origin allowed)
+    origin = _extract_origin(request)
+    allow = True  # default allow if no origin is present
+    if origin:
+        try:
+            origin_host = (urlparse(origin).hostname or '').lower()
+        except Exception:
+            origin_host = ''
+        request_host = (request.get_host().split(':')[0] or '').lower()
+
+        allow = False
+        if origin_host and origin_host == request_host:
+            allow = True  # same-origin
+        elif bot_obj.is_origin_allowed(origin):
+            allow = True  # allowed by admin list
+        elif settings.DEBUG and origin_host in ('localhost', '127.0.0.1'):
+            allow = True  # dev convenience
+
+        if not allow:
+            return JsonResponse({'error': 'Origin not allowed for this bot.'}, status=403)
+
+    # Enforce workspace/bot/plan
+    if not bot_obj.is_enabled:
+        return JsonResponse({"answer": "Bot is disabled by the owner.", "sources": []}, status=200)
+
+    ws = bot_obj.workspace
+    if not ws.approved:
+        return JsonResponse({"answer": "This workspace is not approved yet.", "sources": []}, status=200)
+    if not ws.is_operational:
+        return JsonResponse({"answer": "You’re out of plan. Please renew to continue.", "sources": []}, status=200)
+
+    ap = bot_obj.active_plan
+    if not ap or not ap.includes_ai:
+        return JsonResponse({"answer": "AI chat is not included in this plan.", "sources": []}, status=200)
+
+    # Get or Create Conversation and Save User Message
+    conversation = None
+    if session_id:
+        conversation, _ = Conversation.objects.get_or_create(
+            bot_id=bot_obj.id,
+            session_id=session_id
+        )
+        # Save User Message
+        Message.objects.create(
+            conversation=conversation,
+            sender='USER',
+            text=message
+        )
+
+    # Greetings
+    # 🗣️ Greetings Handling (from greeting.py)
+    greeting_response = _handle_greeting(message, bot_obj, ws)
+    if greeting_response:
+        # Save Greeting Response
+        if conversation:
+            Message.objects.create(
+                conversation=conversation,
+                sender='BOT',
+                text=greeting_response
             )
-            # Save User Message
+        return JsonResponse({"answer": greeting_response, "sources": []})
+
+
+    # Near-duplicate of a recent question: answer without retrieval/LLM.
+    # embed_query is cached, so get_relevant_data reuses this vector.
+    query_vector = embed_query(message)
+    cached = answer_cache.lookup(bot_obj, query_vector)
+    if cached:
+        answer_text, source_ids = cached
+        if conversation:
             Message.objects.create(
                 conversation=conversation,
-                sender='USER',
-                text=message
+                sender='BOT',
+                text=answer_text,
+                sources=json.dumps(source_ids),
             )
+        return JsonResponse({"answer": answer_text, "sources": source_ids})
+
+    # Retrieve knowledge; the AI call itself happens in ChatAPI
+    retrieved_data, source_ids = get_relevant_data(bot_obj, message, top_k=1)
+    return {
+        "bot": bot_obj,
+        "conversation": conversation,
+        "message": message,
+        "query_vector": query_vector,
+        "retrieved_data": retrieved_data,
+        "source_ids": source_ids,
+        "wants_stream": wants_stream,
+    }
+
+
+@csrf_exempt
+async def ChatAPI(request):
+    """
+    Async so the provider call is awaited on the shared HTTP/2 client instead
+    of holding a worker thread for the whole generation.
+    """
+    if request.method != 'POST':
+        return JsonResponse({'error': 'Method not allowed'}, status=405)
 
-        # Greetings
-        # 🗣️ Greetings Handling (from greeting.py)
-        greeting_response = _handle_greeting(message, bot_obj, ws)
-        if greeting_response:
-            # Save Greeting Response
-            if conversation:
-                Message.objects.create(
-                    conversation=conversation,
-                    sender='BOT',
-                    text=greeting_response
-                )
-            return JsonResponse({"answer": greeting_response, "sources": []})
-
-
-        # Retrieve knowledge and call AI
-        retrieved_data, source_ids = get_relevant_data(bot_obj, message, top_k=1)
-        response_data = get_ai_response(
-            user_question=message,
-            retrieved_data=retrieved_data,
+    try:
+        turn = await sync_to_async(_prepare_chat_turn)(request)
+        if isinstance(turn, HttpResponse):
+            return turn
+
+        bot_obj = turn.pop("bot")
+        wants_stream = turn.pop("wants_stream")
+        if wants_stream:
+            if isinstance(request, ASGIRequest):
+                return _event_stream_response(_astream_chat_answer(bot_obj, **turn))
+            return _event_stream_response(_stream_chat_answer(bot_obj, **turn))
+
+        response_data = await aget_ai_response(
+            user_question=turn["message"],
+            retrieved_data=turn["retrieved_data"],
             api_key=bot_obj.ai_api_key,
             model=bot_obj.ai_model,
             bot_id=bot_obj.id,
         )
-        
+
         # Extract text and usage from response
         answer_text = response_data.get("text", "") if isinstance(response_data, dict) else response_data
         token_usage = response_data.get("usage", {}) if isinstance(response_data, dict) else {}
-        
+
         # Log token usage for monitoring
         if token_usage.get("total_tokens"):
             logger.info("Token Usage - Prompt: %s, Completion: %s, Total: %s",
                        token_usage.get('prompt_tokens', 0),
                        token_usage.get('completion_tokens', 0),
                        token_usage.get('total_tokens', 0))
-        
-        # Save Bot Message with Token Usage
-        if conversation:
-            Message.objects.create(
-                conversation=conversation,
-                sender='BOT',
-                text=answer_text,
-                sources=json.dumps(source_ids),
-                prompt_tokens=token_usage.get("prompt_tokens"),
-                completion_tokens=token_usage.get("completion_tokens"),
-                total_tokens=token_usage.get("total_tokens")
-            )
+
+        source_ids = turn["source_ids"]
+        await sync_to_async(_save_bot_answer)(
+            bot_obj, turn["conversation"], turn["query_vector"], answer_text, source_ids, token_usage
+        )
 
         return JsonResponse({"answer": answer_text, "sources": source_ids})
 
@@ -292,10 +467,14 @@ def ChatAPI(request):
         logger.error("ChatAPI exception: %s", e)
         return JsonResponse({'error': str(e)}, status=500)
 
-
 def chat_page_view(request):
     return render(request, 'chat.html')
 
 
-
-
+@staff_member_required
+def cache_stats(request):
+    """Answer cache and query embedding cache counters of the process serving this request."""
+    return JsonResponse({
+        'answer_cache': answer_cache.stats(),
+        'query_embedding_cache': query_cache_stats(),
+    })
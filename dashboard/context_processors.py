@@ -6,7 +6,7 @@ def workspace_plan(request):
     if request.user.is_authenticated:
         from accounts.models import Workspace
         try:
-            ws = Workspace.objects.filter(owner=request.user).order_by('-created_at').first()
+            ws = Workspace.objects.filter(owner=request.user).with_active_plan().order_by('-created_at').first()
             if ws:
                 return {
                     'workspace': ws,
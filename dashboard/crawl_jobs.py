@@ -0,0 +1,271 @@
+# dashboard/crawl_jobs.py
+"""
+Website data fetcher crawls as background jobs.
+
+website_datafetcher_crawl creates a CrawlJob and returns at once; the crawl
+runs here and every page is written as a CrawlPage the moment it is parsed,
+together with the crawler's frontier (CrawlJob.state), then announced on the
+`crawl_job_{id}` channel-layer group for the dashboard's progress stream.
+
+CRAWL_JOB_BACKEND:
+  'thread' - a small in-process thread pool (CRAWL_JOB_THREADS)
+  'celery' - dashboard.tasks.run_crawl_job on a Celery worker
+
+Re-crawls are conditional (WorkspaceCrawlCache keeps each URL's ETag /
+Last-Modified / body hash and last parse). When the job has a bot, a page
+is written to that bot's knowledge only if it changed, so a refresh of a
+mostly static site embeds next to nothing; `manage.py recrawl_sites` runs
+those refreshes on a schedule.
+
+Cancelling sets CrawlJob.cancel_requested; the crawler checks it after each
+page and stops fetching. A job whose worker died (deploy, crash) is picked
+up again from its saved frontier by `manage.py resume_crawl_jobs`.
+"""
+import asyncio
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from asgiref.sync import async_to_sync, sync_to_async
+from channels.layers import get_channel_layer
+from django.conf import settings
+from django.utils import timezone
+
+from knowledge.models import KnowledgeSource
+from .models import CrawledUrl, CrawlJob, CrawlPage
+from .website_crawler import CrawlCache, Crawler
+
+logger = logging.getLogger(__name__)
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def job_group(job_id):
+    return f'crawl_job_{job_id}'
+
+
+def page_event(page):
+    return {
+        'type': 'crawl.page',
+        'id': page.id,
+        'order': page.order,
+        'url': page.url,
+        'title': page.title,
+        'sections': len(page.sections),
+        'unchanged': page.unchanged,
+    }
+
+
+def status_event(job):
+    return {
+        'type': 'crawl.status',
+        'status': job.status,
+        'pages_done': job.pages_done,
+        'error': job.error,
+    }
+
+
+class WorkspaceCrawlCache(CrawlCache):
+    """CrawlCache stored as CrawledUrl rows, shared by every crawl of the workspace."""
+
+    def __init__(self, workspace_id):
+        super().__init__()
+        self.workspace_id = workspace_id
+
+    async def get(self, url):
+        row = await CrawledUrl.objects.filter(
+            workspace_id=self.workspace_id, url_hash=CrawledUrl.hash_url(url)
+        ).afirst()
+        if row is None:
+            return None
+        return {
+            "etag": row.etag,
+            "last_modified": row.last_modified,
+            "content_hash": row.content_hash,
+            "page": row.page,
+            "links": row.links,
+        }
+
+    async def put(self, url, entry):
+        await CrawledUrl.objects.aupdate_or_create(
+            workspace_id=self.workspace_id,
+            url_hash=CrawledUrl.hash_url(url),
+            defaults=dict(entry, url=url, etag=entry["etag"][:255], last_modified=entry["last_modified"][:64]),
+        )
+
+
+def page_text(page):
+    """
+    Knowledge source content for a crawled page: the "Copy Complete Data"
+    layout with the title block and each section set apart by two blank
+    lines, which split_text() never chunks across. Every section so gets
+    chunks of its own, hashed on its own text.
+    """
+    blocks = [f"Title: {page['title']}\n\nURL: {page['url']}"]
+    for section in page["sections"]:
+        if section["heading"] not in ("Intro", "Content"):
+            blocks.append(f"{section['heading']}\n\n{section['content']}")
+        else:
+            blocks.append(section["content"])
+    return "\n\n\n".join(blocks)
+
+
+def ingest_page(job, page):
+    """
+    Create or update the job's bot's knowledge source for a page.
+    Sections are chunked separately (see page_text), so the hash diff in
+    KnowledgeSource.save() embeds the chunks of page["changed_sections"]
+    and leaves every other section's chunks (and vectors) as they are.
+    """
+    cached = CrawledUrl.objects.filter(
+        workspace_id=job.workspace_id, url_hash=CrawledUrl.hash_url(page["url"])
+    ).select_related('knowledge_source').first()
+    source = cached.knowledge_source if cached else None
+    if source is not None and source.bot_id == job.bot_id:
+        if page.get("unchanged"):
+            return source
+        content = page_text(page)
+        if content == source.content and page["title"][:255] == source.title:
+            return source
+        logger.info("Crawl job %s: %s changed in %d of %d sections", job.id, page["url"],
+                    len(page.get("changed_sections", page["sections"])), len(page["sections"]))
+        source.title = page["title"][:255]
+        source.content = content
+        source.save()
+    else:
+        source = KnowledgeSource.objects.create(
+            bot_id=job.bot_id, title=page["title"][:255], source_type='TEXT', content=page_text(page)
+        )
+    if cached:
+        CrawledUrl.objects.filter(pk=cached.pk).update(knowledge_source=source)
+    return source
+
+
+class JobCrawler(Crawler):
+    """Crawler that stores pages and checkpoints as it goes instead of collecting them."""
+
+    def __init__(self, job):
+        super().__init__(job.start_url, job.max_pages, state=job.state, cache=WorkspaceCrawlCache(job.workspace_id))
+        self.job = job
+        self.channel_layer = get_channel_layer()
+
+    async def on_page(self, order, page):
+        state = self.state()  # snapshot on the loop; the frontier keeps changing while we save
+        stored, cancel = await sync_to_async(self._store)(order, page, state)
+        if stored is not None and self.channel_layer is not None:
+            event = dict(page_event(stored), pages_done=self.pages_done)
+            await self.channel_layer.group_send(job_group(self.job.id), event)
+        if cancel:
+            await self.stop()
+
+    def _store(self, order, page, state):
+        fields = {
+            'url': page['url'],
+            'title': page['title'][:500],
+            'path': page['path'][:2000],
+            'sections': page['sections'],
+            'unchanged': page.get('unchanged', False),
+        }
+        # A resumed job may refetch a page that was stored after the last checkpoint
+        stored, created = CrawlPage.objects.get_or_create(job_id=self.job.id, order=order, defaults=fields)
+        if self.job.bot_id:
+            try:
+                ingest_page(self.job, page)
+            except Exception as e:
+                logger.error("Crawl job %s: adding %s to knowledge failed: %s", self.job.id, page['url'], e)
+        CrawlJob.objects.filter(pk=self.job.id).update(
+            pages_done=state['pages_done'], state=state, updated_at=timezone.now()
+        )
+        cancel = CrawlJob.objects.filter(pk=self.job.id, cancel_requested=True).exists()
+        return (stored if created else None), cancel
+
+
+def _announce(job_id):
+    channel_layer = get_channel_layer()
+    if channel_layer is not None:
+        async_to_sync(channel_layer.group_send)(job_group(job_id), status_event(CrawlJob.objects.get(pk=job_id)))
+
+
+def _finish(job_id, status, error=''):
+    CrawlJob.objects.filter(pk=job_id).update(status=status, error=error, finished_at=timezone.now())
+    _announce(job_id)
+
+
+def run_job(job_id):
+    """Run (or resume) a crawl job to the end; safe to call twice for one job."""
+    claimed = CrawlJob.objects.filter(pk=job_id, status__in=['PENDING', 'RUNNING']).update(status='RUNNING')
+    if not claimed:
+        return
+    job = CrawlJob.objects.get(pk=job_id)
+    if job.cancel_requested:
+        _finish(job_id, 'CANCELLED')
+        return
+    try:
+        async_to_sync(JobCrawler(job).run)()
+    except Exception as e:
+        logger.exception("Crawl job %s failed", job_id)
+        _finish(job_id, 'FAILED', str(e))
+        return
+    cancelled = CrawlJob.objects.filter(pk=job_id, cancel_requested=True).exists()
+    _finish(job_id, 'CANCELLED' if cancelled else 'DONE')
+
+
+def _thread_pool():
+    global _executor
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                _executor = ThreadPoolExecutor(
+                    max_workers=getattr(settings, 'CRAWL_JOB_THREADS', 2),
+                    thread_name_prefix='crawl-job',
+                )
+    return _executor
+
+
+def start_job(job):
+    """Hand a PENDING (or interrupted RUNNING) job to the configured backend."""
+    backend = getattr(settings, 'CRAWL_JOB_BACKEND', 'thread')
+    if backend == 'celery':
+        from .tasks import run_crawl_job
+        run_crawl_job.delay(job.id)
+    elif backend == 'thread':
+        _thread_pool().submit(run_job, job.id)
+    else:
+        raise ValueError(f"Unknown CRAWL_JOB_BACKEND: {backend}")
+
+
+def cancel_job(job):
+    CrawlJob.objects.filter(pk=job.pk).update(cancel_requested=True)
+    # Not picked up by a worker yet: nothing else will notice the flag
+    if CrawlJob.objects.filter(pk=job.pk, status='PENDING').update(status='CANCELLED', finished_at=timezone.now()):
+        _announce(job.pk)
+
+
+class JobListener:
+    """
+    Async context manager subscribing a private channel to a job's group.
+    receive() returns the next event, or None on timeout.
+    """
+
+    def __init__(self, job_id):
+        self.group = job_group(job_id)
+        self.channel_layer = get_channel_layer()
+        self.channel = None
+
+    async def __aenter__(self):
+        self.channel = await self.channel_layer.new_channel()
+        await self.channel_layer.group_add(self.group, self.channel)
+        return self
+
+    async def __aexit__(self, *exc):
+        try:
+            await self.channel_layer.group_discard(self.group, self.channel)
+        except Exception as e:
+            logger.debug("group_discard failed for %s: %s", self.group, e)
+
+    async def receive(self, timeout):
+        try:
+            return await asyncio.wait_for(self.channel_layer.receive(self.channel), timeout)
+        except asyncio.TimeoutError:
+            return None
@@ -0,0 +1,375 @@
+# dashboard/html_extract.py
+"""
+Single-pass section extraction for crawled pages.
+
+The BeautifulSoup parse (website_crawler.parse_page_soup) builds a whole
+tree, strips junk from it in three find_all passes, finds the content
+blocks and walks each block's parents to skip nested ones. SectionBuilder
+gets the same sections from one stream of parser events: the open elements
+sit on a stack with running counts (junk ancestors, list/table ancestors,
+script-like ancestors), so each tag and text node costs O(1).
+
+Two parsers can drive it:
+  'lxml'        lxml.etree.HTMLParser(target=...) - libxml2's C tokenizer
+  'html.parser' the standard library's HTMLParser - pure Python, no extras
+extract_page() uses lxml when it's installed and falls back to html.parser.
+
+On well-formed pages both give the sections the BeautifulSoup parse gave.
+On broken markup libxml2 closes tags the way browsers do (`<li>a<li>b` is
+two items, an open <p> ends where a <div> starts) while html.parser keeps
+them nested as written, so the two can differ there. Pages without a
+<body> tag always use html.parser, since libxml2 would add one.
+"""
+from collections import Counter
+from html.parser import HTMLParser
+from urllib.parse import urljoin, urlparse
+import logging
+import re
+
+try:
+    from lxml import etree
+    LXML_AVAILABLE = True
+except ImportError:  # optional: html.parser does the same job, slower
+    etree = None
+    LXML_AVAILABLE = False
+
+logger = logging.getLogger(__name__)
+
+# Removed with their content
+JUNK_TAGS = frozenset([
+    "script", "style", "noscript", "iframe", "svg", "canvas",
+    "button", "input", "select", "textarea",
+    "nav", "footer", "header", "aside", "form",
+    "menu", "dialog", "map",
+])
+# ... and so is anything whose class or id matches (simple spam filter)
+JUNK_ATTRS = re.compile(r"(sidebar|menu|footer|header|nav|popup|cookie|ad-|advert)", re.I)
+
+CONTENT_TAGS = frozenset(['h1', 'h2', 'h3', 'h4', 'p', 'ul', 'ol', 'pre', 'table', 'blockquote'])
+HEADING_TAGS = frozenset(['h1', 'h2', 'h3', 'h4'])
+# Content tags inside one of these belong to it, not a block of their own
+NESTING_TAGS = frozenset(['ul', 'ol', 'table', 'blockquote', 'pre'])
+# BeautifulSoup's get_text() leaves out text inside these (Script, Stylesheet,
+# TemplateString, RubyTextString, RubyParenthesisString)
+STRING_CONTAINERS = frozenset(['script', 'style', 'template', 'rt', 'rp'])
+# Closed as soon as they open (BeautifulSoup's empty-element tags)
+VOID_TAGS = frozenset([
+    'area', 'base', 'br', 'col', 'embed', 'hr', 'img', 'input', 'keygen', 'link', 'menuitem',
+    'meta', 'param', 'source', 'track', 'wbr', 'basefont', 'bgsound', 'command', 'frame',
+    'image', 'isindex', 'nextid', 'spacer',
+])
+
+_SPACES = re.compile(r'\s+')
+_BODY_TAG = re.compile(r'<body[\s/>]', re.I)
+
+
+def block_text(tag, strings):
+    """Text of a content block from its strings (list items for ul/ol)."""
+    if tag in ("ul", "ol"):
+        items = (_SPACES.sub(' ', " ".join(item)).strip() for item in strings)
+        return "\n".join("- " + item for item in items if item)
+    return _SPACES.sub(' ', " ".join(strings)).strip()
+
+
+def build_sections(blocks):
+    """Group (tag, text) content blocks, in document order, into heading sections."""
+    sections = []
+    current_heading = "Intro"
+    current_content = []
+    for tag, text in blocks:
+        if not text:
+            continue
+        if tag in HEADING_TAGS:
+            if current_content:
+                sections.append({"heading": current_heading, "content": "\n\n".join(current_content)})
+                current_content = []
+            current_heading = text
+        else:
+            current_content.append(text)
+    if current_content:
+        sections.append({"heading": current_heading, "content": "\n\n".join(current_content)})
+    return sections
+
+
+def page_links(hrefs, url):
+    links = set()
+    for href in hrefs:
+        href = href.split("#")[0].strip()
+        if not href: continue
+        if href.startswith(("mailto:", "tel:", "javascript:")): continue
+        links.add(urljoin(url, href))
+    return links
+
+
+class _Open:
+    __slots__ = ('tag', 'junk', 'sinks', 'block', 'items', 'body')
+
+    def __init__(self, tag):
+        self.tag = tag
+        self.junk = None  # 'inner' / 'outer': which junk count this element added to
+        self.sinks = 0  # string lists this element pushed onto SectionBuilder.sinks
+        self.block = None
+        self.items = None
+        self.body = False
+
+
+class SectionBuilder:
+    """
+    Parser target (lxml's interface: start / end / data / comment / close)
+    turning one event stream into parse_page's (page, links).
+
+    end() follows BeautifulSoup's tree building: it closes everything up to
+    the most recent open element of that name and ignores stray end tags,
+    so html.parser input nests exactly as it did in the soup.
+
+    Only the first <body> is cleaned and searched; with no <body> at all the
+    whole document is. Which one applies is only known at the end, so text
+    and blocks are kept per scope ('body' / 'outer') until close().
+    """
+
+    def __init__(self, url):
+        self.url = url
+        self.stack = []
+        self.open = Counter()  # open elements by name
+        self.buffer = []  # adjacent data events make one string, as in the soup
+        self.hrefs = []
+        self.body = 0  # 0 before the first <body>, 1 inside it, 2 after it
+        self.junk_inner = 0  # open junk elements inside the body
+        self.junk_outer = 0  # ... and before it (only matters without a body)
+        self.nesting = 0
+        self.containers = 0
+        self.blocks = []  # [scope, tag, strings, text] in document order
+        self.texts = {'body': [], 'outer': []}
+        self.sinks = []  # string lists of the open blocks, list items and heading
+        self.items = None  # item list of the open ul/ol block
+        self.titles = []  # (in body, removed, all strings, cleaned strings) per <title>
+        self.open_titles = []
+        self.heading = None  # strings of the first h1/h2 in the body
+
+    def _scope(self):
+        return ('outer', 'body', None)[self.body]
+
+    def _removed(self, scope):
+        if scope == 'body':
+            return self.junk_inner > 0
+        return scope == 'outer' and self.junk_outer > 0
+
+    def start(self, tag, attrib):
+        self.flush()
+        href = attrib.get('href') if tag == 'a' else None
+        if href is not None:
+            self.hrefs.append(href)  # links count even inside junk
+
+        frame = _Open(tag)
+        self.stack.append(frame)
+        self.open[tag] += 1
+        scope = self._scope()
+        if tag == 'body' and self.body == 0:
+            self.body = 1
+            frame.body = True
+        elif scope and (tag in JUNK_TAGS or JUNK_ATTRS.search(attrib.get('class') or '')
+                        or JUNK_ATTRS.search(attrib.get('id') or '')):
+            frame.junk = 'inner' if scope == 'body' else 'outer'
+            if scope == 'body':
+                self.junk_inner += 1
+            else:
+                self.junk_outer += 1
+        if tag in STRING_CONTAINERS:
+            self.containers += 1
+        if tag == 'title':
+            strings = ([], [])
+            self.open_titles.append(strings)
+            self.titles.append((self.body == 1, self._removed(scope)) + strings)
+
+        if scope and not frame.body and not self._removed(scope):
+            if tag in CONTENT_TAGS and not self.nesting:
+                frame.block = [scope, tag, [], '']
+                self.blocks.append(frame.block)
+                if tag in ('ul', 'ol'):
+                    frame.items = self.items = frame.block[2]
+                else:
+                    self._sink(frame, frame.block[2])
+            elif tag == 'li' and self.items is not None:
+                item = []
+                self.items.append(item)
+                self._sink(frame, item)
+            if tag in ('h1', 'h2') and scope == 'body' and self.heading is None:
+                self.heading = []
+                self._sink(frame, self.heading)
+        if tag in NESTING_TAGS:
+            self.nesting += 1
+
+    def _sink(self, frame, strings):
+        self.sinks.append(strings)
+        frame.sinks += 1
+
+    def end(self, tag):
+        self.flush()
+        if not self.open[tag]:
+            return
+        while True:
+            frame = self.stack.pop()
+            self._close(frame)
+            if frame.tag == tag:
+                return
+
+    def _close(self, frame):
+        tag = frame.tag
+        self.open[tag] -= 1
+        if frame.junk == 'inner':
+            self.junk_inner -= 1
+        elif frame.junk == 'outer':
+            self.junk_outer -= 1
+        if tag in NESTING_TAGS:
+            self.nesting -= 1
+        if tag in STRING_CONTAINERS:
+            self.containers -= 1
+        if tag == 'title':
+            self.open_titles.pop()
+        if frame.body:
+            self.body = 2
+        if frame.sinks:
+            del self.sinks[-frame.sinks:]
+        if frame.items is not None:
+            self.items = None
+        if frame.block is not None:
+            frame.block[3] = block_text(tag, frame.block[2])
+
+    def data(self, data):
+        self.buffer.append(data)
+
+    def flush(self):
+        if not self.buffer:
+            return
+        text = ''.join(self.buffer).strip()
+        self.buffer.clear()
+        if not text or self.containers:
+            return
+        scope = self._scope()
+        removed = self._removed(scope)
+        for strings, cleaned in self.open_titles:
+            strings.append(text)
+            if not removed:
+                cleaned.append(text)
+        if scope is None or removed:
+            return
+        self.texts[scope].append(text)
+        for sink in self.sinks:
+            sink.append(text)
+
+    def cdata(self, data):
+        self.flush()
+        self.buffer.append(data)
+        self.flush()
+
+    def comment(self, text):
+        self.flush()
+
+    def pi(self, target, data=None):
+        self.flush()
+
+    def doctype(self, *args):
+        self.flush()
+
+    def close(self):
+        self.flush()
+        while self.stack:
+            self._close(self.stack.pop())
+        return self.result()
+
+    def result(self):
+        has_body = self.body > 0
+        scope = 'body' if has_body else 'outer'
+        sections = build_sections((tag, text) for s, tag, _, text in self.blocks if s == scope)
+        if not sections:
+            sections = [{"heading": "Content", "content": "\n".join(self.texts[scope])}]
+
+        title = ""
+        for in_body, removed, strings, cleaned in self.titles:
+            # Only the cleaned part of the document loses <title>s (or their junk)
+            if has_body and not in_body:
+                title = "".join(strings)
+                break
+            if not removed:
+                title = "".join(cleaned)
+                break
+        if not title and self.heading is not None:
+            title = "".join(self.heading)
+        if not title:
+            title = urlparse(self.url).netloc
+
+        page = {
+            "url": self.url,
+            "title": title,
+            "path": urlparse(self.url).path or "/",
+            "sections": sections
+        }
+        return page, page_links(self.hrefs, self.url)
+
+
+class _StdlibParser(HTMLParser):
+    """html.parser events into a SectionBuilder, empty elements closed like BeautifulSoup does."""
+
+    def __init__(self, target):
+        super().__init__(convert_charrefs=True)
+        self.target = target
+
+    def handle_starttag(self, tag, attrs):
+        self.target.start(tag, {k: v or '' for k, v in attrs})
+        if tag in VOID_TAGS:
+            self.target.end(tag)
+
+    def handle_startendtag(self, tag, attrs):
+        self.target.start(tag, {k: v or '' for k, v in attrs})
+        self.target.end(tag)
+
+    def handle_endtag(self, tag):
+        self.target.end(tag)
+
+    def handle_data(self, data):
+        self.target.data(data)
+
+    def handle_comment(self, data):
+        self.target.comment(data)
+
+    def handle_decl(self, decl):
+        self.target.doctype(decl)
+
+    def handle_pi(self, data):
+        self.target.pi(data)
+
+    def unknown_decl(self, data):
+        if data.upper().startswith('CDATA['):
+            self.target.cdata(data[len('CDATA['):])
+        else:
+            self.target.comment(data)
+
+
+def _extract_stdlib(html, url):
+    builder = SectionBuilder(url)
+    parser = _StdlibParser(builder)
+    parser.feed(html)
+    parser.close()
+    return builder.close()
+
+
+def _extract_lxml(html, url):
+    parser = etree.HTMLParser(target=SectionBuilder(url))
+    parser.feed(html)
+    return parser.close()
+
+
+def extract_page(html: str, url: str, parser: str = 'auto'):
+    """
+    Parse one fetched page in a single pass.
+    Returns ({"url", "title", "path", "sections"}, links found on the page).
+    parser: 'auto' / 'lxml' (lxml if installed) or 'html.parser'.
+    """
+    if parser in ('auto', 'lxml') and LXML_AVAILABLE and _BODY_TAG.search(html):
+        try:
+            return _extract_lxml(html, url)
+        except (etree.Error, ValueError) as e:
+            logger.debug("lxml could not parse %s, using html.parser: %s", url, e)
+    elif parser not in ('auto', 'lxml', 'html.parser'):
+        raise ValueError(f"Unknown HTML parser: {parser}")
+    return _extract_stdlib(html, url)
@@ -0,0 +1,57 @@
+# dashboard/management/commands/recrawl_sites.py
+"""
+Scheduled site refresh: re-run the latest finished crawl of every site
+(per workspace, start URL and bot) that is older than --older-than hours.
+
+Run it from cron. The re-crawls are conditional (see dashboard.crawl_jobs),
+so unchanged pages cost a 304 or a hash check and are not re-embedded.
+With CRAWL_JOB_BACKEND='celery' the jobs are queued, otherwise they run
+here one after another.
+"""
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from dashboard import crawl_jobs
+from dashboard.models import CrawlJob
+
+
+class Command(BaseCommand):
+    help = "Re-crawl previously crawled sites to pick up changed pages."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--older-than', type=float, default=24, help='hours since the last crawl finished')
+        parser.add_argument('--knowledge-only', action='store_true', help="only crawls that feed a bot's knowledge")
+
+    def handle(self, *args, **options):
+        jobs = CrawlJob.objects.filter(status='DONE').order_by('-finished_at')
+        if options['knowledge_only']:
+            jobs = jobs.filter(bot__isnull=False)
+        active = set(
+            CrawlJob.objects.filter(status__in=['PENDING', 'RUNNING'])
+            .values_list('workspace_id', 'start_url', 'bot_id')
+        )
+        cutoff = timezone.now() - timedelta(hours=options['older_than'])
+
+        latest = {}
+        for job in jobs.only('id', 'workspace_id', 'start_url', 'bot_id', 'max_pages', 'finished_at'):
+            latest.setdefault((job.workspace_id, job.start_url, job.bot_id), job)
+
+        celery = getattr(settings, 'CRAWL_JOB_BACKEND', 'thread') == 'celery'
+        started = 0
+        for key, last in latest.items():
+            if key in active or last.finished_at > cutoff:
+                continue
+            job = CrawlJob.objects.create(
+                workspace_id=last.workspace_id, bot_id=last.bot_id,
+                start_url=last.start_url, max_pages=last.max_pages,
+            )
+            self.stdout.write(f"  job {job.id}: {job.start_url}")
+            if celery:
+                crawl_jobs.start_job(job)
+            else:
+                crawl_jobs.run_job(job.id)
+            started += 1
+        self.stdout.write(self.style.SUCCESS(f"Started {started} re-crawls."))
@@ -0,0 +1,36 @@
+# dashboard/management/commands/resume_crawl_jobs.py
+"""
+Restart website crawl jobs whose worker went away (deploy, crash, OOM).
+
+A job counts as interrupted when it is still PENDING/RUNNING but hasn't
+stored a page for --stale seconds. It resumes from its saved frontier;
+pages it already stored are kept. With CRAWL_JOB_BACKEND='celery' the jobs
+are queued, otherwise they run here one after another.
+"""
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from dashboard import crawl_jobs
+from dashboard.models import CrawlJob
+
+
+class Command(BaseCommand):
+    help = "Resume interrupted website crawl jobs from their saved frontier."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--stale', type=int, default=120, help='seconds without progress')
+
+    def handle(self, *args, **options):
+        cutoff = timezone.now() - timedelta(seconds=options['stale'])
+        jobs = list(CrawlJob.objects.filter(status__in=['PENDING', 'RUNNING'], updated_at__lt=cutoff))
+        celery = getattr(settings, 'CRAWL_JOB_BACKEND', 'thread') == 'celery'
+        for job in jobs:
+            self.stdout.write(f"  job {job.id}: {job.start_url} ({job.pages_done}/{job.max_pages} pages)")
+            if celery:
+                crawl_jobs.start_job(job)
+            else:
+                crawl_jobs.run_job(job.id)
+        self.stdout.write(self.style.SUCCESS(f"Resumed {len(jobs)} crawl jobs."))
@@ -0,0 +1,53 @@
+# Generated by Django 5.0.7 on 2026-10-18 06:41
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+        ('accounts', '0014_contact'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CrawlJob',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('start_url', models.URLField(max_length=2000)),
+                ('max_pages', models.PositiveIntegerField(default=30)),
+                ('status', models.CharField(choices=[('PENDING', 'Pending'), ('RUNNING', 'Running'), ('DONE', 'Done'), ('CANCELLED', 'Cancelled'), ('FAILED', 'Failed')], default='PENDING', max_length=10)),
+                ('pages_done', models.PositiveIntegerField(default=0)),
+                ('state', models.JSONField(blank=True, null=True)),
+                ('cancel_requested', models.BooleanField(default=False)),
+                ('error', models.TextField(blank=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('finished_at', models.DateTimeField(blank=True, null=True)),
+                ('workspace', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='crawl_jobs', to='accounts.workspace')),
+            ],
+        ),
+        migrations.CreateModel(
+            name='CrawlPage',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('order', models.PositiveIntegerField(help_text='Discovery order within the crawl')),
+                ('url', models.URLField(max_length=2000)),
+                ('title', models.CharField(blank=True, max_length=500)),
+                ('path', models.CharField(blank=True, max_length=2000)),
+                ('sections', models.JSONField(default=list)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('job', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='pages', to='dashboard.crawljob')),
+            ],
+            options={
+                'ordering': ['order'],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='crawlpage',
+            constraint=models.UniqueConstraint(fields=('job', 'order'), name='unique_crawl_page_order'),
+        ),
+    ]
@@ -0,0 +1,47 @@
+# Generated by Django 5.0.7 on 2026-10-18 06:44
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0014_contact'),
+        ('bots', '0012_botenquiry'),
+        ('dashboard', '0001_initial'),
+        ('knowledge', '0006_chunk_embedding_float32'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='crawljob',
+            name='bot',
+            field=models.ForeignKey(blank=True, help_text="Add changed pages to this bot's knowledge", null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='crawl_jobs', to='bots.bot'),
+        ),
+        migrations.AddField(
+            model_name='crawlpage',
+            name='unchanged',
+            field=models.BooleanField(default=False, help_text='Same as the previous crawl of this URL'),
+        ),
+        migrations.CreateModel(
+            name='CrawledUrl',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('url', models.URLField(max_length=2000)),
+                ('url_hash', models.CharField(max_length=64)),
+                ('etag', models.CharField(blank=True, max_length=255)),
+                ('last_modified', models.CharField(blank=True, max_length=64)),
+                ('content_hash', models.CharField(blank=True, max_length=64)),
+                ('page', models.JSONField(default=dict)),
+                ('links', models.JSONField(default=list)),
+                ('fetched_at', models.DateTimeField(auto_now=True)),
+                ('knowledge_source', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='knowledge.knowledgesource')),
+                ('workspace', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='crawled_urls', to='accounts.workspace')),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name='crawledurl',
+            constraint=models.UniqueConstraint(fields=('workspace', 'url_hash'), name='unique_crawled_url'),
+        ),
+    ]
@@ -1,3 +1,101 @@
+import hashlib
+
 from django.db import models
+from accounts.models import Workspace
+from bots.models import Bot
+
+
+class CrawlJob(models.Model):
+    """
+    A website data fetcher crawl run in the background (dashboard.crawl_jobs).
+    Pages are stored as CrawlPage rows as they arrive; `state` is the
+    crawler's frontier after the last stored page, so an interrupted job
+    resumes instead of starting over.
+    """
+    STATUSES = (
+        ('PENDING', 'Pending'),
+        ('RUNNING', 'Running'),
+        ('DONE', 'Done'),
+        ('CANCELLED', 'Cancelled'),
+        ('FAILED', 'Failed'),
+    )
+    FINISHED = ('DONE', 'CANCELLED', 'FAILED')
+
+    workspace = models.ForeignKey(Workspace, on_delete=models.CASCADE, related_name='crawl_jobs')
+    bot = models.ForeignKey(
+        Bot, on_delete=models.SET_NULL, null=True, blank=True, related_name='crawl_jobs',
+        help_text="Add changed pages to this bot's knowledge"
+    )
+    start_url = models.URLField(max_length=2000)
+    max_pages = models.PositiveIntegerField(default=30)
+    status = models.CharField(max_length=10, choices=STATUSES, default='PENDING')
+    pages_done = models.PositiveIntegerField(default=0)
+    state = models.JSONField(null=True, blank=True)
+    cancel_requested = models.BooleanField(default=False)
+    error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    def __str__(self):
+        return f"{self.start_url} ({self.get_status_display()})"
+
+    @property
+    def is_finished(self):
+        return self.status in self.FINISHED
+
+
+class CrawlPage(models.Model):
+    job = models.ForeignKey(CrawlJob, on_delete=models.CASCADE, related_name='pages')
+    order = models.PositiveIntegerField(help_text="Discovery order within the crawl")
+    url = models.URLField(max_length=2000)
+    title = models.CharField(max_length=500, blank=True)
+    path = models.CharField(max_length=2000, blank=True)
+    sections = models.JSONField(default=list)
+    unchanged = models.BooleanField(default=False, help_text="Same as the previous crawl of this URL")
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ['order']
+        constraints = [
+            models.UniqueConstraint(fields=['job', 'order'], name='unique_crawl_page_order')
+        ]
+
+    def as_dict(self):
+        """The crawl_site() page shape."""
+        return {
+            "url": self.url, "title": self.title, "path": self.path, "sections": self.sections,
+            "unchanged": self.unchanged,
+        }
+
+
+class CrawledUrl(models.Model):
+    """
+    Conditional re-crawl cache for one URL of a workspace: the validators and
+    body hash of the last fetch, its parsed page and links, and the knowledge
+    source the page was ingested into.
+    """
+    workspace = models.ForeignKey(Workspace, on_delete=models.CASCADE, related_name='crawled_urls')
+    url = models.URLField(max_length=2000)
+    url_hash = models.CharField(max_length=64)  # sha256(url): URLs are too long for a MySQL unique index
+    etag = models.CharField(max_length=255, blank=True)
+    last_modified = models.CharField(max_length=64, blank=True)
+    content_hash = models.CharField(max_length=64, blank=True)
+    page = models.JSONField(default=dict)
+    links = models.JSONField(default=list)
+    knowledge_source = models.ForeignKey(
+        'knowledge.KnowledgeSource', on_delete=models.SET_NULL, null=True, blank=True, related_name='+'
+    )
+    fetched_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['workspace', 'url_hash'], name='unique_crawled_url')
+        ]
+
+    def __str__(self):
+        return self.url
 
-# Create your models here.
+    @staticmethod
+    def hash_url(url):
+        return hashlib.sha256(url.encode('utf-8')).hexdigest()
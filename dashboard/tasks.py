@@ -0,0 +1,8 @@
+from celery import shared_task
+from . import crawl_jobs
+
+
+@shared_task(acks_late=True, reject_on_worker_lost=True)
+def run_crawl_job(job_id):
+    """Website data fetcher crawl (CRAWL_JOB_BACKEND='celery'); redelivered jobs resume from their frontier."""
+    crawl_jobs.run_job(job_id)
@@ -1,3 +1,274 @@
-from django.test import TestCase
+import gzip
+import os
+import random
+from unittest import mock, skipUnless
 
-# Create your tests here.
+import numpy as np
+
+from django.contrib.auth import get_user_model
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.urls import reverse
+
+from accounts.models import Workspace
+from billing.models import Plan
+
+from . import html_extract
+from .html_extract import LXML_AVAILABLE, extract_page
+from bots.models import Bot
+from .crawl_jobs import ingest_page
+from .models import CrawledUrl, CrawlJob, CrawlPage
+from .website_crawler import Crawler, parse_page, parse_page_soup, parse_sitemap
+
+PAGES_DIR = os.path.join(os.path.dirname(__file__), 'testdata', 'pages')
+URL = 'https://example.com/docs/page'
+
+
+def fixture_pages():
+    for name in sorted(os.listdir(PAGES_DIR)):
+        with open(os.path.join(PAGES_DIR, name), encoding='utf-8') as f:
+            yield name, f.read()
+
+
+# Well-formed, so lxml and html.parser build the same tree
+TRICKY_PAGES = {
+    'nested lists': """<html><body><h2>Steps</h2>
+        <ol><li>One <b>bold</b><ul><li>one-a</li><li>one-b <p>para in li</p></li></ul></li>
+        <li>  Two&nbsp;&nbsp;spaced  </li><li></li></ol>
+        <table><tr><td><ul><li>in table</li></ul></td><td><p>cell para</p></td></tr></table>
+        <blockquote><h3>quoted heading</h3><p>quoted</p></blockquote></body></html>""",
+    'junk classes and ids': """<html><head><title>Junk</title></head><body>
+        <div class="main-menu"><p>menu para</p><a href="/from-menu">menu link</a></div>
+        <div id="Sidebar-left"><h2>Sidebar</h2></div>
+        <p class="intro ad-slot">kept, "ad-slot" is not "ad-"</p><p class="x ad-banner">ad</p>
+        <nav><h2>Nav heading</h2></nav><p>Real <span class="cookie-note">cookie</span>content</p>
+        <aside><p>aside</p></aside><section><h2>After junk</h2><p>text</p></section></body></html>""",
+    'entities': """<html><head><title>AT&amp;T &mdash; caf&eacute;</title></head><body>
+        <h1>Fish &amp; Chips</h1><p>1 &lt; 2 &gt; 0 &#8364;5 &#x2603; &quot;q&quot; &nbsp;x</p>
+        <p>AT&amp;T and A&amp;B</p></body></html>""",
+    'no title': """<html><head></head><body><div class="wrap"><h3>not a title</h3>
+        <h2>Second <em>level</em></h2><p>body</p></div></body></html>""",
+    'empty title': """<html><head><title>   </title></head><body><p>text</p></body></html>""",
+    'no headings': """<html><head><title>Plain</title></head><body><div>loose text<br>more
+        <span>inline</span></div><!-- a comment --><div>second<div>nested</div></div></body></html>""",
+    'scripts templates ruby': """<html><head><title>Title</title><!-- c --><style>p{}</style></head>
+        <body><p>a<script>var s = "<p>not text</p>";</script>b</p><template><p>hidden</p></template>
+        <p><ruby>漢<rt>kan</rt><rp>(</rp></ruby> c</p><noscript><p>no js</p></noscript></body></html>""",
+    'headings only': """<html><body><h1>One</h1><h2>Two</h2><h3></h3></body></html>""",
+    'links': """<html><body><a href="/a#frag">a</a><a href="#top">top</a><a href="mailto:x@y.z">m</a>
+        <a href=" tel:123 ">t</a><a href="javascript:void(0)">j</a><a href="../up/">up</a><a>none</a>
+        <footer><a href="https://other.example.org/x">other</a></footer></body></html>""",
+}
+
+# html.parser keeps these nested as written, like the BeautifulSoup tree did;
+# libxml2 closes them the way a browser would
+BROKEN_PAGES = {
+    'no body': """<title>Fragment</title><h2>Heading</h2><p>para<div class="nav">x</div>""",
+    'unclosed items': """<html><body><ul><li>one<li>two<li>three</ul><p>para<p>next</body></html>""",
+    'stray end tags': """<html><body></div><p>a</span>b</p></li><h2>H</h3>c</h2><p>d</body></html>""",
+    'junk before body': """<html class="has-sidebar"><head><title>t</title></head><body><p>kept</p></body></html>""",
+}
+
+
+class ExtractPageParityTests(SimpleTestCase):
+    """extract_page must give exactly what the BeautifulSoup parse gave."""
+
+    def assertParity(self, pages, parser):
+        for name, html in pages:
+            with self.subTest(page=name, parser=parser):
+                self.assertEqual(extract_page(html, URL, parser=parser), parse_page_soup(html, URL))
+
+    def test_fixture_pages_html_parser(self):
+        self.assertParity(fixture_pages(), 'html.parser')
+
+    @skipUnless(LXML_AVAILABLE, "lxml is not installed")
+    def test_fixture_pages_lxml(self):
+        self.assertParity(fixture_pages(), 'lxml')
+
+    def test_tricky_markup_html_parser(self):
+        self.assertParity(TRICKY_PAGES.items(), 'html.parser')
+
+    @skipUnless(LXML_AVAILABLE, "lxml is not installed")
+    def test_tricky_markup_lxml(self):
+        self.assertParity(TRICKY_PAGES.items(), 'lxml')
+
+    def test_broken_markup_html_parser(self):
+        self.assertParity(BROKEN_PAGES.items(), 'html.parser')
+
+    def test_sections(self):
+        page, _ = extract_page(TRICKY_PAGES['nested lists'], URL, parser='html.parser')
+        self.assertEqual(page['title'], 'Steps')
+        self.assertEqual(page['sections'], [{
+            'heading': 'Steps',
+            'content': "- One bold one-a one-b para in li\n- one-a\n- one-b para in li\n- Two spaced\n\n"
+                       "in table cell para\n\n"
+                       "quoted heading quoted",
+        }])
+
+    def test_links(self):
+        _, links = extract_page(TRICKY_PAGES['links'], URL)
+        self.assertEqual(links, {'https://example.com/a', 'https://example.com/up/', 'https://other.example.org/x'})
+
+
+class ParserSelectionTests(SimpleTestCase):
+    @skipUnless(LXML_AVAILABLE, "lxml is not installed")
+    def test_pages_without_body_skip_lxml(self):
+        with mock.patch.object(html_extract, '_extract_lxml') as lxml:
+            page, _ = extract_page(BROKEN_PAGES['no body'], URL, parser='lxml')
+        lxml.assert_not_called()
+        self.assertEqual(page['title'], 'Fragment')
+
+    @skipUnless(LXML_AVAILABLE, "lxml is not installed")
+    def test_lxml_errors_fall_back(self):
+        html = TRICKY_PAGES['entities']
+        with mock.patch.object(html_extract, '_extract_lxml', side_effect=ValueError("unsupported")):
+            self.assertEqual(extract_page(html, URL, parser='lxml'), parse_page_soup(html, URL))
+
+    def test_unknown_parser(self):
+        with self.assertRaises(ValueError):
+            extract_page('<p>x</p>', URL, parser='html5lib')
+
+    @override_settings(CRAWLER_HTML_PARSER='soup')
+    def test_parse_page_setting(self):
+        with mock.patch('dashboard.website_crawler.extract_page') as extract:
+            parse_page(TRICKY_PAGES['entities'], URL)
+        extract.assert_not_called()
+
+
+URLSET = b"""<?xml version="1.0" encoding="UTF-8"?>
+<urlset xmlns="http://www.sitemaps.org/schemas/sitemap/0.9"
+        xmlns:image="http://www.google.com/schemas/sitemap-image/1.1">
+  <url><loc> https://example.com/blog/post/ </loc><lastmod>2024-05-02</lastmod><priority>0.8</priority>
+    <image:image><image:loc>https://cdn.example.com/p.png</image:loc></image:image></url>
+  <url><loc>https://example.com/about/</loc><lastmod>2024-05-02T10:00:00+02:00</lastmod></url>
+  <url><loc>https://example.com/x/</loc><priority>high</priority><lastmod>yesterday</lastmod></url>
+</urlset>"""
+
+
+class SitemapTests(SimpleTestCase):
+    def test_urlset(self):
+        urls, sitemaps = parse_sitemap(URLSET)
+        self.assertEqual(sitemaps, [])
+        self.assertEqual(urls, [
+            ('https://example.com/blog/post/', 0.8, 1714608000.0),
+            ('https://example.com/about/', 0.5, 1714636800.0),
+            ('https://example.com/x/', 0.5, 0.0),
+        ])
+
+    def test_gzipped_index(self):
+        index = b"""<sitemapindex xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">
+            <sitemap><loc>https://example.com/posts.xml.gz</loc><lastmod>2024-01-01</lastmod></sitemap>
+            <sitemap><loc>https://example.com/pages.xml</loc></sitemap></sitemapindex>"""
+        self.assertEqual(parse_sitemap(gzip.compress(index)),
+                         ([], ['https://example.com/posts.xml.gz', 'https://example.com/pages.xml']))
+
+    def test_frontier_order(self):
+        crawler = Crawler('https://example.com/', sitemaps=False)
+        crawler.enqueue('https://example.com/tag/a/')
+        crawler.enqueue('https://example.com/about/')
+        crawler.enqueue('https://example.com/blog/2024/old/', 0.8, 1000.0)
+        crawler.enqueue('https://example.com/blog/2024/new/', 0.8, 2000.0)
+        crawler.enqueue('https://example.com/contact/', 0.3)
+        crawler.enqueue('https://example.com/about/#team', 0.9)  # already queued
+        order = [entry[-1] for entry in sorted(crawler.frontier)]
+        self.assertEqual(order, [
+            'https://example.com/blog/2024/new/', 'https://example.com/blog/2024/old/',
+            'https://example.com/contact/', 'https://example.com/about/', 'https://example.com/tag/a/',
+        ])
+
+    def test_resume_old_checkpoint(self):
+        state = {'frontier': [[3, 'https://example.com/a/b/'], [1, 'https://example.com/c/']],
+                 'seen': [], 'queued': 4, 'pages_done': 1}
+        crawler = Crawler('https://example.com/', state=state)
+        self.assertEqual([entry[-2:] for entry in sorted(crawler.frontier)],
+                         [(1, 'https://example.com/c/'), (3, 'https://example.com/a/b/')])
+        self.assertEqual(Crawler('https://example.com/', state=crawler.state()).frontier, crawler.frontier)
+
+
+class CrawlProgressTests(TestCase):
+    """Under WSGI (the test client) the progress partial polls instead of opening the SSE stream."""
+
+    def setUp(self):
+        owner = get_user_model().objects.create_user(username="owner", email="owner@example.com", password="x")
+        ws = Workspace.objects.create(name="ws", owner=owner, approved=True, enable_website_datafetcher=True)
+        Plan.objects.create(workspace=ws)
+        self.client.force_login(owner)
+        self.job = CrawlJob.objects.create(workspace=ws, start_url='https://example.com/', max_pages=10,
+                                           status='RUNNING', pages_done=3)
+        CrawlPage.objects.create(job=self.job, order=0, url='https://example.com/', title='Home', path='/',
+                                 sections=[{'heading': 'Intro', 'content': 'hi'}])
+        self.progress_url = reverse('dashboard:website_datafetcher_progress', args=[self.job.id])
+
+    @mock.patch('dashboard.crawl_jobs.start_job')
+    def test_crawl_returns_polling_progress(self, start_job):
+        response = self.client.post(reverse('dashboard:website_datafetcher_crawl'),
+                                    {'url': 'https://example.org/', 'max_pages': 5})
+        start_job.assert_called_once()
+        self.assertContains(response, 'hx-trigger="every 2s"')
+        self.assertNotContains(response, 'EventSource')
+
+    def test_progress_while_running(self):
+        response = self.client.get(self.progress_url)
+        self.assertContains(response, '3 / 10 pages')
+        self.assertContains(response, 'width: 30%')
+        self.assertContains(response, 'Home (1 sections)')
+        self.assertContains(response, self.progress_url)
+
+    def test_progress_when_finished(self):
+        CrawlJob.objects.filter(pk=self.job.pk).update(status='FAILED', error='DNS lookup failed')
+        response = self.client.get(self.progress_url)
+        self.assertContains(response, 'Results Found')
+        self.assertContains(response, 'Crawl failed: DNS lookup failed')
+        self.assertNotContains(response, self.progress_url)
+
+
+@mock.patch('knowledge.models.qdrant')
+@mock.patch('knowledge.models.embed_texts', side_effect=lambda texts, batch_size=32: [np.ones(4, np.float32) for _ in texts])
+class IngestPageTests(TestCase):
+    def setUp(self):
+        owner = get_user_model().objects.create_user(username="owner", email="owner@example.com", password="x")
+        ws = Workspace.objects.create(name="ws", owner=owner)
+        self.job = CrawlJob.objects.create(workspace=ws, bot=Bot.objects.create(workspace=ws),
+                                           start_url='https://example.com/', max_pages=10)
+        CrawledUrl.objects.create(workspace=ws, url=URL, url_hash=CrawledUrl.hash_url(URL))
+        rng = random.Random(3)
+        words = [f"w{i}" for i in range(2000)]
+        self.sections = [
+            {'heading': f'Part {i}', 'content': "\n\n".join(" ".join(rng.choices(words, k=60)) + "." for _ in range(4))}
+            for i in range(12)
+        ]
+
+    def page(self, sections, title='Docs'):
+        return {'url': URL, 'title': title, 'path': '/docs/page', 'sections': sections,
+                'changed_sections': list(range(len(sections)))}
+
+    def test_only_changed_sections_are_embedded(self, embed_texts, qdrant):
+        source = ingest_page(self.job, self.page(self.sections))
+        before = set(source.chunks.values_list('vector_id', flat=True))
+        embed_texts.reset_mock()
+
+        sections = [dict(s) for s in self.sections]
+        sections[0]['content'] = "New opening words. " + sections[0]['content']
+        sections[7]['content'] += "\n\nOne more paragraph."
+        page = dict(self.page(sections), changed_sections=[0, 7])
+        self.assertEqual(ingest_page(self.job, page).pk, source.pk)
+
+        embedded = [text for call in embed_texts.call_args_list for text in call.args[0]]
+        self.assertEqual(len(embedded), 2)
+        self.assertTrue(embedded[0].startswith("Part 0\n\nNew opening words."))
+        self.assertIn(embedded[1], f"Part 7\n\n{sections[7]['content']}")
+        # Only section 0's old first chunk went; section 7 gained one
+        self.assertEqual(len(before - set(source.chunks.values_list('vector_id', flat=True))), 1)
+
+    def test_title_change_only_touches_the_title_block(self, embed_texts, qdrant):
+        source = ingest_page(self.job, self.page(self.sections))
+        embed_texts.reset_mock()
+        ingest_page(self.job, dict(self.page(self.sections, title='Docs v2'), changed_sections=[]))
+        embed_texts.assert_called_once_with([f"Title: Docs v2\n\nURL: {URL}"], batch_size=32)
+        self.assertEqual(set(source.chunks.values_list('collection_name', flat=True)), {'docs'})
+
+    def test_same_content_is_not_saved(self, embed_texts, qdrant):
+        ingest_page(self.job, self.page(self.sections))
+        embed_texts.reset_mock()
+        with self.assertNumQueries(1):
+            ingest_page(self.job, dict(self.page(self.sections), changed_sections=[]))
+        embed_texts.assert_not_called()
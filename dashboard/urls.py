@@ -62,4 +62,8 @@ urlpatterns = [
     # Website Datafetcher
     path('website-datafetcher/', views.partial_website_datafetcher, name='partial_website_datafetcher'),
     path('website-datafetcher/crawl/', views.website_datafetcher_crawl, name='website_datafetcher_crawl'),
+    path('website-datafetcher/jobs/<int:job_id>/', views.website_datafetcher_job, name='website_datafetcher_job'),
+    path('website-datafetcher/jobs/<int:job_id>/progress/', views.website_datafetcher_progress, name='website_datafetcher_progress'),
+    path('website-datafetcher/jobs/<int:job_id>/cancel/', views.website_datafetcher_cancel, name='website_datafetcher_cancel'),
+    path('website-datafetcher/jobs/<int:job_id>/stream/', views.website_datafetcher_stream, name='website_datafetcher_stream'),
 ]
\ No newline at end of file
@@ -2,10 +2,15 @@
 from django.contrib.auth.decorators import login_required
 from django.contrib import messages
 from django.shortcuts import render, redirect, get_object_or_404
-from django.http import HttpResponse, HttpResponseBadRequest, JsonResponse
+from django.core.handlers.asgi import ASGIRequest
+from django.http import HttpResponse, HttpResponseBadRequest, JsonResponse, StreamingHttpResponse
 from django.utils import timezone
-from django.db.models import Count
-from datetime import timedelta
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db.models import Count, Q
+from datetime import datetime, timedelta, timezone as dt_timezone
+import asyncio
+import json
 import logging
 
 from accounts.models import Workspace
@@ -13,12 +18,13 @@ from billing.models import Plan
 from bots.models import Bot
 from knowledge.models import KnowledgeSource
 from chat.models import Conversation, Message
-from .website_crawler import crawl_site
+from . import crawl_jobs
+from .models import CrawlJob, CrawlPage
 
 logger = logging.getLogger(__name__)
 
 def _get_user_workspace(user):
-    return Workspace.objects.filter(owner=user).order_by('-created_at').first()
+    return Workspace.objects.filter(owner=user).with_active_plan().order_by('-created_at').first()
 
 def _require_operational(request):
     ws = _get_user_workspace(request.user)
@@ -61,21 +67,16 @@ def workspace_update(request):
 
     ws.save()
 
-    # Sync to all existing chunks
-    from knowledge.models import Chunk
-    chunks = Chunk.objects.filter(knowledge_source__bot__workspace=ws)
+    # Sync to all existing chunks (batched upsert through the shared Qdrant client)
+    from knowledge.models import Chunk, sync_chunks_to_qdrant
+    chunks = Chunk.objects.filter(knowledge_source__bot__workspace=ws).select_related('knowledge_source')
     
     updated_count = 0
     if ws.qdrant_url and ws.qdrant_api_key:
-        for chunk in chunks:
-            chunk.qdrant_url = ws.qdrant_url
-            chunk.qdrant_api_key = ws.qdrant_api_key
-            try:
-                # save() triggers push_to_qdrant() if embedding exists
-                chunk.save()
-                updated_count += 1
-            except Exception as e:
-                logger.error("Failed to sync chunk %s: %s", chunk.id, e)
+        try:
+            updated_count = sync_chunks_to_qdrant(chunks, ws.qdrant_url, ws.qdrant_api_key)
+        except Exception as e:
+            logger.error("Failed to sync chunks for workspace %s: %s", ws.id, e)
 
     if updated_count > 0:
         messages.success(request, f"Configuration updated and {updated_count} chunks synced to Qdrant.")
@@ -260,11 +261,11 @@ import json
 
 from accounts.models import Workspace
 from bots.models import Bot
-from knowledge.models import KnowledgeSource, Chunk
+from knowledge.models import KnowledgeSource, Chunk, sync_chunks_to_qdrant
 
 
 def _get_user_workspace(user):
-    return Workspace.objects.filter(owner=user).order_by('-created_at').first()
+    return Workspace.objects.filter(owner=user).with_active_plan().order_by('-created_at').first()
 
 
 def _require_operational(request):
@@ -299,6 +300,21 @@ def partial_knowledge(request):
     })
 
 
+def _move_chunks_to_qdrant(ks, qdrant_url, qdrant_api_key):
+    """
+    Point the source's chunks at the Qdrant instance from the form. The edit
+    form re-posts the stored URL/key on every save, so only chunks stored
+    against a different instance are re-sent; ks.save() has already embedded
+    and upserted the new and changed ones.
+    """
+    moved = [
+        ch for ch in ks.chunks.all()
+        if ch.qdrant_url != qdrant_url or ch.qdrant_api_key != qdrant_api_key
+    ]
+    if moved:
+        sync_chunks_to_qdrant(moved, qdrant_url, qdrant_api_key)
+
+
 @login_required
 def knowledge_add(request):
     if request.method != 'POST':
@@ -337,10 +353,7 @@ def knowledge_add(request):
         ks.save()
 
         if qdrant_url and qdrant_api_key:
-            for ch in ks.chunks.all():
-                ch.qdrant_url = qdrant_url
-                ch.qdrant_api_key = qdrant_api_key
-                ch.push_to_qdrant()
+            _move_chunks_to_qdrant(ks, qdrant_url, qdrant_api_key)
 
         messages.success(request, "Knowledge saved.")
     except Exception as e:
@@ -401,10 +414,7 @@ def knowledge_update(request, source_id):
         ks.save()
 
         if qdrant_url and qdrant_api_key:
-            for ch in ks.chunks.all():
-                ch.qdrant_url = qdrant_url
-                ch.qdrant_api_key = qdrant_api_key
-                ch.push_to_qdrant()
+            _move_chunks_to_qdrant(ks, qdrant_url, qdrant_api_key)
 
         messages.success(request, "Knowledge updated.")
     except Exception as e:
@@ -528,7 +538,7 @@ from accounts.models import Workspace
 from bots.models import Bot
 
 def _get_user_workspace(user):
-    return Workspace.objects.filter(owner=user).order_by('-created_at').first()
+    return Workspace.objects.filter(owner=user).with_active_plan().order_by('-created_at').first()
 
 def _require_operational(request):
     ws = _get_user_workspace(request.user)
@@ -738,18 +748,40 @@ def partial_enquiries(request):
 
 
 
+def _encode_conversation_cursor(conversation):
+    """Opaque live_chat_list cursor: (created_at, id) of the last row shown."""
+    return f"{int(conversation.created_at.timestamp() * 1_000_000)}_{conversation.id}"
+
+
+def _decode_conversation_cursor(cursor):
+    try:
+        micros, pk = cursor.split('_')
+        return datetime.fromtimestamp(int(micros) / 1_000_000, tz=dt_timezone.utc), int(pk)
+    except (AttributeError, ValueError, OverflowError, OSError):
+        return None
+
+
 @login_required
 def live_chat_list(request):
     """List all live chat conversations for the workspace"""
     ws, bounce = _require_operational(request)
     if bounce: return bounce
     
-    # Get all conversations for this workspace's bots
-    conversations = Conversation.objects.filter(bot__workspace=ws).order_by('-created_at')
+    # One page of this workspace's conversations, newest first; the summary
+    # columns mean rendering a row costs no further queries
+    conversations = Conversation.objects.filter(bot__workspace=ws).select_related('bot').order_by('-created_at', '-id')
+    after = _decode_conversation_cursor(request.GET.get('cursor'))
+    if after:
+        created_at, pk = after
+        conversations = conversations.filter(Q(created_at__lt=created_at) | Q(created_at=created_at, id__lt=pk))
+    page_size = getattr(settings, 'LIVE_CHAT_PAGE_SIZE', 50)
+    page = list(conversations[:page_size + 1])
+    next_cursor = _encode_conversation_cursor(page[page_size - 1]) if len(page) > page_size else None
     
     return render(request, 'dashboard/partials/live_list.html', {
         'workspace': ws,
-        'conversations': conversations
+        'conversations': page[:page_size],
+        'next_cursor': next_cursor
     })
 @login_required
 def live_chat_detail(request, conversation_id):
@@ -758,6 +790,7 @@ def live_chat_detail(request, conversation_id):
     if bounce: return bounce
     
     conversation = get_object_or_404(Conversation, id=conversation_id, bot__workspace=ws)
+    conversation.mark_read()
     messages_list = Message.objects.filter(conversation=conversation).order_by('timestamp')
     
     return render(request, 'dashboard/partials/live_detail.html', {
@@ -772,6 +805,7 @@ def live_chat_messages(request, conversation_id):
     if bounce: return bounce
     
     conversation = get_object_or_404(Conversation, id=conversation_id, bot__workspace=ws)
+    conversation.mark_read()
     messages_list = Message.objects.filter(conversation=conversation).order_by('timestamp')
     
     return render(request, 'dashboard/partials/live_messages.html', {
@@ -943,12 +977,21 @@ def live_chat_list(request):
     ws, bounce = _require_operational(request)
     if bounce: return bounce
     
-    # Get all conversations for this workspace's bots
-    conversations = Conversation.objects.filter(bot__workspace=ws).order_by('-created_at')
+    # One page of this workspace's conversations, newest first; the summary
+    # columns mean rendering a row costs no further queries
+    conversations = Conversation.objects.filter(bot__workspace=ws).select_related('bot').order_by('-created_at', '-id')
+    after = _decode_conversation_cursor(request.GET.get('cursor'))
+    if after:
+        created_at, pk = after
+        conversations = conversations.filter(Q(created_at__lt=created_at) | Q(created_at=created_at, id__lt=pk))
+    page_size = getattr(settings, 'LIVE_CHAT_PAGE_SIZE', 50)
+    page = list(conversations[:page_size + 1])
+    next_cursor = _encode_conversation_cursor(page[page_size - 1]) if len(page) > page_size else None
     
     return render(request, 'dashboard/partials/live_list.html', {
         'workspace': ws,
-        'conversations': conversations
+        'conversations': page[:page_size],
+        'next_cursor': next_cursor
     })
 @login_required
 def live_chat_detail(request, conversation_id):
@@ -957,6 +1000,7 @@ def live_chat_detail(request, conversation_id):
     if bounce: return bounce
     
     conversation = get_object_or_404(Conversation, id=conversation_id, bot__workspace=ws)
+    conversation.mark_read()
     messages_list = Message.objects.filter(conversation=conversation).order_by('timestamp')
     
     return render(request, 'dashboard/partials/live_detail.html', {
@@ -971,6 +1015,7 @@ def live_chat_messages(request, conversation_id):
     if bounce: return bounce
     
     conversation = get_object_or_404(Conversation, id=conversation_id, bot__workspace=ws)
+    conversation.mark_read()
     messages_list = Message.objects.filter(conversation=conversation).order_by('timestamp')
     
     return render(request, 'dashboard/partials/live_messages.html', {
@@ -1166,7 +1211,10 @@ def partial_website_datafetcher(request):
     if not ws.enable_website_datafetcher:
         messages.error(request, 'Website data fetcher is not enabled.')
         return redirect('dashboard:index')
-    return render(request, 'dashboard/partials/website_datafetcher.html', {'workspace': ws})
+    return render(request, 'dashboard/partials/website_datafetcher.html', {
+        'workspace': ws,
+        'bots': Bot.objects.filter(workspace=ws).order_by('name'),
+    })
 
 @login_required
 def website_datafetcher_crawl(request):
@@ -1184,19 +1232,146 @@ def website_datafetcher_crawl(request):
         if not url.startswith(('http://', 'https://')):
             return JsonResponse({'error': 'URL must start with http:// or https://'}, status=400)
         max_pages = min(max(1, max_pages), 100)
-        from .website_crawler import crawl_site
-        results = crawl_site(url, max_pages=max_pages)
+        bot = None
+        if request.POST.get('bot_id'):
+            bot = get_object_or_404(Bot, id=request.POST['bot_id'], workspace=ws)
+        # Crawl in the background; the progress partial streams (or polls) pages as they arrive
+        job = CrawlJob.objects.create(workspace=ws, bot=bot, start_url=url, max_pages=max_pages)
+        crawl_jobs.start_job(job)
         
-        return render(request, 'dashboard/partials/website_crawl_results.html', {
-            'success': True,
-            'pages': results, 
-            'total': len(results)
-        })
+        return _render_crawl_progress(request, job)
     except Exception as e:
         import traceback
         traceback.print_exc()
         return JsonResponse({'error': str(e)}, status=500)
 
+@login_required
+def website_datafetcher_job(request, job_id):
+    """Pages a crawl job has stored so far (all of them once it has finished)."""
+    ws, bounce = _require_operational(request)
+    if bounce: return JsonResponse({'error': 'Unauthorized'}, status=403)
+    job = get_object_or_404(CrawlJob, id=job_id, workspace=ws)
+    pages = [p.as_dict() for p in job.pages.all()]
+    
+    return render(request, 'dashboard/partials/website_crawl_results.html', {
+        'success': True,
+        'job': job,
+        'pages': pages,
+        'total': len(pages)
+    })
+
+def _can_stream_crawl(request):
+    """
+    The SSE stream holds its request open for the whole crawl, which only
+    works on the ASGI server (under WSGI Django buffers the stream until it
+    ends) and needs the crawl's events to reach this process.
+    """
+    if not isinstance(request, ASGIRequest):
+        return False
+    return (getattr(settings, 'CHANNEL_LAYER_BACKEND', 'memory') != 'memory'
+            or getattr(settings, 'CRAWL_JOB_BACKEND', 'thread') == 'thread')
+
+def _render_crawl_progress(request, job):
+    stream = _can_stream_crawl(request)
+    context = {'job': job, 'stream': stream}
+    if not stream:
+        context['recent_pages'] = job.pages.order_by('-id')[:20]
+        context['percent'] = min(100, 100 * job.pages_done // max(job.max_pages, 1))
+    return render(request, 'dashboard/partials/website_crawl_progress.html', context)
+
+@login_required
+def website_datafetcher_progress(request, job_id):
+    """HTMX poll of a crawl job for WSGI deployments: progress, then the results once it has finished."""
+    ws, bounce = _require_operational(request)
+    if bounce: return JsonResponse({'error': 'Unauthorized'}, status=403)
+    job = get_object_or_404(CrawlJob, id=job_id, workspace=ws)
+    if job.is_finished:
+        return website_datafetcher_job(request, job_id)
+    return _render_crawl_progress(request, job)
+
+@login_required
+def website_datafetcher_cancel(request, job_id):
+    if request.method != 'POST':
+        return JsonResponse({'error': 'POST required'}, status=400)
+    ws, bounce = _require_operational(request)
+    if bounce: return JsonResponse({'error': 'Unauthorized'}, status=403)
+    job = get_object_or_404(CrawlJob, id=job_id, workspace=ws)
+    crawl_jobs.cancel_job(job)
+    return JsonResponse({'success': True})
+
+def _crawl_job_for(user, job_id):
+    ws = _get_user_workspace(user)
+    if not ws or not ws.approved or not ws.is_operational:
+        return None
+    return CrawlJob.objects.filter(id=job_id, workspace=ws).first()
+
+def _crawl_job_backlog(job_id, last_id):
+    job = CrawlJob.objects.get(id=job_id)
+    pages = [
+        dict(crawl_jobs.page_event(p), pages_done=job.pages_done)
+        for p in CrawlPage.objects.filter(job_id=job_id, id__gt=last_id)
+    ]
+    return job, pages
+
+async def website_datafetcher_stream(request, job_id):
+    """
+    Server-Sent Events for a crawl job: a `page` event per stored page
+    (backlog after Last-Event-ID first), then a final `status` event once the
+    job is done, cancelled or failed. Like embed live/stream it needs the
+    ASGI server; elsewhere the progress partial polls
+    website_datafetcher_progress instead (see _can_stream_crawl).
+    """
+    user = await request.auser()
+    if not user.is_authenticated:
+        return JsonResponse({'error': 'Unauthorized'}, status=403)
+    job = await sync_to_async(_crawl_job_for)(user, job_id)
+    if job is None:
+        return JsonResponse({'error': 'Not found'}, status=404)
+    if not _can_stream_crawl(request):
+        return HttpResponse(status=204)  # EventSource stops reconnecting; use website_datafetcher_progress
+    try:
+        last_id = int(request.headers.get('Last-Event-ID') or 0)
+    except ValueError:
+        last_id = 0
+
+    keepalive = getattr(settings, 'LIVE_STREAM_KEEPALIVE', 15)
+    max_age = getattr(settings, 'LIVE_STREAM_MAX_AGE', 300)
+
+    def sse(name, data):
+        event_id = f"id: {data['id']}\n" if name == 'page' else ''
+        return f"{event_id}event: {name}\ndata: {json.dumps(data)}\n\n"
+
+    async def events():
+        newest = last_id
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + max_age
+        async with crawl_jobs.JobListener(job.id) as listener:
+            yield "retry: 2000\n\n"
+            # Subscribed first, so nothing stored after this read is missed
+            current, backlog = await sync_to_async(_crawl_job_backlog)(job.id, newest)
+            for page in backlog:
+                newest = page['id']
+                yield sse('page', page)
+            if current.is_finished:
+                yield sse('status', crawl_jobs.status_event(current))
+                return
+            while loop.time() < deadline:
+                event = await listener.receive(min(keepalive, deadline - loop.time()))
+                if event is None:
+                    yield ": keep-alive\n\n"
+                elif event['type'] == 'crawl.page' and event['id'] > newest:
+                    newest = event['id']
+                    yield sse('page', event)
+                elif event['type'] == 'crawl.status':
+                    yield sse('status', event)
+                    if event['status'] in CrawlJob.FINISHED:
+                        return
+
+    response = StreamingHttpResponse(events(), content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'
+    return response
+
 @login_required
 def partial_token_usage(request):
     """Token usage visualization page"""
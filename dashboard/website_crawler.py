@@ -2,15 +2,53 @@
 """
 Website crawler service - extracts body content sectioned by headings.
 Converted from Streamlit script for Django backend use.
+
+Crawler fetches pages concurrently on one pooled httpx.AsyncClient:
+  - at most CRAWLER_CONCURRENCY pages in flight per crawl, and at most
+    CRAWLER_HOST_CONCURRENCY of them against any one host
+  - request starts per host spaced to CRAWLER_RATE per second, or wider when
+    that host's robots.txt asks for a Crawl-delay / Request-rate
+  - a priority frontier (a heap, plus a seen-set): pages listed in the
+    site's sitemaps come first, by <priority>, URL depth and <lastmod>,
+    then pages only found through links, shallowest first, so max_pages
+    goes to content rather than the nav/footer pages every page links to
+HTML parsing runs in a worker thread so slow pages don't stall the fetches,
+in one streaming pass over lxml (or html.parser) events - see html_extract.
+
+With a CrawlCache, re-crawls are conditional: each URL is requested with the
+ETag / Last-Modified it had last time, and a 304 or byte-identical body
+reuses the stored parse (links included) without parsing again. Pages come
+back flagged "unchanged", or with "changed_sections" listing the sections
+that differ from the previous crawl.
+Sitemaps are read from robots.txt's Sitemap: lines, or /sitemap.xml when
+it has none; sitemap indexes and gzipped sitemaps are followed, up to
+CRAWLER_SITEMAP_MAX_FILES files (CRAWLER_SITEMAPS = False turns this off).
+crawl_site() is the sync entry point; results come back in the order the
+URLs were queued whatever order the fetches finished in.
 """
+from collections import deque
+from datetime import timezone as dt_timezone
+from io import BytesIO
 from urllib.parse import urljoin, urlparse
-import time
+from xml.etree import ElementTree
+import asyncio
+import hashlib
+import heapq
 import re
 import logging
+import zlib
+import httpx
 import requests
+from asgiref.sync import async_to_sync
 from bs4 import BeautifulSoup, Tag
+from django.conf import settings
+from django.utils.dateparse import parse_datetime
 import urllib.robotparser as robotparser
 
+from .html_extract import (
+    CONTENT_TAGS, JUNK_ATTRS, JUNK_TAGS, NESTING_TAGS, build_sections, extract_page, page_links,
+)
+
 logger = logging.getLogger(__name__)
 
 HEADERS = {"User-Agent": "RedbotCrawler/1.0"}
@@ -77,21 +115,11 @@ def extract_links(html: str, base_url: str):
 
 def _clean_tag(tag: Tag):
     """Remove boilerplate and junk tags from the tree."""
-    # Tags to remove completely (including content)
-    junk_tags = [
-        "script", "style", "noscript", "iframe", "svg", "canvas",
-        "button", "input", "select", "textarea", 
-        "nav", "footer", "header", "aside", "form",
-        "menu", "dialog", "map"
-    ]
-    for bad in tag.find_all(junk_tags):
+    for bad in tag.find_all(list(JUNK_TAGS)):
         bad.decompose()
-    
-    # Remove elements by class/id heuristics (simple spam filter)
-    junk_classes = re.compile(r"(sidebar|menu|footer|header|nav|popup|cookie|ad-|advert)", re.I)
-    for bad in tag.find_all(attrs={"class": junk_classes}):
+    for bad in tag.find_all(attrs={"class": JUNK_ATTRS}):
         bad.decompose()
-    for bad in tag.find_all(attrs={"id": junk_classes}):
+    for bad in tag.find_all(attrs={"id": JUNK_ATTRS}):
         bad.decompose()
 
     return tag
@@ -116,127 +144,446 @@ def _elem_to_text(elem: Tag) -> str:
 
 
 
-def crawl_site(start_url: str, max_pages: int = 50):
+def parse_page(html: str, url: str):
     """
-    Crawl website starting from start_url.
-    Returns: [{"url": ..., "title": ..., "path": ..., "sections": [...]}, ...]
+    Parse one fetched page.
+    Returns ({"url", "title", "path", "sections"}, links found on the page).
+    CRAWLER_HTML_PARSER picks the parser (see dashboard.html_extract).
+    """
+    backend = getattr(settings, 'CRAWLER_HTML_PARSER', 'auto')
+    if backend == 'soup':
+        return parse_page_soup(html, url)
+    return extract_page(html, url, parser=backend)
+
+
+def parse_page_soup(html: str, url: str):
+    """
+    parse_page on a BeautifulSoup tree: the reference the single-pass
+    extract_page is tested against, and CRAWLER_HTML_PARSER = 'soup'.
     """
-    parsed = urlparse(start_url)
-    base_netloc = parsed.netloc
-    base_root = f"{parsed.scheme}://{parsed.netloc}"
-
-    rp = allowed_by_robots(start_url)
-    to_visit = [start_url]
-    seen = set()
-    results = []
-
-    while to_visit and len(results) < max_pages:
-        url = to_visit.pop(0)
-        if url in seen:
+    soup = BeautifulSoup(html, "html.parser")
+
+    # Extract links first (from raw soup)
+    links = page_links((a.get("href") for a in soup.find_all("a", href=True)), url)
+
+    # Extract content
+    body = soup.body or soup
+    _clean_tag(body)
+
+    blocks = []
+    for child in body.find_all(list(CONTENT_TAGS)):
+        # Check parents for nesting
+        if any(parent.name in NESTING_TAGS for parent in child.parents):
             continue
-        seen.add(url)
+        blocks.append((child.name.lower(), _elem_to_text(child)))
+    sections = build_sections(blocks)
+
+    if not sections:
+        text = body.get_text(separator="\n", strip=True)
+        sections = [{"heading": "Content", "content": text}]
+
+    # Title (title tag is in head)
+    title = ""
+    if soup.title:
+        title = soup.title.get_text(strip=True)
+    if not title and soup.body:
+        h = soup.body.find(re.compile(r"^h[1-2]$", re.I))
+        if h: title = h.get_text(strip=True)
+    if not title:
+        title = urlparse(url).netloc
+
+    page = {
+        "url": url,
+        "title": title,
+        "path": urlparse(url).path or "/",
+        "sections": sections
+    }
+    return page, links
+
+
+class HostLimiter:
+    """
+    Politeness for one host: at most `concurrency` requests in flight and
+    request starts at least `interval` seconds apart.
+    """
+
+    def __init__(self, concurrency: int, interval: float):
+        self.slots = asyncio.Semaphore(concurrency)
+        self.interval = interval
+        self.next_start = 0.0
+
+    async def __aenter__(self):
+        await self.slots.acquire()
+        loop = asyncio.get_running_loop()
+        now = loop.time()
+        start = max(now, self.next_start)
+        self.next_start = start + self.interval  # reserve our start before sleeping
+        if start > now:
+            await asyncio.sleep(start - now)
+
+    async def __aexit__(self, *exc):
+        self.slots.release()
+
+
+SITEMAP_MAX_BYTES = 50 * 1024 * 1024  # the sitemap protocol's limit per file, uncompressed
+
+
+def url_depth(url: str) -> int:
+    return len([part for part in urlparse(url).path.split('/') if part])
+
+
+def _sitemap_priority(value):
+    try:
+        return min(max(float(value), 0.0), 1.0)
+    except (TypeError, ValueError):
+        return 0.5  # the protocol's default
+
+
+def _sitemap_lastmod(value):
+    """<lastmod> (W3C date or datetime) as a timestamp, 0 when missing or invalid."""
+    try:
+        parsed = parse_datetime(value or '')
+    except ValueError:
+        parsed = None
+    if parsed is None:
+        return 0.0
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=dt_timezone.utc)
+    return parsed.timestamp()
+
+
+def parse_sitemap(data: bytes):
+    """
+    One sitemap file, plain or gzipped XML.
+    Returns ([(loc, priority, lastmod timestamp)] of a <urlset>,
+             [loc] of the sitemaps in a <sitemapindex>).
+    """
+    if data[:2] == b'\x1f\x8b':
+        data = zlib.decompressobj(16 + zlib.MAX_WBITS).decompress(data, SITEMAP_MAX_BYTES)
+    urls, sitemaps = [], []
+    fields = {}
+    for _, elem in ElementTree.iterparse(BytesIO(data)):
+        name = elem.tag.rsplit('}', 1)[-1]
+        if name in ('loc', 'priority', 'lastmod'):
+            # The entry's own <loc> comes first; extensions (image:loc...) don't overwrite it
+            fields.setdefault(name, (elem.text or '').strip())
+        elif name in ('url', 'sitemap'):
+            loc = fields.get('loc')
+            if loc and name == 'url':
+                urls.append((loc, _sitemap_priority(fields.get('priority')), _sitemap_lastmod(fields.get('lastmod'))))
+            elif loc:
+                sitemaps.append(loc)
+            fields = {}
+            elem.clear()
+    return urls, sitemaps
+
+
+def section_hash(section):
+    return hashlib.sha256(f"{section['heading']}\n{section['content']}".encode('utf-8')).hexdigest()
+
+
+class CrawlCache:
+    """
+    Per-URL validators and last parse for conditional re-crawls, kept in
+    memory; subclasses persist it (dashboard.crawl_jobs.WorkspaceCrawlCache).
+    Entries: {"etag", "last_modified", "content_hash", "page", "links"}.
+    """
+
+    def __init__(self):
+        self.entries = {}
+
+    async def get(self, url):
+        return self.entries.get(url)
 
-        # Check robots.txt
-        if rp:
+    async def put(self, url, entry):
+        self.entries[url] = entry
+
+
+class Crawler:
+    """
+    One crawl of a site from start_url, same domain only (www. ignored).
+    concurrency / host_concurrency / rate default to the CRAWLER_* settings.
+
+    Subclasses can override on_page() to store pages as they arrive instead
+    of collecting them, call stop() to wind the crawl down, and pass a
+    state() snapshot back in as `state` to resume where it left off.
+    sitemaps=False skips seeding the frontier from the site's sitemaps.
+    """
+
+    def __init__(self, start_url: str, max_pages: int = 50, concurrency=None, host_concurrency=None, rate=None,
+                 state=None, cache=None, sitemaps=None):
+        self.start_url = start_url
+        self.cache = cache
+        self.max_pages = max_pages
+        self.base_netloc = urlparse(start_url).netloc
+        self.concurrency = concurrency or getattr(settings, 'CRAWLER_CONCURRENCY', 8)
+        self.host_concurrency = host_concurrency or getattr(settings, 'CRAWLER_HOST_CONCURRENCY', 4)
+        self.rate = rate or getattr(settings, 'CRAWLER_RATE', 5.0)
+        self.sitemaps = getattr(settings, 'CRAWLER_SITEMAPS', True) if sitemaps is None else sitemaps
+
+        self.frontier = []  # heap of rank() + (discovery order, url)
+        self.seen = set()  # every url ever queued
+        self.results = []  # (discovery order, page)
+        self.hosts = {}  # netloc -> HostLimiter
+        self.robots = {}  # netloc -> Task resolving to RobotFileParser or None
+        self.active = {}  # discovery order -> frontier entry, for pages being fetched
+        self.pages_done = 0
+        self.stopped = False
+        self.client = None
+        self._queued = 0
+        self._cond = None
+        if state:
+            self.frontier = [self._restore(item) for item in state['frontier']]
+            heapq.heapify(self.frontier)
+            self.seen.update(state['seen'])
+            self._queued = state['queued']
+            self.pages_done = state['pages_done']
+
+    @property
+    def in_flight(self):
+        return len(self.active)
+
+    def state(self):
+        """JSON-able snapshot to resume from; pages still in flight go back on the frontier."""
+        return {
+            'frontier': [list(item) for item in sorted(self.active.values())] + [list(item) for item in self.frontier],
+            'seen': sorted(self.seen),
+            'queued': self._queued,
+            'pages_done': self.pages_done,
+        }
+
+    async def stop(self):
+        """Let pages in flight finish, fetch nothing new."""
+        self.stopped = True
+        async with self._cond:
+            self._cond.notify_all()
+
+    async def on_page(self, order, page):
+        self.results.append((order, page))
+
+    @staticmethod
+    def rank(url, priority=None, lastmod=0.0):
+        """
+        Frontier sort key, smallest first: sitemap URLs (priority given) before
+        link-only ones, then higher <priority>, shallower path, newer <lastmod>.
+        """
+        listed = priority is not None
+        return (0 if listed else 1, -priority if listed else 0.0, url_depth(url), -lastmod)
+
+    def _restore(self, item):
+        item = tuple(item)
+        if len(item) == 2:  # checkpoint from before the priority frontier: (order, url)
+            return self.rank(item[1]) + item
+        return item
+
+    def enqueue(self, url: str, priority=None, lastmod=0.0):
+        norm = urlparse(url)._replace(fragment="").geturl()
+        if norm in self.seen:
+            return
+        self.seen.add(norm)
+        heapq.heappush(self.frontier, self.rank(norm, priority, lastmod) + (self._queued, norm))
+        self._queued += 1
+
+    async def run(self):
+        """Crawl and return the pages in discovery order."""
+        self._cond = asyncio.Condition()
+        limits = httpx.Limits(max_connections=self.concurrency, max_keepalive_connections=self.concurrency)
+        async with httpx.AsyncClient(
+            headers=HEADERS,
+            timeout=getattr(settings, 'CRAWLER_TIMEOUT', 8),
+            limits=limits,
+            follow_redirects=True,
+        ) as self.client:
+            if not self._queued:
+                self.enqueue(self.start_url, priority=1.0)
+                if self.sitemaps:
+                    await self._seed_from_sitemaps()
+            await asyncio.gather(*(self._worker() for _ in range(self.concurrency)))
+        self.results.sort(key=lambda r: r[0])
+        return [page for _, page in self.results]
+
+    def _budget_left(self):
+        # Count pages in flight too, so we never fetch more than max_pages
+        return not self.stopped and self.pages_done + self.in_flight < self.max_pages
+
+    async def _worker(self):
+        while True:
+            async with self._cond:
+                await self._cond.wait_for(
+                    lambda: (self.frontier and self._budget_left()) or not self.in_flight or self.stopped
+                )
+                if not (self.frontier and self._budget_left()):
+                    return  # stopped, or nothing queued and nothing in flight that could queue more
+                item = heapq.heappop(self.frontier)
+                order, url = item[-2:]
+                self.active[order] = item
             try:
-                allowed = rp.can_fetch(HEADERS["User-Agent"], url)
+                await self._visit(order, url)
+            except Exception as e:
+                logger.error("Error crawling %s: %s", url, e)
+            finally:
+                async with self._cond:
+                    self.active.pop(order, None)
+                    self._cond.notify_all()
+
+    async def _visit(self, order, url):
+        host = urlparse(url).netloc
+        rp = await self._robots_for(host, url)
+        if rp is not None:
+            try:
+                if not rp.can_fetch(HEADERS["User-Agent"], url):
+                    return
             except Exception:
-                allowed = True
+                pass
+
+        cached = await self.cache.get(url) if self.cache is not None else None
+        r = await self.fetch(url, cached)
+        if r is None:
+            return
+
+        if r.status_code == 304:
+            page, links, content_hash = cached['page'], set(cached['links']), cached['content_hash']
         else:
-            allowed = True
+            content_hash = hashlib.sha256(r.content).hexdigest()
+            if cached and cached['content_hash'] == content_hash:
+                page, links = cached['page'], set(cached['links'])
+            else:
+                page, links = await asyncio.to_thread(parse_page, r.text, url)
 
-        if not allowed:
-            continue
+        if self.cache is not None:
+            # A 304 may leave out validators that still apply
+            previous = cached if r.status_code == 304 else {}
+            await self.cache.put(url, {
+                "etag": r.headers.get("ETag") or previous.get("etag", ""),
+                "last_modified": r.headers.get("Last-Modified") or previous.get("last_modified", ""),
+                "content_hash": content_hash,
+                "page": page,
+                "links": sorted(links),
+            })
+            page = dict(page, **self._changes(cached, page))
 
-        html = fetch_url(url)
-        if not html:
-            continue
+        for link in links:
+            if is_same_domain(self.base_netloc, link):
+                self.enqueue(link)
+        # Done before on_page, so a state() taken there has this page's links and not the page itself
+        self.active.pop(order, None)
+        self.pages_done += 1
+        await self.on_page(order, page)
+
+    async def _seed_from_sitemaps(self):
+        """
+        Queue the site's best sitemap URLs before the first page is fetched.
+        Only max_pages * 2 of them, so a 50,000 URL sitemap doesn't end up in
+        every state() checkpoint; the rest can still be found through links.
+        """
+        parsed = urlparse(self.start_url)
+        rp = await self._robots_for(parsed.netloc, self.start_url)
+        pending = deque((rp.site_maps() if rp is not None else None) or [f"{parsed.scheme}://{parsed.netloc}/sitemap.xml"])
+        max_files = getattr(settings, 'CRAWLER_SITEMAP_MAX_FILES', 10)
+        fetched, entries = set(), []
+        while pending and len(fetched) < max_files:
+            sitemap_url = pending.popleft()
+            if sitemap_url in fetched:
+                continue
+            fetched.add(sitemap_url)
+            if rp is not None and not rp.can_fetch(HEADERS["User-Agent"], sitemap_url):
+                continue
+            r = await self.fetch(sitemap_url)
+            if r is None:
+                continue
+            try:
+                urls, sitemaps = await asyncio.to_thread(parse_sitemap, r.content)
+            except (ElementTree.ParseError, zlib.error) as e:
+                logger.info("Skipping sitemap %s: %s", sitemap_url, e)
+                continue
+            for loc, priority, lastmod in urls:
+                loc = urljoin(sitemap_url, loc)
+                if loc.startswith(("http://", "https://")) and is_same_domain(self.base_netloc, loc):
+                    entries.append((loc, priority, lastmod))
+            pending.extend(urljoin(sitemap_url, loc) for loc in sitemaps)
+        best = heapq.nsmallest(self.max_pages * 2, entries, key=lambda entry: self.rank(*entry))
+        for loc, priority, lastmod in best:
+            self.enqueue(loc, priority, lastmod)
+        if entries:
+            logger.info("Queued %d of %d sitemap URLs from %d sitemaps for %s",
+                        len(best), len(entries), len(fetched), self.start_url)
+
+    async def fetch(self, url: str, cached=None):
+        """
+        The response (conditional if cached has validators), or None on any
+        error / status other than 2xx or 304.
+        """
+        headers = {}
+        if cached and cached.get("page"):
+            if cached.get("etag"):
+                headers["If-None-Match"] = cached["etag"]
+            if cached.get("last_modified"):
+                headers["If-Modified-Since"] = cached["last_modified"]
+        async with self._limiter(urlparse(url).netloc):
+            try:
+                r = await self.client.get(url, headers=headers)
+                if r.status_code == 304 and headers:
+                    return r
+                r.raise_for_status()
+                return r
+            except Exception:
+                return None
 
+    @staticmethod
+    def _changes(cached, page):
+        """unchanged / changed_sections (indexes into page["sections"]) against the last crawl."""
+        if not cached or not cached.get("page"):
+            return {"unchanged": False, "changed_sections": list(range(len(page["sections"])))}
+        before = {section_hash(s) for s in cached["page"]["sections"]}
+        changed = [i for i, s in enumerate(page["sections"]) if section_hash(s) not in before]
+        unchanged = not changed and len(page["sections"]) == len(cached["page"]["sections"])
+        return {"unchanged": unchanged, "changed_sections": changed}
+
+    def _limiter(self, host):
+        limiter = self.hosts.get(host)
+        if limiter is None:
+            limiter = self.hosts[host] = HostLimiter(self.host_concurrency, 1.0 / self.rate)
+        return limiter
+
+    def _robots_for(self, host, url):
+        # One robots.txt fetch per host, shared by every worker waiting on it
+        task = self.robots.get(host)
+        if task is None:
+            task = self.robots[host] = asyncio.ensure_future(self._load_robots(host, urlparse(url).scheme))
+        return task
+
+    async def _load_robots(self, host, scheme):
+        rp = robotparser.RobotFileParser(f"{scheme}://{host}/robots.txt")
         try:
-            # Parse once
-            soup = BeautifulSoup(html, "html.parser")
-            
-            # Extract links first (from raw soup)
-            links = set()
-            for a in soup.find_all("a", href=True):
-                href = a.get("href").split("#")[0].strip()
-                if not href: continue
-                if href.startswith(("mailto:", "tel:", "javascript:")): continue
-                links.add(urljoin(base_root, href))
-
-            # Extract content
-            body = soup.body or soup
-            _clean_tag(body)
-            
-            sections = []
-            current_heading = "Intro"
-            current_content = []
-            
-            interesting_tags = ['h1', 'h2', 'h3', 'h4', 'p', 'ul', 'ol', 'pre', 'table', 'blockquote']
-            
-            for child in body.find_all(interesting_tags):
-                # Check parents for nesting
-                has_parent_block = False
-                for parent in child.parents:
-                    if parent.name in ['ul', 'ol', 'table', 'blockquote', 'pre']:
-                        has_parent_block = True
-                        break
-                
-                if has_parent_block:
-                    continue
-                    
-                tag_name = child.name.lower()
-                text = _elem_to_text(child)
-                if not text: 
-                    continue
-                    
-                if tag_name in ('h1', 'h2', 'h3', 'h4'):
-                    if current_content:
-                        sections.append({"heading": current_heading, "content": "\n\n".join(current_content)})
-                        current_content = []
-                    current_heading = text
-                else:
-                    current_content.append(text)
-                    
-            if current_content:
-                sections.append({"heading": current_heading, "content": "\n\n".join(current_content)})
-                
-            if not sections:
-                text = body.get_text(separator="\n", strip=True)
-                sections = [{"heading": "Content", "content": text}]
-
-            # Title
-            title = ""
-            # Re-find title from body (we might have cleaned H1s? No, we kept them)
-            # Actually, title tag is in head
-            if soup.title:
-                title = soup.title.get_text(strip=True)
-            if not title and soup.body:
-                 h = soup.body.find(re.compile(r"^h[1-2]$", re.I))
-                 if h: title = h.get_text(strip=True)
-            if not title:
-                title = urlparse(url).netloc
-
-            results.append({
-                "url": url,
-                "title": title,
-                "path": urlparse(url).path or "/",
-                "sections": sections
-            })
+            async with self._limiter(host):
+                r = await self.client.get(rp.url)
+        except Exception:
+            return None
+        if r.status_code in (401, 403):
+            rp.disallow_all = True
+        elif r.status_code >= 400:
+            rp.allow_all = True
+        else:
+            rp.parse(r.text.splitlines())
+            # Crawl-delay / Request-rate only ever slow us down
+            ua = HEADERS["User-Agent"]
+            interval = rp.crawl_delay(ua) or 0
+            request_rate = rp.request_rate(ua)
+            if request_rate and request_rate.requests:
+                interval = max(interval, request_rate.seconds / request_rate.requests)
+            limiter = self._limiter(host)
+            limiter.interval = max(limiter.interval, float(interval))
+        return rp
 
-            # Queue links
-            for link in links:
-                if not is_same_domain(base_netloc, link):
-                    continue
-                parsed_l = urlparse(link)
-                norm = parsed_l._replace(fragment="").geturl()
-                if norm not in seen and norm not in to_visit:
-                    to_visit.append(norm)
-
-        except Exception as e:
-            logger.error("Error crawling %s: %s", url, e)
-            continue
 
-        time.sleep(0.2)  # Be polite
+async def acrawl_site(start_url: str, max_pages: int = 50, **options):
+    """Async crawl_site; options: concurrency, host_concurrency, rate, cache, sitemaps."""
+    return await Crawler(start_url, max_pages, **options).run()
+
 
-    return results
+def crawl_site(start_url: str, max_pages: int = 50):
+    """
+    Crawl website starting from start_url.
+    Returns: [{"url": ..., "title": ..., "path": ..., "sections": [...]}, ...]
+    """
+    return async_to_sync(acrawl_site)(start_url, max_pages)
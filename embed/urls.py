@@ -8,11 +8,13 @@ app_name = 'embed'
 
 urlpatterns = [
     path('widget/<str:public_key>/', views.widget_iframe, name='widget'),
+    # Before live/<public_key>/, which would otherwise swallow them
+    path('live/send/', views.live_chat_send, name='live_chat_send'),
+    path('live/poll/', views.live_chat_poll, name='live_chat_poll'),
+    path('live/stream/', views.live_chat_stream, name='live_chat_stream'),
     path('live/<str:public_key>/', views.live_widget_iframe, name='live_widget'),
     path('config/<str:public_key>/', views.bot_config_api, name='bot_config_api'),
     path('save-enquiry/', views.save_enquiry, name='save_enquiry'),
-    path('live/send/', views.live_chat_send, name='live_chat_send'),
-    path('live/poll/', views.live_chat_poll, name='live_chat_poll'),
     path('bot.js', lambda request: serve(request, 'embed/bot.js', document_root=settings.STATIC_ROOT or 'static'), name='bot_js'),
     path('live.js', lambda request: serve(request, 'embed/live.js', document_root=settings.STATIC_ROOT or 'static'), name='live_js'),
     path('test/<str:public_key>/', views.test_embed_page, name='test_page_with_bot'),
@@ -1,21 +1,24 @@
 # embed/views.py (update: include jwt_exp in cfg and pre-render welcome_text)
 from django.conf import settings
-from django.http import HttpResponse, JsonResponse
+from django.core.handlers.asgi import ASGIRequest
+from django.http import HttpResponse, JsonResponse, StreamingHttpResponse
 from django.shortcuts import render
 from django.utils import timezone
 from django.views.decorators.clickjacking import xframe_options_exempt
 from django.views.decorators.csrf import csrf_exempt
 
 import jwt
+import asyncio
 import logging
 from datetime import timedelta, datetime, timezone as dt_timezone
 from urllib.parse import urlparse
 import json
 
 from bots.models import Bot
+from bots.runtime import aget_profile, get_profile
 from chat.models import Conversation, Message
-from chat.views import get_relevant_data
-from chat.services import get_ai_response
+from chat.live_events import ConversationListener, messages_after
+from chat.live_replies import schedule_reply
 
 logger = logging.getLogger(__name__)
 
@@ -34,7 +37,7 @@ def _is_local_host(host: str) -> bool:
 @xframe_options_exempt
 def widget_iframe(request, public_key):
     try:
-        bot = Bot.objects.get(public_key=public_key)
+        bot = get_profile(public_key=public_key)
         ws = bot.workspace
 
         ap = ws.active_plan
@@ -169,14 +172,7 @@ def widget_iframe(request, public_key):
         }
 
         # Bot footer: use workspace setting and first footer for workspace if available
-        footer = None
-        try:
-            if getattr(ws, 'bot_footer', False):
-                footer = getattr(ws, 'bot_footers', None)
-                if footer is not None:
-                    footer = footer.first()
-        except Exception:
-            footer = None
+        footer = ws.footer if ws.bot_footer else None
 
         # Enquiry form: check if workspace has enabled it
         enquiry_form_enabled = getattr(ws, 'enable_enquiry_form', False)
@@ -216,7 +212,7 @@ def live_widget_iframe(request, public_key):
     Similar to widget_iframe but uses embed/live.html and might have different logic.
     """
     try:
-        bot = Bot.objects.get(public_key=public_key)
+        bot = get_profile(public_key=public_key)
         ws = bot.workspace
         
         # ADD THIS SECTION - Bot type routing logic
@@ -337,19 +333,13 @@ def live_widget_iframe(request, public_key):
             'font_size': bot.ui_font_size or 14,
             'available_bots': json.dumps(ws.get_available_bot_modes()),
 'current_bot_type': bot_type_to_serve,
+            'typing_interval': int(getattr(settings, 'TYPING_THROTTLE', 2.0) * 1000),
             'animation_speed': bot.ui_animation_speed or 'normal',
             'widget_position': bot.ui_widget_position or 'bottom-right',
         }
 
         # Bot footer
-        footer = None
-        try:
-            if getattr(ws, 'bot_footer', False):
-                footer = getattr(ws, 'bot_footers', None)
-                if footer is not None:
-                    footer = footer.first()
-        except Exception:
-            footer = None
+        footer = ws.footer if ws.bot_footer else None
 
         enquiry_form_enabled = getattr(ws, 'enable_enquiry_form', False)
 
@@ -381,130 +371,185 @@ def live_widget_iframe(request, public_key):
 
 
 @csrf_exempt
-def live_chat_send(request):
+async def live_chat_send(request):
     """
     API to send a message in live chat.
     Expects JSON: { jwt, session_id, text }
+
+    Only the visitor's message is saved here; an AI reply (AI mode, plan with
+    AI) is generated in the background by chat.live_replies and arrives via
+    the usual broadcast / poll / stream path. reply_pending says one is coming.
     """
     if request.method != 'POST':
         return JsonResponse({'error': 'Method not allowed'}, status=405)
 
     try:
         data = json.loads(request.body)
-        token = data.get('jwt')
         session_id = data.get('session_id')
         text = data.get('text', '').strip()
 
-        if not token:
-            return JsonResponse({'error': 'Missing JWT'}, status=401)
-        
-        # Decode JWT
-        try:
-            payload = jwt.decode(token, settings.SECRET_KEY, algorithms=['HS256'])
-            bot_id = payload.get('bot_id')
-        except jwt.ExpiredSignatureError:
-            return JsonResponse({'error': 'Token expired'}, status=401)
-        except jwt.InvalidTokenError:
-            return JsonResponse({'error': 'Invalid token'}, status=401)
-
-        bot = Bot.objects.get(id=bot_id)
-        ws = bot.workspace
-        ap = ws.active_plan
+        payload, error = _decode_live_token(data.get('jwt'))
+        if error:
+            return error
+
+        bot = await aget_profile(bot_id=payload.get('bot_id'))
+        ap = bot.workspace.active_plan
 
         # Find or create conversation
-        conversation, created = Conversation.objects.get_or_create(
-            bot=bot,
+        conversation, created = await Conversation.objects.aget_or_create(
+            bot_id=bot.id,
             session_id=session_id,
             defaults={'effective_mode': 'AI'} # Default to AI, can be switched
         )
 
         # Save User Message
-        Message.objects.create(
+        await Message.objects.acreate(
             conversation=conversation,
             sender='USER',
             text=text
         )
 
         # Trigger AI response if in AI mode and plan includes AI
+        reply_pending = False
         if conversation.effective_mode == 'AI' and ap and ap.includes_ai:
-            try:
-                retrieved_data, source_ids = get_relevant_data(bot, text, top_k=1)
-                answer = get_ai_response(
-                    user_question=text,
-                    retrieved_data=retrieved_data,
-                    api_key=bot.ai_api_key,
-                    model=bot.ai_model,
-                    bot_id=bot.id,
-                )
-                
-                # Save Bot Message
-                Message.objects.create(
-                    conversation=conversation,
-                    sender='BOT',
-                    text=answer,
-                    sources=json.dumps(source_ids) if source_ids else ''
-                )
-            except Exception as e:
-                logger.error("AI generation failed: %s", e)
-                # Optionally save an error message or fail silently (user just sees no reply)
-
-        return JsonResponse({'success': True})
+            schedule_reply(bot, conversation.id, text, on_server_loop=isinstance(request, ASGIRequest))
+            reply_pending = True
+
+        return JsonResponse({'success': True, 'reply_pending': reply_pending})
 
     except Exception as e:
         return JsonResponse({'error': str(e)}, status=500)
 
 
+def _decode_live_token(token):
+    """Returns (payload, None) or (None, error JsonResponse)."""
+    if not token:
+        return None, JsonResponse({'error': 'Missing JWT'}, status=401)
+    try:
+        return jwt.decode(token, settings.SECRET_KEY, algorithms=['HS256']), None
+    except jwt.ExpiredSignatureError:
+        return None, JsonResponse({'error': 'Token expired'}, status=401)
+    except jwt.InvalidTokenError:
+        return None, JsonResponse({'error': 'Invalid token'}, status=401)
+
+
+async def _live_public_key(payload):
+    # Widget tokens carry public_key; fall back to a lookup for older ones
+    if payload.get('public_key'):
+        return payload['public_key']
+    bot = await aget_profile(bot_id=payload.get('bot_id'))
+    return bot.public_key
+
+
+def _parse_last_id(value):
+    try:
+        return max(int(value or 0), 0)
+    except (TypeError, ValueError):
+        return 0
+
+
 @csrf_exempt
-def live_chat_poll(request):
+async def live_chat_poll(request):
     """
-    API to poll for new messages.
-    Expects GET: jwt, session_id, last_id (optional)
+    Long-poll for new messages.
+    Expects GET: jwt, session_id, last_id (optional), wait (optional seconds, 0 = return at once)
+
+    Answers immediately if there are messages newer than last_id, otherwise
+    holds the request until broadcast_message announces one for this
+    conversation or LIVE_POLL_TIMEOUT passes (then {'messages': []}).
+
+    Holding only works under the ASGI server with a shared channel layer
+    (CHANNEL_LAYER_BACKEND redis / redis-pubsub): under WSGI each held poll
+    pins a sync worker, and with the in-memory layer a message saved by
+    another process never wakes it. Otherwise polls answer at once, as
+    before long-polling.
     """
-    token = request.GET.get('jwt')
-    session_id = request.GET.get('session_id')
-    last_id = request.GET.get('last_id', 0)
-
-    if not token:
-        return JsonResponse({'error': 'Missing JWT'}, status=401)
+    payload, error = _decode_live_token(request.GET.get('jwt'))
+    if error:
+        return error
 
+    session_id = request.GET.get('session_id')
+    last_id = _parse_last_id(request.GET.get('last_id'))
+    can_hold = isinstance(request, ASGIRequest) and getattr(settings, 'CHANNEL_LAYER_BACKEND', 'memory') != 'memory'
+    max_wait = getattr(settings, 'LIVE_POLL_TIMEOUT', 25) if can_hold else 0
     try:
-        # Decode JWT
-        try:
-            payload = jwt.decode(token, settings.SECRET_KEY, algorithms=['HS256'])
-            bot_id = payload.get('bot_id')
-        except jwt.ExpiredSignatureError:
-            return JsonResponse({'error': 'Token expired'}, status=401)
-        except jwt.InvalidTokenError:
-            return JsonResponse({'error': 'Invalid token'}, status=401)
-
-        bot = Bot.objects.get(id=bot_id)
-        
-        try:
-            conversation = Conversation.objects.get(bot=bot, session_id=session_id)
-        except Conversation.DoesNotExist:
-             return JsonResponse({'messages': []})
+        wait = min(max(float(request.GET.get('wait', max_wait)), 0), max_wait)
+    except ValueError:
+        wait = max_wait
 
-        messages = Message.objects.filter(
-            conversation=conversation,
-            id__gt=last_id
-        ).order_by('id')
-
-        data = []
-        for msg in messages:
-            data.append({
-                'id': msg.id,
-                'sender': msg.sender,
-                'text': msg.text,
-                'timestamp': msg.timestamp.isoformat(),
-                'sources': msg.sources
-            })
+    try:
+        public_key = await _live_public_key(payload)
 
+        if not wait:
+            data = await messages_after(public_key, session_id, last_id)
+        else:
+            # Subscribe before querying so a message saved in between is not missed
+            async with ConversationListener(public_key, session_id) as listener:
+                data = await messages_after(public_key, session_id, last_id)
+                if not data:
+                    first = await listener.receive(wait)
+                    if first is not None:
+                        data = [first] + await listener.drain()
+
+        data = [m for m in data if m['id'] > last_id]
         return JsonResponse({'messages': data})
 
     except Exception as e:
         return JsonResponse({'error': str(e)}, status=500)
 
 
+@csrf_exempt
+async def live_chat_stream(request):
+    """
+    Server-Sent Events for a live-chat conversation.
+    Expects GET: jwt, session_id, last_id (optional; the Last-Event-ID header wins)
+
+    Sends the backlog newer than last_id, then each new message as it is
+    broadcast, with a keep-alive comment every LIVE_STREAM_KEEPALIVE seconds.
+    The stream ends after LIVE_STREAM_MAX_AGE seconds and EventSource
+    reconnects with Last-Event-ID. Needs the ASGI server (daphne); under WSGI
+    Django would buffer the whole stream.
+    """
+    payload, error = _decode_live_token(request.GET.get('jwt'))
+    if error:
+        return error
+
+    session_id = request.GET.get('session_id')
+    last_id = _parse_last_id(request.headers.get('Last-Event-ID') or request.GET.get('last_id'))
+    try:
+        public_key = await _live_public_key(payload)
+    except Bot.DoesNotExist:
+        return JsonResponse({'error': 'Bot not found'}, status=404)
+
+    keepalive = getattr(settings, 'LIVE_STREAM_KEEPALIVE', 15)
+    max_age = getattr(settings, 'LIVE_STREAM_MAX_AGE', 300)
+
+    def event(msg):
+        return f"id: {msg['id']}\nevent: message\ndata: {json.dumps(msg)}\n\n"
+
+    async def events():
+        newest = last_id
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + max_age
+        async with ConversationListener(public_key, session_id) as listener:
+            yield "retry: 2000\n\n"
+            for msg in await messages_after(public_key, session_id, newest):
+                newest = msg['id']
+                yield event(msg)
+            while loop.time() < deadline:
+                msg = await listener.receive(min(keepalive, deadline - loop.time()))
+                if msg is None:
+                    yield ": keep-alive\n\n"
+                elif msg['id'] > newest:
+                    newest = msg['id']
+                    yield event(msg)
+
+    response = StreamingHttpResponse(events(), content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'
+    return response
+
+
 @xframe_options_exempt
 def bot_config_api(request, public_key):
     """
@@ -513,7 +558,7 @@ def bot_config_api(request, public_key):
     URL: /embed/config/<public_key>/ returns JSON with all UI settings
     """
     try:
-        bot = Bot.objects.get(public_key=public_key)
+        bot = get_profile(public_key=public_key)
         response = HttpResponse(
             json.dumps({
                 'public_key': bot.public_key,
@@ -625,7 +670,7 @@ def save_enquiry(request):
 @xframe_options_exempt
 def qa_widget_iframe(request, public_key):
     try:
-        bot = Bot.objects.get(public_key=public_key)
+        bot = get_profile(public_key=public_key)
         ws = bot.workspace
         
         # ADD THIS SECTION - Bot type routing logic
@@ -725,12 +770,7 @@ def qa_widget_iframe(request, public_key):
             'widget_position': bot.ui_widget_position or 'bottom-right',
         }
 
-        footer = None
-        try:
-            if getattr(ws, 'bot_footer', False):
-                footer = getattr(ws, 'bot_footers', None)
-                if footer: footer = footer.first()
-        except: pass
+        footer = ws.footer if ws.bot_footer else None
 
         enquiry_form_enabled = getattr(ws, 'enable_enquiry_form', False)
 
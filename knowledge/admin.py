@@ -52,10 +52,10 @@ class KnowledgeSourceAdmin(admin.ModelAdmin):
 class ChunkAdmin(admin.ModelAdmin):
     list_display = ['knowledge_source', 'vector_id', 'text_preview']
     search_fields = ['text', 'vector_id', 'knowledge_source__bot__name']
-    readonly_fields = ['vector_id', 'created_at']
+    readonly_fields = ['vector_id', 'embedding_info', 'created_at']
     fieldsets = (
         ("Knowledge Source", {'fields': ('knowledge_source',)}),
-        ("Chunk Details", {'fields': ('text', 'embedding', 'vector_id')}),
+        ("Chunk Details", {'fields': ('text', 'embedding_info', 'vector_id')}),
         ("Qdrant Config", {'fields': ('qdrant_url', 'qdrant_api_key', )}),
         ("Timestamps", {'fields': ('created_at',)}),
     )
@@ -64,19 +64,24 @@ class ChunkAdmin(admin.ModelAdmin):
         return (obj.text[:80] + "...") if obj.text and len(obj.text) > 80 else obj.text
     text_preview.short_description = "Preview"
 
+    def embedding_info(self, obj):
+        if not obj.has_embedding:
+            return "—"
+        return f"{len(obj.embedding)} dims (float32)"
+    embedding_info.short_description = "Embedding"
 
     def save_model(self, request, obj, form, change):
         if obj.knowledge_source and not change:
             # Auto-fill from knowledge source
             obj.text = obj.knowledge_source.content
-            if hasattr(obj.knowledge_source, 'embedding') and obj.knowledge_source.embedding:
+            if getattr(obj.knowledge_source, 'embedding', None) is not None:
                 obj.embedding = obj.knowledge_source.embedding
 
         # Save locally first
         super().save_model(request, obj, form, change)
 
         # Push to Qdrant if API details are present
-        if obj.qdrant_url and obj.qdrant_api_key and obj.embedding:
+        if obj.qdrant_url and obj.qdrant_api_key and obj.has_embedding:
             try:
                 obj.push_to_qdrant()   # ✅ call instance method
             except Exception as e:
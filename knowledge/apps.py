@@ -4,3 +4,17 @@ from django.apps import AppConfig
 class KnowledgeConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'knowledge'
+
+    def ready(self):
+        import knowledge.signals
+
+        from django.conf import settings
+        if not getattr(settings, 'EMBEDDING_WARMUP', False):
+            return
+        # Celery prefork workers: load the embedding model once per child process
+        try:
+            from celery.signals import worker_process_init
+        except ImportError:
+            return
+        from .embeddings import warm_up
+        worker_process_init.connect(warm_up, weak=False)
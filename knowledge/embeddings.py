@@ -0,0 +1,223 @@
+# knowledge/embeddings.py
+"""
+Shared embedding service.
+
+The SentenceTransformer model is loaded lazily on first use and shared by
+everything in the process (chat retrieval, chunk ingestion, admin saves), so
+`manage.py` commands and migrations never pay for it. Web/worker processes can
+call `warm_up()` at startup to move the load out of the first request.
+
+All helpers are plain module-level functions taking/returning plain Python
+types, so they can be handed to a process pool (use `warm_up` as the pool
+initializer) or a Celery worker.
+"""
+import hashlib
+import logging
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
+
+import numpy as np
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_EMBEDDING_MODEL = 'all-MiniLM-L6-v2'
+
+_model = None
+_model_lock = threading.Lock()
+
+
+def get_model_name() -> str:
+    return getattr(settings, 'EMBEDDING_MODEL_NAME', DEFAULT_EMBEDDING_MODEL)
+
+
+def get_embedding_model():
+    """Return the process-wide SentenceTransformer, loading it on first call."""
+    global _model
+    if _model is None:
+        with _model_lock:
+            if _model is None:
+                from sentence_transformers import SentenceTransformer
+
+                name = get_model_name()
+                logger.info("Loading embedding model %s (pid=%s)", name, os.getpid())
+                _model = SentenceTransformer(name)
+    return _model
+
+
+def embed_text(text: str):
+    """Convert text into vector embedding."""
+    if not text:
+        return []
+    return get_embedding_model().encode(text).tolist()
+
+
+def embed_texts(texts, batch_size: int = 32):
+    """Embed a list of texts with a single batched encode call."""
+    texts = list(texts or [])
+    if not texts:
+        return []
+    vectors = get_embedding_model().encode(texts, batch_size=batch_size)
+    return [v.tolist() for v in vectors]
+
+
+def normalize_query(text: str) -> str:
+    """Lowercase, collapse whitespace and trim surrounding punctuation."""
+    text = re.sub(r"\s+", " ", (text or "").lower()).strip()
+    return text.strip(" ?!.,;:")
+
+
+class QueryEmbeddingCache:
+    """
+    Bounded, TTL'd LRU of query embeddings keyed by (model, normalised text).
+
+    Lookups go to the in-process LRU first and then, if
+    QUERY_EMBEDDING_CACHE_BACKEND names a Django cache alias, to that shared
+    cache (vectors stored as float32 bytes). Hit/miss counters are kept per
+    process; see stats().
+    """
+
+    def __init__(self, max_size=2048, ttl=3600, backend_alias=None):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.backend_alias = backend_alias
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.shared_hits = 0
+        self.misses = 0
+
+    def _backend(self):
+        if not self.backend_alias:
+            return None
+        from django.core.cache import caches
+        return caches[self.backend_alias]
+
+    @staticmethod
+    def make_key(text, model_name):
+        digest = hashlib.sha1(text.encode("utf-8")).hexdigest()
+        return f"qemb:{model_name}:{digest}"
+
+    def get(self, key):
+        now = time.monotonic()
+        with self._lock:
+            item = self._data.get(key)
+            if item is not None:
+                expires, vector = item
+                if expires > now:
+                    self._data.move_to_end(key)
+                    self.hits += 1
+                    return vector
+                del self._data[key]
+
+        backend = self._backend()
+        if backend is not None:
+            try:
+                raw = backend.get(key)
+            except Exception as e:
+                logger.warning("Shared query-embedding cache get failed: %s", e)
+                raw = None
+            if raw is not None:
+                vector = np.frombuffer(raw, dtype="<f4").tolist()
+                self._store_local(key, vector)
+                with self._lock:
+                    self.shared_hits += 1
+                return vector
+
+        with self._lock:
+            self.misses += 1
+        return None
+
+    def _store_local(self, key, vector):
+        with self._lock:
+            self._data[key] = (time.monotonic() + self.ttl, vector)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_size:
+                self._data.popitem(last=False)
+
+    def set(self, key, vector):
+        self._store_local(key, vector)
+        backend = self._backend()
+        if backend is not None:
+            try:
+                backend.set(key, np.asarray(vector, dtype="<f4").tobytes(), timeout=self.ttl)
+            except Exception as e:
+                logger.warning("Shared query-embedding cache set failed: %s", e)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+            self.hits = self.shared_hits = self.misses = 0
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.shared_hits + self.misses
+            return {
+                "size": len(self._data),
+                "hits": self.hits,
+                "shared_hits": self.shared_hits,
+                "misses": self.misses,
+                "hit_rate": ((self.hits + self.shared_hits) / lookups) if lookups else 0.0,
+            }
+
+
+_query_cache = None
+
+
+def get_query_cache() -> QueryEmbeddingCache:
+    global _query_cache
+    if _query_cache is None:
+        _query_cache = QueryEmbeddingCache(
+            max_size=getattr(settings, "QUERY_EMBEDDING_CACHE_SIZE", 2048),
+            ttl=getattr(settings, "QUERY_EMBEDDING_CACHE_TTL", 3600),
+            backend_alias=getattr(settings, "QUERY_EMBEDDING_CACHE_BACKEND", None),
+        )
+    return _query_cache
+
+
+def embed_query(text: str):
+    """
+    Embed a user question, served from the query-embedding cache when the
+    same normalised question was embedded recently.
+    """
+    normalized = normalize_query(text)
+    if not normalized:
+        return embed_text(text)
+
+    cache = get_query_cache()
+    key = cache.make_key(normalized, get_model_name())
+    vector = cache.get(key)
+    if vector is None:
+        vector = embed_text(normalized)
+        cache.set(key, vector)
+    return vector
+
+
+def query_cache_stats():
+    return get_query_cache().stats()
+
+
+def warm_up(*args, **kwargs):
+    """
+    Load the model ahead of the first request/task.
+    Accepts and ignores any arguments so it can be connected directly to
+    signals (e.g. Celery's worker_process_init) or used as a pool initializer.
+    """
+    try:
+        get_embedding_model()
+    except Exception as e:
+        logger.warning("Embedding model warm-up failed: %s", e)
+
+
+def _reset_after_fork():
+    # A forked child must not reuse the parent's lock state; the model itself
+    # is shared copy-on-write and stays valid.
+    global _model_lock
+    _model_lock = threading.Lock()
+
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_reset_after_fork)
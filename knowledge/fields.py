@@ -0,0 +1,50 @@
+# knowledge/fields.py
+import base64
+
+import numpy as np
+from django.db import models
+from django.db.models.query_utils import DeferredAttribute
+
+VECTOR_DTYPE = np.dtype('<f4')  # little-endian float32, 4 bytes per dimension
+
+
+class _VectorAttribute(DeferredAttribute):
+    """Coerce anything assigned to the field (list, bytes, ndarray) to a float32 array."""
+
+    def __set__(self, instance, value):
+        instance.__dict__[self.field.attname] = self.field.to_python(value)
+
+
+class Float32VectorField(models.BinaryField):
+    """
+    Stores a vector as packed float32 bytes (384 dims = 1.5 KB) instead of a
+    JSON list of floats. Values load as read-only numpy arrays via
+    np.frombuffer, i.e. without parsing or copying.
+    """
+    description = "Vector of float32 stored as binary"
+    descriptor_class = _VectorAttribute
+
+    def from_db_value(self, value, expression, connection):
+        if value is None:
+            return None
+        return np.frombuffer(value, dtype=VECTOR_DTYPE)
+
+    def to_python(self, value):
+        if value is None or isinstance(value, np.ndarray) and value.dtype == VECTOR_DTYPE:
+            return value
+        if isinstance(value, (list, tuple, np.ndarray)):
+            return np.asarray(value, dtype=VECTOR_DTYPE)
+        # bytes/memoryview from the DB, or base64 text from fixtures
+        value = super().to_python(value)
+        return np.frombuffer(value, dtype=VECTOR_DTYPE)
+
+    def get_prep_value(self, value):
+        if value is None:
+            return None
+        if isinstance(value, (bytes, bytearray, memoryview)):
+            return bytes(value)
+        return np.asarray(value, dtype=VECTOR_DTYPE).tobytes()
+
+    def value_to_string(self, obj):
+        value = self.get_prep_value(self.value_from_object(obj))
+        return None if value is None else base64.b64encode(value).decode('ascii')
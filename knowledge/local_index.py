@@ -0,0 +1,144 @@
+# knowledge/local_index.py
+"""
+In-process vector index over Chunk.embedding.
+
+For small/medium bots every chunk vector already lives in the DB, so
+retrieval can be a single matrix-vector product instead of a Qdrant round
+trip. One index per bot is built lazily (row-normalised float32 matrix),
+kept in an LRU of LOCAL_INDEX_MAX_BOTS entries and rebuilt when the bot's
+chunks change.
+
+Invalidation bumps a per-bot version in Django's cache, so with a shared
+cache backend every worker notices; with the default local-memory cache
+LOCAL_INDEX_TTL bounds how stale another process can be.
+"""
+import logging
+import threading
+import time
+from collections import OrderedDict
+
+import numpy as np
+from django.conf import settings
+from django.core.cache import cache
+from django.dispatch import Signal
+
+logger = logging.getLogger(__name__)
+
+_indexes = OrderedDict()
+_lock = threading.Lock()
+
+# Sent with bot_id by invalidate(), for other per-process caches keyed on it
+knowledge_changed = Signal()
+
+
+def _version_key(bot_id):
+    return f"local_index_version:{bot_id}"
+
+
+def knowledge_version(bot_id):
+    """Counter bumped on every change to the bot's chunks."""
+    return cache.get(_version_key(bot_id), 0)
+
+
+def invalidate(bot_id):
+    """Mark a bot's index stale (call whenever its chunks change)."""
+    if not bot_id:
+        return
+    key = _version_key(bot_id)
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.set(key, 1, timeout=None)
+    with _lock:
+        _indexes.pop(bot_id, None)
+    knowledge_changed.send(sender=None, bot_id=bot_id)
+
+
+class LocalVectorIndex:
+    def __init__(self, bot_id, version, chunk_ids, texts, source_ids, matrix):
+        self.bot_id = bot_id
+        self.version = version
+        self.built_at = time.monotonic()
+        self.chunk_ids = chunk_ids
+        self.texts = texts
+        self.source_ids = source_ids
+        self.matrix = matrix  # (n, dim) float32, rows L2-normalised
+
+    def __len__(self):
+        return len(self.chunk_ids)
+
+    @classmethod
+    def build(cls, bot_id):
+        from .models import Chunk
+
+        version = knowledge_version(bot_id)
+        rows = (
+            Chunk.objects.filter(knowledge_source__bot_id=bot_id, embedding__isnull=False)
+            .order_by('id')
+            .values_list('id', 'text', 'knowledge_source_id', 'embedding')
+        )
+        chunk_ids, texts, source_ids, vectors = [], [], [], []
+        for cid, text, sid, emb in rows:
+            if emb is None or not len(emb):
+                continue
+            chunk_ids.append(cid)
+            texts.append(text)
+            source_ids.append(sid)
+            vectors.append(emb)
+
+        if vectors:
+            matrix = np.vstack(vectors).astype(np.float32, copy=False)  # one copy of the zero-copy row views
+            norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+            norms[norms == 0] = 1.0
+            matrix /= norms
+        else:
+            matrix = np.zeros((0, 0), dtype=np.float32)
+        return cls(bot_id, version, chunk_ids, texts, source_ids, matrix)
+
+    def search(self, vector, top_k=3):
+        """Return [(score, text, source_id), ...] by cosine similarity."""
+        if not len(self) or vector is None or len(vector) == 0:
+            return []
+        q = np.asarray(vector, dtype=np.float32)
+        if q.shape[0] != self.matrix.shape[1]:
+            logger.warning("Query dim %s does not match index dim %s for bot %s",
+                           q.shape[0], self.matrix.shape[1], self.bot_id)
+            return []
+        n = np.linalg.norm(q)
+        if n:
+            q = q / n
+        scores = self.matrix @ q
+        k = min(top_k, len(scores))
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        return [(float(scores[i]), self.texts[i], self.source_ids[i]) for i in top]
+
+
+def _is_fresh(index):
+    ttl = getattr(settings, 'LOCAL_INDEX_TTL', 300)
+    if ttl and time.monotonic() - index.built_at > ttl:
+        return False
+    return index.version == knowledge_version(index.bot_id)
+
+
+def get_index(bot_id):
+    """Return the bot's index, building (and LRU-caching) it if needed."""
+    with _lock:
+        index = _indexes.get(bot_id)
+        if index is not None:
+            _indexes.move_to_end(bot_id)
+    if index is not None and _is_fresh(index):
+        return index
+
+    index = LocalVectorIndex.build(bot_id)
+    max_bots = getattr(settings, 'LOCAL_INDEX_MAX_BOTS', 50)
+    with _lock:
+        _indexes[bot_id] = index
+        _indexes.move_to_end(bot_id)
+        while len(_indexes) > max_bots:
+            _indexes.popitem(last=False)
+    return index
+
+
+def search(bot_id, vector, top_k=3):
+    return get_index(bot_id).search(vector, top_k=top_k)
@@ -0,0 +1,34 @@
+# Generated by Django 5.0.7 on 2026-10-18 09:12
+
+import hashlib
+
+from django.db import migrations, models
+
+
+def fill_content_hash(apps, schema_editor):
+    Chunk = apps.get_model('knowledge', 'Chunk')
+    batch = []
+    for ch in Chunk.objects.filter(content_hash__isnull=True).only('id', 'text').iterator():
+        ch.content_hash = hashlib.sha256((ch.text or '').encode('utf-8')).hexdigest()
+        batch.append(ch)
+        if len(batch) >= 500:
+            Chunk.objects.bulk_update(batch, ['content_hash'])
+            batch = []
+    if batch:
+        Chunk.objects.bulk_update(batch, ['content_hash'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('knowledge', '0004_qapair'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='chunk',
+            name='content_hash',
+            field=models.CharField(blank=True, db_index=True, max_length=64, null=True),
+        ),
+        migrations.RunPython(fill_content_hash, migrations.RunPython.noop),
+    ]
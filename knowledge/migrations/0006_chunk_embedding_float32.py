@@ -0,0 +1,60 @@
+# Generated by Django 5.0.7 on 2026-10-18 11:40
+
+from django.db import migrations
+import knowledge.fields
+
+
+BATCH = 500
+
+
+def json_to_float32(apps, schema_editor):
+    Chunk = apps.get_model('knowledge', 'Chunk')
+    batch = []
+    for ch in Chunk.objects.filter(embedding__isnull=False).only('id', 'embedding').iterator(chunk_size=BATCH):
+        if not ch.embedding:
+            continue
+        ch.embedding_f32 = ch.embedding  # field packs the list as float32 bytes
+        batch.append(ch)
+        if len(batch) >= BATCH:
+            Chunk.objects.bulk_update(batch, ['embedding_f32'])
+            batch = []
+    if batch:
+        Chunk.objects.bulk_update(batch, ['embedding_f32'])
+
+
+def float32_to_json(apps, schema_editor):
+    Chunk = apps.get_model('knowledge', 'Chunk')
+    batch = []
+    for ch in Chunk.objects.filter(embedding_f32__isnull=False).only('id', 'embedding_f32').iterator(chunk_size=BATCH):
+        ch.embedding = ch.embedding_f32.tolist()
+        batch.append(ch)
+        if len(batch) >= BATCH:
+            Chunk.objects.bulk_update(batch, ['embedding'])
+            batch = []
+    if batch:
+        Chunk.objects.bulk_update(batch, ['embedding'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('knowledge', '0005_chunk_content_hash'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='chunk',
+            name='embedding_f32',
+            field=knowledge.fields.Float32VectorField(blank=True, null=True),
+        ),
+        migrations.RunPython(json_to_float32, float32_to_json),
+        migrations.RemoveField(
+            model_name='chunk',
+            name='embedding',
+        ),
+        migrations.RenameField(
+            model_name='chunk',
+            old_name='embedding_f32',
+            new_name='embedding',
+        ),
+    ]
@@ -1,18 +1,19 @@
+import re
 import uuid
-import requests
+import hashlib
 import logging
+from collections import Counter
 from django.db import models
 from django.conf import settings
 from django.utils.text import slugify
-from sentence_transformers import SentenceTransformer
 from bots.models import Bot
+from .embeddings import embed_text, embed_texts
+from . import qdrant, local_index
+from .fields import Float32VectorField
 
 # Configure logger
 logger = logging.getLogger(__name__)
 
-# ✅ Load embedding model globally (for performance)
-embedding_model = SentenceTransformer('all-MiniLM-L6-v2')
-
 
 # ---------------------------------
 # KNOWLEDGE SOURCE MODEL
@@ -39,26 +40,17 @@ class KnowledgeSource(models.Model):
         creating = self.pk is None
         super().save(*args, **kwargs)
 
-        # ✅ If updating, delete old chunks first
-        if not creating:
-    # Delete chunks individually so their `delete()` runs (which removes vectors from Qdrant)
-            for chunk in list(self.chunks.all()):
-                chunk.delete()
-
-
-        # ✅ Always recreate chunks with embeddings
-        self.create_chunks()
+        if creating:
+            self.create_chunks()
+        else:
+            # ✅ Only re-embed what actually changed
+            self.sync_chunks()
 
-    def create_chunks(self, chunk_size=500):
-        """Split content into chunks, embed, and create Chunk records."""
-        text = (self.content or "").strip()
-        if not text:
-            return
+    def split_content(self, chunk_size=500):
+        return split_text(self.content, chunk_size)
 
-        words = text.split()
-        chunks = [" ".join(words[i:i + chunk_size]) for i in range(0, len(words), chunk_size)]
-
-        # Determine Qdrant config (Workspace > Settings)
+    def qdrant_target(self):
+        """Qdrant (url, api_key) for new chunks: Workspace > Settings."""
         ws_url = None
         ws_key = None
         try:
@@ -70,22 +62,119 @@ class KnowledgeSource(models.Model):
 
         final_url = ws_url or getattr(settings, "QDRANT_URL", None)
         final_key = ws_key or getattr(settings, "QDRANT_API_KEY", None)
+        return final_url, final_key
+
+    def create_chunks(self, chunk_size=500):
+        """
+        Split content into chunks, embed them in one batched call, bulk-insert
+        the Chunk rows and upsert their vectors to Qdrant in batches.
+        """
+        self._add_chunks(self.split_content(chunk_size))
+
+    def sync_chunks(self, chunk_size=500):
+        """
+        Incrementally re-chunk after an edit, diffing chunks by content hash.
+        Unchanged chunks keep their row, vector_id and embedding; only new or
+        changed text is embedded and upserted, and chunks that disappeared are
+        removed with one batched Qdrant delete.
+        """
+        texts = self.split_content(chunk_size)
+
+        existing = {}
+        for ch in self.chunks.all():
+            existing.setdefault(ch.content_hash or chunk_hash(ch.text), []).append(ch)
+
+        added = []
+        kept = []
+        for text in texts:
+            matches = existing.get(chunk_hash(text))
+            if matches:
+                kept.append(matches.pop())  # unchanged — keep as is
+            else:
+                added.append(text)
+
+        removed = [ch for chs in existing.values() for ch in chs]
+        if removed:
+            delete_chunks_from_qdrant(removed)
+            Chunk.objects.filter(id__in=[ch.id for ch in removed]).delete()
+            if not added:
+                local_index.invalidate(self.bot_id)  # otherwise _add_chunks does
+
+        target = self._chunk_target(kept)
+        moved = [ch for ch in kept if (ch.qdrant_url, ch.qdrant_api_key, ch.collection_name) != target]
+        if moved and target[0] and target[1]:
+            delete_chunks_from_qdrant(moved)
+            for ch in moved:
+                ch.collection_name = target[2]
+            sync_chunks_to_qdrant(moved, target[0], target[1])
+
+        self._add_chunks(added, target)
+        logger.info("Source %s re-chunked: %d added, %d removed, %d kept (%d moved)",
+                    self.pk, len(added), len(removed), len(kept), len(moved))
+
+    def _chunk_target(self, kept):
+        """
+        (qdrant_url, qdrant_api_key, collection_name) for the source's chunks.
+        Retrieval searches one collection per source, so new chunks join the
+        kept ones (in their most common target) rather than whatever the
+        title or workspace settings now give. A source with nothing in
+        Qdrant yet uses qdrant_target(), still under its chunks' collection.
+        """
+        targets = Counter(
+            (ch.qdrant_url, ch.qdrant_api_key, ch.collection_name)
+            for ch in kept if ch.qdrant_url and ch.qdrant_api_key and ch.collection_name
+        )
+        if targets:
+            return targets.most_common(1)[0][0]
+        names = Counter(ch.collection_name for ch in kept if ch.collection_name)
+        collection_name = names.most_common(1)[0][0] if names else self.default_collection_name()
+        return self.qdrant_target() + (collection_name,)
+
+    def _add_chunks(self, texts, target=None):
+        if not texts:
+            return
+
+        final_url, final_key, collection_name = target or (self.qdrant_target() + (self.default_collection_name(),))
 
-        for chunk_text in chunks:
-            embedding = embedding_model.encode(chunk_text).tolist()
-            Chunk.objects.create(
+        embeddings = embed_texts(texts, batch_size=getattr(settings, "EMBEDDING_BATCH_SIZE", 32))
+        rows = [
+            Chunk(
                 knowledge_source=self,
                 text=chunk_text,
+                content_hash=chunk_hash(chunk_text),
                 embedding=embedding,
                 qdrant_url=final_url,
                 qdrant_api_key=final_key,
+                collection_name=collection_name,
+                vector_id=str(uuid.uuid4()),
+            )
+            for chunk_text, embedding in zip(texts, embeddings)
+        ]
+        # bulk_create skips Chunk.save(), so nothing is pushed per row
+        rows = Chunk.objects.bulk_create(rows)
+
+        # Backends without RETURNING (MySQL) don't set pks on bulk_create
+        if any(c.pk is None for c in rows):
+            ids = dict(
+                Chunk.objects.filter(vector_id__in=[c.vector_id for c in rows])
+                .values_list("vector_id", "id")
             )
+            for c in rows:
+                c.pk = ids.get(c.vector_id)
+
+        # bulk_create sends no post_save signals
+        local_index.invalidate(self.bot_id)
+
+        if final_url and final_key:
+            upsert_chunks_to_qdrant(rows)
+
+    def default_collection_name(self):
+        return slugify(self.title or f"bot-{self.bot_id}")
 
     def delete(self, *args, **kwargs):
         """Delete all chunks and vectors when source is deleted."""
-        for chunk in self.chunks.all():
-            chunk.delete()  # triggers Qdrant vector deletion
-        super().delete(*args, **kwargs)
+        delete_chunks_from_qdrant(self.chunks.all())
+        super().delete(*args, **kwargs)  # chunks cascade
 
 
 # ---------------------------------
@@ -95,7 +184,8 @@ class Chunk(models.Model):
     knowledge_source = models.ForeignKey(KnowledgeSource, on_delete=models.CASCADE, related_name="chunks")
 
     text = models.TextField()
-    embedding = models.JSONField(null=True, blank=True)
+    content_hash = models.CharField(max_length=64, blank=True, null=True, db_index=True)
+    embedding = Float32VectorField(null=True, blank=True)  # float32 bytes, loads as np.ndarray
 
     qdrant_url = models.URLField(blank=True, null=True)
     qdrant_api_key = models.CharField(max_length=255, blank=True, null=True)
@@ -112,80 +202,216 @@ class Chunk(models.Model):
     # --------------------------
     def save(self, *args, **kwargs):
         """On save — re-embed if text changed, push to Qdrant."""
-        if self.text and not self.embedding:
-            self.embedding = embedding_model.encode(self.text).tolist()
+        if self.text and not self.has_embedding:
+            self.embedding = embed_text(self.text)
+        self.content_hash = chunk_hash(self.text) if self.text else None
 
         super().save(*args, **kwargs)
 
         if self.qdrant_url and self.qdrant_api_key:
             self.push_to_qdrant()
 
+    @property
+    def has_embedding(self):
+        return self.embedding is not None and len(self.embedding) > 0
+
     # --------------------------
     # QDRANT OPERATIONS
     # --------------------------
+    def qdrant_point(self):
+        """Qdrant point (id, vector, payload) for this chunk."""
+        return {
+            "id": self.vector_id,
+            "vector": self.embedding.tolist(),
+            "payload": {
+                "text": self.text,
+                "knowledge_source": self.knowledge_source.title,
+                "source_id": self.knowledge_source_id,
+                "chunk_id": self.id,
+            },
+        }
+
     def push_to_qdrant(self):
         """Create or update this vector in Qdrant."""
-        if not self.embedding:
+        if not self.has_embedding:
             return
 
-        try:
-            collection_name = self.collection_name or slugify(self.knowledge_source.title or f"bot-{self.knowledge_source.bot.id}")
-            self.collection_name = collection_name
-
-            headers = {
-                "Content-Type": "application/json",
-                "api-key": self.qdrant_api_key,
-            }
-
-            # ✅ Ensure collection exists
-            create_url = f"{self.qdrant_url}/collections/{collection_name}"
-            requests.put(create_url, headers=headers, json={
-                "vectors": {"size": len(self.embedding), "distance": "Cosine"}
-            })
-
-            # ✅ Create or replace vector
-            self.vector_id = self.vector_id or str(uuid.uuid4())
-            points_url = f"{self.qdrant_url}/collections/{collection_name}/points"
-            payload = {
-                "points": [
-                    {
-                        "id": self.vector_id,
-                        "vector": self.embedding,
-                        "payload": {
-                            "text": self.text,
-                            "knowledge_source": self.knowledge_source.title,
-                            "source_id": self.knowledge_source.id,
-                            "chunk_id": self.id,
-                        },
-                    }
-                ]
-            }
-
-            response = requests.put(points_url, headers=headers, json=payload)
-            if response.status_code not in (200, 201):
-                logger.warning("Qdrant upload failed: %s", response.text)
-            else:
-                super().save(update_fields=["vector_id", "collection_name"])
+        self.collection_name = self.collection_name or self.knowledge_source.default_collection_name()
+        self.vector_id = self.vector_id or str(uuid.uuid4())
 
-        except Exception as e:
-            logger.error("Error pushing to Qdrant: %s", str(e))
+        if upsert_chunks_to_qdrant([self]):
+            super().save(update_fields=["vector_id", "collection_name"])
 
     def delete(self, *args, **kwargs):
         """Remove this chunk and its Qdrant vector (if present)."""
         if self.qdrant_url and self.qdrant_api_key and self.vector_id and self.collection_name:
             try:
-                delete_url = f"{self.qdrant_url}/collections/{self.collection_name}/points/delete"
-                headers = {"api-key": self.qdrant_api_key, "Content-Type": "application/json"}
-                payload = {"points": [self.vector_id]}
-                resp = requests.post(delete_url, headers=headers, json=payload, timeout=15)
-                if resp.status_code not in (200, 204, 202):
-                    logger.warning("Qdrant vector deletion returned: %s %s", resp.status_code, resp.text)
+                qdrant.delete_points(self.qdrant_url, self.qdrant_api_key, self.collection_name, [self.vector_id])
             except Exception as e:
                 logger.warning("Qdrant vector deletion failed: %s", e)
 
 
         # finally delete local DB row
         super().delete(*args, **kwargs)
+        local_index.invalidate(self.knowledge_source.bot_id)
+
+
+def chunk_hash(text):
+    return hashlib.sha256((text or "").encode("utf-8")).hexdigest()
+
+
+# ---------------------------------
+# CHUNKING
+# ---------------------------------
+_SECTION_BREAK = re.compile(r"\n[ \t]*\n(?:[ \t]*\n)+")  # two or more blank lines
+_PARAGRAPH_BREAK = re.compile(r"\n[ \t]*\n")
+_LINE_BREAK = re.compile(r"[ \t]*\n\s*")
+_SENTENCE_END = re.compile(r"(?<=[.!?])\s+")
+
+# A group may also end after a paragraph whose hash picks it (1 in N) once it
+# holds chunk_size // CHUNK_MIN_FRACTION words
+CHUNK_BOUNDARY_EVERY = 8
+CHUNK_MIN_FRACTION = 4
+
+
+def split_text(text, chunk_size=500):
+    """
+    Split text into chunks of at most chunk_size words on content-defined
+    boundaries, so an edit only changes the chunks around it:
+
+    - two or more blank lines end a section; chunks never span sections
+      (crawled pages are written one section per block, see
+      dashboard.crawl_jobs.page_text);
+    - within a section, paragraphs are grouped up to chunk_size words, and a
+      group also ends after a paragraph whose own hash marks a boundary, so
+      after an insert or delete the grouping falls back in step at the next
+      such paragraph instead of shifting every later chunk;
+    - a paragraph over chunk_size words is cut at line breaks, then at
+      sentence ends, then every chunk_size words.
+    """
+    chunks = []
+    for section in _SECTION_BREAK.split((text or "").strip()):
+        pieces = []
+        for paragraph in _PARAGRAPH_BREAK.split(section):
+            pieces.extend(_paragraph_pieces(paragraph, chunk_size))
+        chunks.extend(_group_pieces(pieces, chunk_size))
+    return chunks
+
+
+def _paragraph_pieces(text, chunk_size, sep="\n\n"):
+    """(separator, text, words) pieces of a paragraph, none over chunk_size words."""
+    words = text.split()
+    if len(words) <= chunk_size:
+        return [(sep, text.strip(), len(words))] if words else []
+    for pattern, inner in ((_LINE_BREAK, "\n"), (_SENTENCE_END, " ")):
+        parts = pattern.split(text.strip())
+        if len(parts) > 1:
+            pieces = []
+            for part in parts:
+                pieces.extend(_paragraph_pieces(part, chunk_size, inner if pieces else sep))
+            return pieces
+    return [(sep if i == 0 else " ", " ".join(words[i:i + chunk_size]), len(words[i:i + chunk_size]))
+            for i in range(0, len(words), chunk_size)]
+
+
+def _is_boundary(text):
+    return int(hashlib.sha1(text.encode("utf-8")).hexdigest()[:8], 16) % CHUNK_BOUNDARY_EVERY == 0
+
+
+def _group_pieces(pieces, chunk_size):
+    chunks = []
+    group = []
+    words = 0
+    for piece in pieces:
+        if group and words + piece[2] > chunk_size:
+            chunks.append(_join_pieces(group))
+            group, words = [], 0
+        group.append(piece)
+        words += piece[2]
+        if words >= chunk_size // CHUNK_MIN_FRACTION and _is_boundary(piece[1]):
+            chunks.append(_join_pieces(group))
+            group, words = [], 0
+    if group:
+        chunks.append(_join_pieces(group))
+    return chunks
+
+
+def _join_pieces(pieces):
+    return pieces[0][1] + "".join(sep + text for sep, text, _ in pieces[1:])
+
+
+def delete_chunks_from_qdrant(chunks):
+    """Delete the vectors of many chunks with one points/delete call per collection."""
+    groups = {}
+    for ch in chunks:
+        if ch.qdrant_url and ch.qdrant_api_key and ch.vector_id and ch.collection_name:
+            groups.setdefault((ch.qdrant_url, ch.qdrant_api_key, ch.collection_name), []).append(ch.vector_id)
+
+    for (url, api_key, collection_name), ids in groups.items():
+        try:
+            qdrant.delete_points(url, api_key, collection_name, ids)
+        except Exception as e:
+            logger.warning("Qdrant vector deletion failed: %s", e)
+
+
+def upsert_chunks_to_qdrant(chunks, batch_size=None):
+    """
+    Upsert many chunks through the shared Qdrant client: one collection check
+    per target and one PUT per batch. Chunks are grouped by
+    (url, key, collection); ones without vector_id/collection_name get them
+    assigned here. Returns True if every group was uploaded.
+    """
+    groups = {}
+    for ch in chunks:
+        if not (ch.has_embedding and ch.qdrant_url and ch.qdrant_api_key):
+            continue
+        ch.collection_name = ch.collection_name or ch.knowledge_source.default_collection_name()
+        ch.vector_id = ch.vector_id or str(uuid.uuid4())
+        groups.setdefault((ch.qdrant_url, ch.qdrant_api_key, ch.collection_name), []).append(ch)
+
+    ok = True
+    for (url, api_key, collection_name), items in groups.items():
+        try:
+            if not qdrant.upsert_points(url, api_key, collection_name,
+                                        [ch.qdrant_point() for ch in items], batch_size=batch_size):
+                ok = False
+        except Exception as e:
+            logger.error("Error pushing to Qdrant: %s", str(e))
+            ok = False
+    return ok
+
+
+def sync_chunks_to_qdrant(chunks, qdrant_url=None, qdrant_api_key=None):
+    """
+    Point chunks at a Qdrant instance (when url/key given), embed any that
+    are missing a vector, bulk-upsert them and persist the changed fields in
+    one bulk UPDATE. Returns the number of chunks sent to Qdrant.
+    """
+    chunks = list(chunks)
+    for ch in chunks:
+        if qdrant_url:
+            ch.qdrant_url = qdrant_url
+        if qdrant_api_key:
+            ch.qdrant_api_key = qdrant_api_key
+
+    missing = [ch for ch in chunks if ch.text and not ch.has_embedding]
+    if missing:
+        vectors = embed_texts([ch.text for ch in missing], batch_size=getattr(settings, "EMBEDDING_BATCH_SIZE", 32))
+        for ch, vec in zip(missing, vectors):
+            ch.embedding = vec
+
+    targets = [ch for ch in chunks if ch.has_embedding and ch.qdrant_url and ch.qdrant_api_key]
+    upsert_chunks_to_qdrant(targets)
+
+    Chunk.objects.bulk_update(
+        chunks,
+        ["embedding", "qdrant_url", "qdrant_api_key", "vector_id", "collection_name"],
+        batch_size=500,
+    )
+    if missing:
+        for bot_id in {ch.knowledge_source.bot_id for ch in missing}:
+            local_index.invalidate(bot_id)
+    return len(targets)
 
 
 # ---------------------------------
@@ -0,0 +1,135 @@
+# knowledge/qdrant.py
+"""
+Thin Qdrant REST client shared by the whole process.
+
+- One pooled requests.Session (keep-alive) instead of a new TCP/TLS
+  connection per call.
+- Collections known to exist are cached per (url, collection), so the
+  "ensure collection" round trip happens once per process, not per point.
+- Multi-point upsert/delete so indexing a source or workspace costs one
+  request per batch.
+"""
+import logging
+import threading
+
+import requests
+from requests.adapters import HTTPAdapter
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+_session = None
+_session_lock = threading.Lock()
+_known_collections = set()
+
+
+def _timeout():
+    return getattr(settings, "QDRANT_TIMEOUT", 15)
+
+
+def get_session() -> requests.Session:
+    global _session
+    if _session is None:
+        with _session_lock:
+            if _session is None:
+                s = requests.Session()
+                pool = getattr(settings, "QDRANT_POOL_SIZE", 10)
+                adapter = HTTPAdapter(pool_connections=pool, pool_maxsize=pool)
+                s.mount("http://", adapter)
+                s.mount("https://", adapter)
+                _session = s
+    return _session
+
+
+def _headers(api_key):
+    return {"Content-Type": "application/json", "api-key": api_key or ""}
+
+
+def _base(url):
+    return (url or "").rstrip("/")
+
+
+def forget_collection(url, collection_name):
+    """Drop a collection from the existence cache (e.g. after it was deleted remotely)."""
+    _known_collections.discard((_base(url), collection_name))
+
+
+def ensure_collection(url, api_key, collection_name, vector_size) -> bool:
+    """Create the collection if needed. Cached per process after the first success."""
+    key = (_base(url), collection_name)
+    if key in _known_collections:
+        return True
+
+    coll_url = f"{_base(url)}/collections/{collection_name}"
+    session = get_session()
+    resp = session.get(coll_url, headers=_headers(api_key), timeout=_timeout())
+    if resp.status_code == 200:
+        _known_collections.add(key)
+        return True
+
+    resp = session.put(coll_url, headers=_headers(api_key), json={
+        "vectors": {"size": vector_size, "distance": "Cosine"}
+    }, timeout=_timeout())
+    if resp.status_code in (200, 201):
+        _known_collections.add(key)
+        return True
+
+    logger.warning("Qdrant collection create failed: %s %s", resp.status_code, resp.text)
+    return False
+
+
+def upsert_points(url, api_key, collection_name, points, batch_size=None) -> bool:
+    """
+    Upsert a list of {"id", "vector", "payload"} points in batches of
+    QDRANT_UPSERT_BATCH_SIZE. Returns True only if every batch succeeded.
+    """
+    points = list(points)
+    if not points:
+        return True
+    batch_size = batch_size or getattr(settings, "QDRANT_UPSERT_BATCH_SIZE", 64)
+
+    if not ensure_collection(url, api_key, collection_name, len(points[0]["vector"])):
+        return False
+
+    points_url = f"{_base(url)}/collections/{collection_name}/points"
+    session = get_session()
+    ok = True
+    for i in range(0, len(points), batch_size):
+        resp = session.put(points_url, headers=_headers(api_key), json={
+            "points": points[i:i + batch_size]
+        }, timeout=_timeout())
+        if resp.status_code not in (200, 201):
+            logger.warning("Qdrant upload failed: %s", resp.text)
+            if resp.status_code == 404:
+                forget_collection(url, collection_name)
+            ok = False
+    return ok
+
+
+def delete_points(url, api_key, collection_name, ids) -> bool:
+    """Delete many points with a single points/delete call."""
+    ids = [i for i in ids if i]
+    if not ids:
+        return True
+    resp = get_session().post(
+        f"{_base(url)}/collections/{collection_name}/points/delete",
+        headers=_headers(api_key),
+        json={"points": ids},
+        timeout=_timeout(),
+    )
+    if resp.status_code not in (200, 202, 204):
+        logger.warning("Qdrant vector deletion returned: %s %s", resp.status_code, resp.text)
+        return False
+    return True
+
+
+def search(url, api_key, collection_name, vector, limit=3):
+    """Nearest-neighbour search; returns Qdrant's `result` list. Raises on HTTP errors."""
+    resp = get_session().post(
+        f"{_base(url)}/collections/{collection_name}/points/search",
+        headers=_headers(api_key),
+        json={"vector": vector, "limit": limit, "with_payload": True},
+        timeout=_timeout(),
+    )
+    resp.raise_for_status()
+    return resp.json().get("result", [])
@@ -0,0 +1,20 @@
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+from .models import Chunk, KnowledgeSource
+from . import local_index
+
+
+@receiver(post_save, sender=Chunk)
+def chunk_saved(sender, instance, update_fields=None, **kwargs):
+    # push_to_qdrant() only stores vector_id/collection_name — vectors unchanged
+    if update_fields and not {'text', 'embedding'} & set(update_fields):
+        return
+    local_index.invalidate(instance.knowledge_source.bot_id)
+
+
+# No post_delete receiver for Chunk: it would cost a query and an invalidation
+# per row and stop cascades / sync_chunks from fast-deleting. Chunk.delete()
+# and KnowledgeSource.sync_chunks() invalidate once themselves.
+@receiver(post_delete, sender=KnowledgeSource)
+def source_deleted(sender, instance, **kwargs):
+    local_index.invalidate(instance.bot_id)
@@ -1,3 +1,111 @@
-from django.test import TestCase
+import random
+from unittest import mock
 
-# Create your tests here.
+import numpy as np
+from django.contrib.auth import get_user_model
+from django.test import SimpleTestCase, TestCase
+
+from accounts.models import Workspace
+from bots.models import Bot
+from .models import Chunk, KnowledgeSource, split_text
+
+
+def paragraphs(n, seed=1):
+    rng = random.Random(seed)
+    words = [f"w{i}" for i in range(3000)]
+    return [" ".join(rng.choices(words, k=rng.randint(20, 120))) + "." for _ in range(n)]
+
+
+def fake_embed_texts(texts, batch_size=32):
+    return [np.ones(4, dtype=np.float32) for _ in texts]
+
+
+class SplitTextTests(SimpleTestCase):
+    def assertFewChanged(self, before, after, most=2):
+        old, new = split_text(before), split_text(after)
+        self.assertLessEqual(len(set(new) - set(old)), most)
+        self.assertLessEqual(len(set(old) - set(new)), most)
+
+    def test_chunk_size(self):
+        chunks = split_text("\n\n".join(paragraphs(200)))
+        self.assertGreater(len(chunks), 20)
+        self.assertTrue(all(len(c.split()) <= 500 for c in chunks))
+
+    def test_edits_stay_local(self):
+        paras = paragraphs(400)
+        text = "\n\n".join(paras)
+        self.assertFewChanged(text, "hello " + text)
+        self.assertFewChanged(text, text.replace(paras[200], paras[200].split(" ", 1)[1]))
+        self.assertFewChanged(text, text.replace(paras[100], paras[100] + "\n\nA new paragraph."))
+
+    def test_long_paragraph_cut_at_sentences(self):
+        text = " ".join(paragraphs(100))
+        self.assertTrue(all(len(c.split()) <= 500 for c in split_text(text)))
+        self.assertFewChanged(text, "hello " + text)
+
+    def test_sections_never_share_a_chunk(self):
+        self.assertEqual(split_text("Title: A\n\nURL: /a\n\n\nPricing\n\nFrom $5.\n\n\nContact\n\nmail us"),
+                         ["Title: A\n\nURL: /a", "Pricing\n\nFrom $5.", "Contact\n\nmail us"])
+
+    def test_empty(self):
+        self.assertEqual(split_text("  \n\n "), [])
+
+
+@mock.patch("knowledge.models.embed_texts", side_effect=fake_embed_texts)
+@mock.patch("knowledge.models.qdrant")
+class SyncChunksTests(TestCase):
+    def setUp(self):
+        owner = get_user_model().objects.create_user(username="owner", email="owner@example.com", password="x")
+        self.workspace = Workspace.objects.create(name="ws", owner=owner, qdrant_url="https://q1.example.com",
+                                                  qdrant_api_key="k1")
+        self.bot = Bot.objects.create(workspace=self.workspace)
+        self.paras = paragraphs(120)
+
+    def test_edit_embeds_only_the_changed_chunk(self, qdrant, embed_texts):
+        source = KnowledgeSource.objects.create(bot=self.bot, title="Docs", source_type="TEXT",
+                                                content="\n\n".join(self.paras))
+        count = source.chunks.count()
+        embed_texts.reset_mock()
+        source.content = "hello " + source.content
+        source.save()
+        self.assertEqual(sum(len(c.args[0]) for c in embed_texts.call_args_list), 1)
+        self.assertEqual(source.chunks.count(), count)
+
+    def test_new_chunks_join_the_existing_target(self, qdrant, embed_texts):
+        source = KnowledgeSource.objects.create(bot=self.bot, title="Docs", source_type="TEXT",
+                                                content="\n\n".join(self.paras))
+        Workspace.objects.filter(pk=self.workspace.pk).update(qdrant_url="https://q2.example.com")
+        source = KnowledgeSource.objects.get(pk=source.pk)
+        source.title = "Renamed docs"
+        source.content += "\n\n\nA new section."
+        source.save()
+        targets = set(Chunk.objects.filter(knowledge_source=source)
+                      .values_list("qdrant_url", "collection_name"))
+        self.assertEqual(targets, {("https://q1.example.com", "docs")})
+
+    def test_rename_without_qdrant_keeps_collection(self, qdrant, embed_texts):
+        Workspace.objects.filter(pk=self.workspace.pk).update(qdrant_url=None, qdrant_api_key=None)
+        with self.settings(QDRANT_URL=None, QDRANT_API_KEY=None):
+            source = KnowledgeSource.objects.create(bot=Bot.objects.get(pk=self.bot.pk), title="Docs",
+                                                    source_type="TEXT", content="\n\n".join(self.paras))
+            source.title = "Renamed docs"
+            source.content += "\n\n\nA new section."
+            source.save()
+        self.assertEqual(set(source.chunks.values_list("collection_name", flat=True)), {"docs"})
+
+    def test_stray_chunks_are_moved(self, qdrant, embed_texts):
+        source = KnowledgeSource.objects.create(bot=self.bot, title="Docs", source_type="TEXT",
+                                                content="\n\n".join(self.paras))
+        stray = source.chunks.first()
+        Chunk.objects.filter(pk=stray.pk).update(collection_name="old-docs")
+        source.save()
+        self.assertEqual(set(source.chunks.values_list("collection_name", flat=True)), {"docs"})
+        qdrant.delete_points.assert_called_once_with("https://q1.example.com", "k1", "old-docs", [stray.vector_id])
+
+    def test_delete_invalidates_once(self, qdrant, embed_texts):
+        source = KnowledgeSource.objects.create(bot=self.bot, title="Docs", source_type="TEXT",
+                                                content="\n\n".join(self.paras))
+        self.assertGreater(source.chunks.count(), 10)
+        with mock.patch("knowledge.local_index.invalidate") as invalidate, self.assertNumQueries(4):
+            source.delete()
+        invalidate.assert_called_once_with(self.bot.id)
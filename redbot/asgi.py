@@ -17,12 +17,18 @@ from channels.routing import ProtocolTypeRouter, URLRouter
 from channels.auth import AuthMiddlewareStack
 from django.core.asgi import get_asgi_application
 import chat.routing
+from chat.provider_clients import ProviderClientsMiddleware
 
-application = ProtocolTypeRouter({
+application = ProviderClientsMiddleware(ProtocolTypeRouter({
     "http": get_asgi_application(),
     "websocket": AuthMiddlewareStack(
         URLRouter(
             chat.routing.websocket_urlpatterns
         )
     ),
-})
+}))
+
+from django.conf import settings
+if settings.EMBEDDING_WARMUP:
+    from knowledge.embeddings import warm_up
+    warm_up()
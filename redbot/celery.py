@@ -0,0 +1,19 @@
+"""
+Celery app for redbot.
+
+Reads the CELERY_* settings (CELERY_BROKER_URL, ...) and finds the tasks.py
+of every installed app, e.g. chat.tasks for LIVE_REPLY_BACKEND='celery' and
+dashboard.tasks for CRAWL_JOB_BACKEND='celery'. Run a worker with:
+
+    celery -A redbot worker -l info
+"""
+
+import os
+
+from celery import Celery
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'redbot.settings')
+
+app = Celery('redbot')
+app.config_from_object('django.conf:settings', namespace='CELERY')
+app.autodiscover_tasks()
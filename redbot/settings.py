@@ -67,12 +67,51 @@ INSTALLED_APPS = [
 
 ASGI_APPLICATION = 'redbot.asgi.application'
 
-# Channel layers configuration (using in-memory for development)
-CHANNEL_LAYERS = {
-    'default': {
-        'BACKEND': 'channels.layers.InMemoryChannelLayer'
+# Channel layers configuration
+# 'memory' = single process only (development); 'redis' = channels_redis core layer;
+# 'redis-pubsub' = channels_redis pub/sub layer (lower latency, no capacity/expiry)
+CHANNEL_LAYER_BACKEND = os.getenv('CHANNEL_LAYER_BACKEND', 'redis' if os.getenv('REDIS_URL') else 'memory')
+# Comma-separated Redis URLs; with several, channels and groups are sharded across them
+CHANNEL_REDIS_HOSTS = [h.strip() for h in (os.getenv('CHANNEL_REDIS_HOSTS') or os.getenv('REDIS_URL') or '').split(',') if h.strip()]
+CHANNEL_LAYER_PREFIX = os.getenv('CHANNEL_LAYER_PREFIX', 'asgi')
+CHANNEL_LAYER_CAPACITY = int(os.getenv('CHANNEL_LAYER_CAPACITY', 100))  # queued messages per channel
+CHANNEL_LAYER_EXPIRY = int(os.getenv('CHANNEL_LAYER_EXPIRY', 60))  # seconds an undelivered message is kept
+CHANNEL_LAYER_GROUP_EXPIRY = int(os.getenv('CHANNEL_LAYER_GROUP_EXPIRY', 86400))
+
+if CHANNEL_LAYER_BACKEND == 'redis':
+    CHANNEL_LAYERS = {
+        'default': {
+            'BACKEND': 'channels_redis.core.RedisChannelLayer',
+            'CONFIG': {
+                'hosts': CHANNEL_REDIS_HOSTS or ['redis://127.0.0.1:6379/0'],
+                'prefix': CHANNEL_LAYER_PREFIX,
+                'capacity': CHANNEL_LAYER_CAPACITY,
+                'expiry': CHANNEL_LAYER_EXPIRY,
+                'group_expiry': CHANNEL_LAYER_GROUP_EXPIRY,
+            },
+        }
+    }
+elif CHANNEL_LAYER_BACKEND == 'redis-pubsub':
+    CHANNEL_LAYERS = {
+        'default': {
+            'BACKEND': 'channels_redis.pubsub.RedisPubSubChannelLayer',
+            'CONFIG': {
+                'hosts': CHANNEL_REDIS_HOSTS or ['redis://127.0.0.1:6379/0'],
+                'prefix': CHANNEL_LAYER_PREFIX,
+            },
+        }
+    }
+else:
+    CHANNEL_LAYERS = {
+        'default': {
+            'BACKEND': 'channels.layers.InMemoryChannelLayer',
+            'CONFIG': {
+                'capacity': CHANNEL_LAYER_CAPACITY,
+                'expiry': CHANNEL_LAYER_EXPIRY,
+                'group_expiry': CHANNEL_LAYER_GROUP_EXPIRY,
+            },
+        }
     }
-}
 
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
@@ -215,6 +254,93 @@ from qdrant_client import QdrantClient
 QDRANT_CLIENT = QdrantClient(url=QDRANT_URL)
 OPENAI_API_KEY = os.getenv('OPENAI_API_KEY')  # For dev tasks
 
+# Embedding model (loaded lazily by knowledge.embeddings, shared per process)
+EMBEDDING_MODEL_NAME = os.getenv('EMBEDDING_MODEL_NAME', 'all-MiniLM-L6-v2')
+# Load the model when the ASGI/WSGI app or a Celery worker process starts
+EMBEDDING_WARMUP = os.getenv('EMBEDDING_WARMUP', 'True') == 'True'
+# Texts per forward pass when embedding a whole source
+EMBEDDING_BATCH_SIZE = int(os.getenv('EMBEDDING_BATCH_SIZE', 32))
+# Query-embedding cache in front of the model for chat questions
+QUERY_EMBEDDING_CACHE_SIZE = int(os.getenv('QUERY_EMBEDDING_CACHE_SIZE', 2048))
+QUERY_EMBEDDING_CACHE_TTL = int(os.getenv('QUERY_EMBEDDING_CACHE_TTL', 3600))  # seconds
+# Optional Django cache alias shared by all workers (e.g. 'default' on Redis)
+QUERY_EMBEDDING_CACHE_BACKEND = os.getenv('QUERY_EMBEDDING_CACHE_BACKEND') or None
+# Points per PUT /points request when indexing chunks in bulk
+QDRANT_UPSERT_BATCH_SIZE = int(os.getenv('QDRANT_UPSERT_BATCH_SIZE', 64))
+# Shared Qdrant HTTP session (knowledge.qdrant)
+QDRANT_TIMEOUT = int(os.getenv('QDRANT_TIMEOUT', 15))
+QDRANT_POOL_SIZE = int(os.getenv('QDRANT_POOL_SIZE', 10))
+
+# In-process vector index for retrieval (knowledge.local_index)
+# 'auto' = local for bots up to LOCAL_INDEX_MAX_CHUNKS, Qdrant (with local fallback) above
+LOCAL_VECTOR_INDEX = os.getenv('LOCAL_VECTOR_INDEX', 'auto')
+LOCAL_INDEX_MAX_CHUNKS = int(os.getenv('LOCAL_INDEX_MAX_CHUNKS', 5000))
+LOCAL_INDEX_MAX_BOTS = int(os.getenv('LOCAL_INDEX_MAX_BOTS', 50))
+LOCAL_INDEX_TTL = int(os.getenv('LOCAL_INDEX_TTL', 300))  # seconds
+
+# Semantic answer cache for ChatAPI (chat.answer_cache)
+ANSWER_CACHE_ENABLED = os.getenv('ANSWER_CACHE_ENABLED', 'True') == 'True'
+ANSWER_CACHE_THRESHOLD = float(os.getenv('ANSWER_CACHE_THRESHOLD', 0.95))  # cosine similarity
+ANSWER_CACHE_TTL = int(os.getenv('ANSWER_CACHE_TTL', 3600))  # seconds (capped at LOCAL_INDEX_TTL without a shared CACHES backend)
+ANSWER_CACHE_MAX_PER_BOT = int(os.getenv('ANSWER_CACHE_MAX_PER_BOT', 200))
+ANSWER_CACHE_MAX_BOTS = int(os.getenv('ANSWER_CACHE_MAX_BOTS', 100))
+# Min seconds between streamed-answer deltas pushed to the ChatConsumer group
+STREAM_BROADCAST_INTERVAL = float(os.getenv('STREAM_BROADCAST_INTERVAL', 0.05))
+
+# Cached bot/workspace/plan snapshot for widget and chat endpoints (bots.runtime)
+BOT_PROFILE_CACHE_ENABLED = os.getenv('BOT_PROFILE_CACHE_ENABLED', 'True') == 'True'
+BOT_PROFILE_TTL = int(os.getenv('BOT_PROFILE_TTL', 60))  # seconds; bounds cross-process staleness with locmem cache
+BOT_PROFILE_MAX_BOTS = int(os.getenv('BOT_PROFILE_MAX_BOTS', 5000))
+
+# AI provider HTTP clients (chat.provider_clients). HTTP/2 AsyncClients are used on the ASGI
+# server's loop only; under WSGI async calls share the pooled requests.Session.
+AI_PROVIDER_HTTP2 = os.getenv('AI_PROVIDER_HTTP2', 'True') == 'True'
+AI_PROVIDER_MAX_CONNECTIONS = int(os.getenv('AI_PROVIDER_MAX_CONNECTIONS', 20))  # per provider
+AI_PROVIDER_KEEPALIVE = int(os.getenv('AI_PROVIDER_KEEPALIVE', 20))  # idle connections kept open
+# Send every provider call to this host instead (e.g. the fake provider in bench_providers.py)
+AI_PROVIDER_BASE_URL = os.getenv('AI_PROVIDER_BASE_URL', '')
+
+# Live-chat HTTP updates (embed live/poll long-poll and live/stream SSE)
+LIVE_POLL_TIMEOUT = int(os.getenv('LIVE_POLL_TIMEOUT', 25))  # seconds a poll may be held open (ASGI + redis channel layer only; otherwise polls return at once)
+LIVE_STREAM_KEEPALIVE = int(os.getenv('LIVE_STREAM_KEEPALIVE', 15))
+LIVE_STREAM_MAX_AGE = int(os.getenv('LIVE_STREAM_MAX_AGE', 300))  # then EventSource reconnects
+
+# Background AI replies for live/send (chat.live_replies): 'async', 'thread' or 'celery'
+LIVE_REPLY_BACKEND = os.getenv('LIVE_REPLY_BACKEND', 'async')
+LIVE_REPLY_MAX_PER_WORKSPACE = int(os.getenv('LIVE_REPLY_MAX_PER_WORKSPACE', 2))  # concurrent generations
+LIVE_REPLY_QUEUE_TIMEOUT = int(os.getenv('LIVE_REPLY_QUEUE_TIMEOUT', 60))  # seconds to wait for a slot
+LIVE_REPLY_SLOT_TTL = int(os.getenv('LIVE_REPLY_SLOT_TTL', 120))  # frees slots of crashed workers
+LIVE_REPLY_THREADS = int(os.getenv('LIVE_REPLY_THREADS', 8))
+
+# Dashboard-agent presence shared by all workers (chat.presence)
+# 'redis' (sorted set on AGENT_PRESENCE_REDIS_URL), 'cache' (a shared Django cache alias) or 'local' (single process)
+AGENT_PRESENCE_BACKEND = os.getenv('AGENT_PRESENCE_BACKEND', 'redis' if os.getenv('REDIS_URL') else 'local')
+AGENT_PRESENCE_REDIS_URL = os.getenv('AGENT_PRESENCE_REDIS_URL') or os.getenv('REDIS_URL')
+AGENT_PRESENCE_CACHE = os.getenv('AGENT_PRESENCE_CACHE', 'default')
+AGENT_PRESENCE_TTL = int(os.getenv('AGENT_PRESENCE_TTL', 30))  # seconds without heartbeat before an agent is offline
+AGENT_PRESENCE_HEARTBEAT = int(os.getenv('AGENT_PRESENCE_HEARTBEAT', 10))
+
+# ChatConsumer typing events: at most one per socket per TYPING_THROTTLE seconds,
+# then a trailing "stopped" after TYPING_IDLE seconds without keystrokes
+TYPING_THROTTLE = float(os.getenv('TYPING_THROTTLE', 2.0))
+TYPING_IDLE = float(os.getenv('TYPING_IDLE', 3.0))
+
+# Conversations per page in the dashboard live-chat inbox (cursor paginated)
+LIVE_CHAT_PAGE_SIZE = int(os.getenv('LIVE_CHAT_PAGE_SIZE', 50))
+
+# Website data fetcher crawler (dashboard.website_crawler)
+CRAWLER_CONCURRENCY = int(os.getenv('CRAWLER_CONCURRENCY', 8))  # pages in flight per crawl
+CRAWLER_HOST_CONCURRENCY = int(os.getenv('CRAWLER_HOST_CONCURRENCY', 4))  # of those, per host
+CRAWLER_RATE = float(os.getenv('CRAWLER_RATE', 5.0))  # max request starts/sec per host; robots.txt Crawl-delay can lower it
+CRAWLER_TIMEOUT = float(os.getenv('CRAWLER_TIMEOUT', 8))
+CRAWLER_HTML_PARSER = os.getenv('CRAWLER_HTML_PARSER', 'auto')  # 'auto' / 'lxml' (lxml if installed), 'html.parser', or 'soup' (the BeautifulSoup tree walk)
+CRAWLER_SITEMAPS = os.getenv('CRAWLER_SITEMAPS', 'True') == 'True'  # seed crawls from robots.txt Sitemap: lines / sitemap.xml
+CRAWLER_SITEMAP_MAX_FILES = int(os.getenv('CRAWLER_SITEMAP_MAX_FILES', 10))  # sitemap (and sitemap index) files read per crawl
+# Crawls run as background jobs (dashboard.crawl_jobs): 'thread' (in-process) or 'celery'
+# ('celery' and LIVE_REPLY_BACKEND='celery' need the Procfile worker: celery -A redbot worker)
+CRAWL_JOB_BACKEND = os.getenv('CRAWL_JOB_BACKEND', 'thread')
+CRAWL_JOB_THREADS = int(os.getenv('CRAWL_JOB_THREADS', 2))
+
 AUTH_USER_MODEL = 'accounts.User'
 
 X_FRAME_OPTIONS = 'ALLOWALL'
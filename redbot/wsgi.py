@@ -14,3 +14,8 @@ from django.core.wsgi import get_wsgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'redbot.settings')
 
 application = get_wsgi_application()
+
+from django.conf import settings
+if settings.EMBEDDING_WARMUP:
+    from knowledge.embeddings import warm_up
+    warm_up()